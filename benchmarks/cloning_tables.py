@@ -0,0 +1,98 @@
+'''
+Compares building cloning level tables one species and level at a time with
+the batched calculator of the cloning tool.
+
+    python -m benchmarks.cloning_tables [-input species.json] [-species 2000]
+                                        [-levels 450] [-rounds 5]
+
+Without an input file, cloning data for the given number of species is
+generated. With one, every species that can be cloned is used. Both tables
+are checked to agree; values may differ in the last decimal, where NumPy
+and round() break ties differently.
+'''
+import random
+import time
+
+import numpy as np
+
+from typing import Any, Callable, Dict, List
+
+from core import cli
+from core.file import load_json
+from tools.cloning.calc import TABLE_DECIMALS, build_level_tables
+from tools.cloning.const import CLONING_SECTION, \
+                                BASE_COST, LEVEL_COST, BASE_TIME, LEVEL_TIME
+
+
+def generate_species(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            CLONING_SECTION: {
+                BASE_COST: round(rng.uniform(50, 2000), 2),
+                LEVEL_COST: round(rng.uniform(1, 50), 3),
+                BASE_TIME: round(rng.uniform(1000, 20000), 2),
+                LEVEL_TIME: round(rng.uniform(10, 500), 3),
+            }
+        }
+        for _ in range(count)
+    ]
+
+
+def build_level_tables_loop(species, min_level: int, max_level: int):
+    tables = list()
+    for dino_data in species:
+        cloning = dino_data[CLONING_SECTION]
+        cost = list()
+        time_table = list()
+        for level in range(min_level, max_level + 1):
+            cost.append(round(cloning[BASE_COST]
+                              + cloning[LEVEL_COST] * level, TABLE_DECIMALS))
+            time_table.append(round(cloning[BASE_TIME]
+                                    + cloning[LEVEL_TIME] * level,
+                                    TABLE_DECIMALS))
+        tables.append(dict(cost=cost, time=time_table))
+    return tables
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    input_path = cli.get_arg('input', None)
+    count = cli.get_int('species', 2000)
+    max_level = cli.get_int('levels', 450)
+    rounds = cli.get_int('rounds', 5)
+
+    if input_path:
+        species = [dino_data for dino_data in load_json(input_path)['species']
+                   if dino_data.get(CLONING_SECTION, None)]
+    else:
+        species = generate_species(count)
+
+    expected = build_level_tables_loop(species, 1, max_level)
+    for reference, table in zip(expected,
+                                build_level_tables(species, 1, max_level)):
+        for key, values in reference.items():
+            if not np.allclose(values, table[key], rtol=0,
+                               atol=1.5 * 10 ** -TABLE_DECIMALS):
+                raise ValueError('Batched tables differ from the loop')
+
+    loop = measure(lambda: build_level_tables_loop(species, 1, max_level),
+                   rounds)
+    batch = measure(lambda: build_level_tables(species, 1, max_level),
+                    rounds)
+
+    print(f'{len(species)} species, levels 1-{max_level}')
+    print(f'loop:      {loop:.3f}s')
+    print(f'batch:     {batch:.3f}s ({loop / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    run()
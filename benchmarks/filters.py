@@ -0,0 +1,89 @@
+'''
+Times loading every filter under filters/, parsing the YAML each time, with
+the parsed documents kept between loads, and from pickled filters.
+
+    python -m benchmarks.filters [-filters filters] [-rounds 20]
+
+Run from the repository root, as filters import each other by paths
+relative to it. All three ways are checked to give the same filters.
+'''
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any, Callable, List
+
+from core import cli, filter as core_filter
+from core.filter import Deserializable, BPTrie, load_filter
+
+# Register the namespaces of the tools' filters
+import tools.cloning.filter_ext  # noqa: F401
+import tools.dvjson.filter_ext  # noqa: F401
+import tools.wildstats.filter_ext  # noqa: F401
+
+
+def describe(value: Any) -> Any:
+    if isinstance(value, Deserializable):
+        return {
+            name: describe(getattr(value, name, None))
+            for name in sorted(set(value.get_fields()))
+        }
+    if isinstance(value, BPTrie):
+        return value.root
+    if isinstance(value, dict):
+        return {key: describe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [describe(item) for item in value]
+    return value
+
+
+def load_all(paths: List[Path], cache_dir=None) -> List[Any]:
+    return [load_filter(str(path), cache_dir) for path in paths]
+
+
+def load_all_parsed(paths: List[Path]) -> List[Any]:
+    core_filter._DOCUMENTS.clear()
+    return load_all(paths)
+
+
+def load_all_pickled(paths: List[Path], cache_dir: Path) -> List[Any]:
+    core_filter._DOCUMENTS.clear()
+    return load_all(paths, cache_dir)
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    filters_path = cli.get_path('filters', Path('filters'))
+    rounds = cli.get_int('rounds', 20)
+    paths = sorted(filters_path.rglob('*.yml'))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_dir = Path(temp_dir)
+        expected = [describe(flt) for flt in load_all_parsed(paths)]
+        # Writes the pickles
+        load_all_pickled(paths, cache_dir)
+        for results in (load_all(paths), load_all_pickled(paths, cache_dir)):
+            if [describe(flt) for flt in results] != expected:
+                raise ValueError('Filters differ between ways of loading')
+
+        parsed = measure(lambda: load_all_parsed(paths), rounds)
+        memo = measure(lambda: load_all(paths), rounds)
+        pickled = measure(lambda: load_all_pickled(paths, cache_dir),
+                          rounds)
+
+    print(f'{len(paths)} filters')
+    print(f'parsed:    {parsed * 1000:.2f}ms')
+    print(f'memoized:  {memo * 1000:.2f}ms ({parsed / memo:.1f}x)')
+    print(f'pickled:   {pickled * 1000:.2f}ms ({parsed / pickled:.1f}x)')
+
+
+if __name__ == '__main__':
+    run()
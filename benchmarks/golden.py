@@ -0,0 +1,291 @@
+'''
+Regenerates the tools' outputs from pinned synthetic inputs, compares them
+byte for byte with the goldens under snapshots/synthetic/, and times them.
+
+    python -m benchmarks.golden [-only a,b] [-rounds 5] [-timings]
+                                [-slowdown 1.5] [-update]
+
+The Obelisk checkout is generated with benchmarks.obelisk from PARAMS, and
+each job runs its tool with `python -m tools.<tool>` in a temporary
+directory, on the filters in snapshots/synthetic/filters. A job fails when an
+output differs from its golden, which is shown as a diff, and the run exits
+with 1. Runs are timed with the tools' -profile report, leaving out starting
+Python. With -timings, a job whose best round took longer than -slowdown
+times the recorded one is also marked, and the run exits with 2 if nothing
+else failed. Timings are only compared when recorded with the same Python
+version and machine type. -update writes the outputs as the new goldens and
+records the timings.
+
+The older files directly under snapshots/ were made from real game data, and
+are not compared.
+'''
+import difflib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from tabulate import tabulate
+
+from core import cli
+from core.data_context import ROOT_ASB, ROOT_WIKI
+from core.file import JsonData, load_json
+from core.speciescache import remove_caches
+from . import obelisk
+
+ROOT_PATH = Path(__file__).parent.parent
+GOLDEN_PATH = ROOT_PATH / 'snapshots' / 'synthetic'
+FILTERS_PATH = GOLDEN_PATH / 'filters'
+TIMINGS_PATH = GOLDEN_PATH / 'timings.json'
+
+# Changing these changes every golden
+PARAMS = dict(species=150, mods=1, mod_species=40, worlds=9, seed=1)
+
+# Slowdowns this short are within the noise of the machine
+MIN_SLOWDOWN_SECONDS = 0.05
+
+# Exit statuses
+OUTPUTS_FAILED = 1
+SLOWER = 2
+
+DIFF_LINES = 40
+
+
+@dataclass
+class Job:
+    # Also the tool it runs
+    name: str
+    filter: str
+    # Output file names, as the goldens are named
+    outputs: List[str]
+    # Arguments besides -obelisk and -filter, with {out} for the output
+    # directory
+    args: List[str] = field(default_factory=list)
+
+
+JOBS = [
+    Job('wildstats', 'wildstats.yml', ['wildstats.txt'],
+        ['-output', '{out}/wildstats.txt']),
+    Job('cloning', 'cloning.yml', ['cloning.txt', 'cloning-tables.json'],
+        ['-output', '{out}/cloning.txt',
+         '-tables', '{out}/cloning-tables.json']),
+    Job('dvjson', 'dv.yml', ['dv.json'], ['-output_path', '{out}/dv.json']),
+    Job('selectortest', 'dv.yml', ['selectortest.txt'],
+        ['-output_path', '{out}/selectortest.txt']),
+]
+
+
+@dataclass
+class Result:
+    job: Job
+    rounds: List[float] = field(default_factory=list)
+    # Names of outputs that differ from their golden
+    changed: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def best(self) -> float:
+        return min(self.rounds) if self.rounds else 0.0
+
+
+def run_job(job: Job, obelisk_path: Path, work_path: Path,
+            output_path: Path) -> float:
+    '''Runs the job's tool once, returning the seconds it took.'''
+    report_path = work_path / f'{job.name}.profile.json'
+    args = [arg.format(out=output_path) for arg in job.args]
+    command = [
+        sys.executable, '-m', f'tools.{job.name}',
+        '-obelisk', str(obelisk_path),
+        '-filter', str(FILTERS_PATH / job.filter),
+        *args,
+        '-force', '-profile', str(report_path), '-nomemory',
+    ]
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, (str(ROOT_PATH), env.get('PYTHONPATH', None))))
+    process = subprocess.run(command, cwd=work_path, env=env,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise ValueError(process.stderr.strip() or
+                         f'Exited with code {process.returncode}')
+    return load_json(report_path)['seconds']
+
+
+def diff_output(name: str, expected: bytes, actual: bytes) -> List[str]:
+    lines = list(difflib.unified_diff(
+        expected.decode('utf-8', 'replace').splitlines(),
+        actual.decode('utf-8', 'replace').splitlines(),
+        f'golden/{name}', f'output/{name}', lineterm=''))
+    if len(lines) > DIFF_LINES:
+        lines = lines[:DIFF_LINES] + [f'... {len(lines) - DIFF_LINES} more '
+                                      'lines']
+    return lines
+
+
+def compare_outputs(job: Job, output_path: Path) -> List[str]:
+    '''Prints the differences from the goldens, returning what changed.'''
+    changed = list()
+    for name in job.outputs:
+        golden = GOLDEN_PATH / name
+        actual = (output_path / name).read_bytes()
+        expected = golden.read_bytes() if golden.is_file() else None
+        if expected == actual:
+            continue
+
+        changed.append(name)
+        if expected is None:
+            print(f'{golden} does not exist, run with -update to create it.')
+            continue
+        print('\n'.join(diff_output(name, expected, actual)))
+    return changed
+
+
+def update_goldens(job: Job, output_path: Path):
+    for name in job.outputs:
+        (GOLDEN_PATH / name).write_bytes((output_path / name).read_bytes())
+
+
+def load_timings(path: Path) -> Optional[JsonData]:
+    if not path.is_file():
+        return None
+    timings = load_json(path)
+    if timings.get('params', None) != PARAMS:
+        print(f'{path} was taken with other parameters, not comparing.')
+        return None
+    environment = (platform.python_version(), platform.machine())
+    if (timings.get('python', None), timings.get('machine', None)) \
+            != environment:
+        print(f'{path} was taken on Python {timings.get("python", None)} '
+              f'({timings.get("machine", None)}), not comparing.')
+        return None
+    return timings
+
+
+def save_timings(path: Path, results: List[Result],
+                 previous: Optional[JsonData]):
+    # Keeps the timings of jobs that were not run
+    jobs = dict(previous['jobs']) if previous else dict()
+    for result in results:
+        if result.rounds:
+            jobs[result.job.name] = dict(best=result.best)
+    data = dict(
+        params=PARAMS,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        jobs=dict(sorted(jobs.items())),
+    )
+    with open(path, 'wt') as fp:
+        json.dump(data, fp, indent=2)
+        fp.write('\n')
+
+
+def is_slower(seconds: float, reference: float, slowdown: float) -> bool:
+    return seconds > reference * slowdown \
+        and seconds - reference > MIN_SLOWDOWN_SECONDS
+
+
+def report(results: List[Result], timings: Optional[JsonData],
+           slowdown: float) -> Tuple[List[str], List[str]]:
+    '''
+    Prints the results and returns the names of failed jobs, and of slower
+    ones.
+    '''
+    recorded = timings['jobs'] if timings else dict()
+    failed = list()
+    slower = list()
+    rows = list()
+    for result in results:
+        name = result.job.name
+        row = [name, f'{result.best * 1000:.1f}']
+        reference = recorded.get(name, None)
+        if reference and result.rounds:
+            ratio = result.best / reference['best']
+            row += [f'{reference["best"] * 1000:.1f}', f'{ratio:.2f}x']
+        else:
+            row += ['', '']
+
+        if result.error:
+            status = 'error'
+        elif result.changed:
+            status = 'changed: ' + ', '.join(result.changed)
+        elif reference and is_slower(result.best, reference['best'],
+                                     slowdown):
+            status = 'slower'
+        else:
+            status = 'ok'
+        if status == 'slower':
+            slower.append(name)
+        elif status != 'ok':
+            failed.append(name)
+        rows.append(row + [status])
+
+    print(tabulate(rows, ('Job', 'Best ms', 'Recorded ms', 'Ratio', '')))
+    return failed, slower
+
+
+def run():
+    rounds = cli.get_int('rounds', 5)
+    slowdown = cli.get_float('slowdown', 1.5)
+    update = cli.get_bool('update')
+    compare_timings = cli.get_bool('timings')
+    only = cli.get_arg('only', None)
+    names = only.split(',') if only else [job.name for job in JOBS]
+    jobs = {job.name: job for job in JOBS}
+    for name in names:
+        if name not in jobs:
+            raise ValueError(f'Unknown golden job: {name}')
+
+    timings = load_timings(TIMINGS_PATH) if compare_timings or update \
+        else None
+    results = list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+        obelisk_path, _ = obelisk.generate(temp_path / 'synthetic', **PARAMS)
+        output_path = temp_path / 'output'
+        output_path.mkdir()
+
+        for name in names:
+            result = Result(jobs[name])
+            results.append(result)
+            try:
+                for _ in range(rounds):
+                    result.rounds.append(run_job(result.job, obelisk_path,
+                                                 temp_path, output_path))
+            except ValueError as error:
+                result.error = str(error)
+                print(f'{name} failed:\n{error}')
+                continue
+
+            if update:
+                update_goldens(result.job, output_path)
+            else:
+                result.changed = compare_outputs(result.job, output_path)
+
+        # The tools cached the species files under the repository
+        for root in (ROOT_ASB, ROOT_WIKI):
+            for path in (obelisk_path / root).glob('*.json'):
+                remove_caches(path)
+
+    if update:
+        save_timings(TIMINGS_PATH, results, timings)
+        print(f'Goldens and timings written to {GOLDEN_PATH}')
+        timings = None
+
+    failed, slower = report(results, timings, slowdown)
+    if failed:
+        print('Failed:', ', '.join(failed))
+        sys.exit(OUTPUTS_FAILED)
+    if slower:
+        print('Slower than recorded:', ', '.join(slower))
+        sys.exit(SLOWER)
+
+
+if __name__ == '__main__':
+    run()
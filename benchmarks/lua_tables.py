@@ -0,0 +1,113 @@
+'''
+Compares the throughput of core.lua against luadata.
+
+    python -m benchmarks.lua_tables [-input data.json] [-species 2000] [-rounds 5]
+
+Without an input file, dv-shaped data for the given number of species is
+generated. Before timing, the output of core.lua is loaded back with luadata
+and compared with the data as Lua sees it.
+'''
+import json
+import random
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from core import cli
+from core.lua import format_table
+
+
+def generate_species(count: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    species = dict()
+    for index in range(count):
+        name = f'Creature {index}'
+        species[name.lower()] = {
+            'name': name,
+            'blueprintpath': f'/Game/Dinos/C{index}/C{index}_Character_BP',
+            'releasedate': 'Unreleased',
+            'dlc': rng.choice(['', 'Scorched Earth', 'Aberration']),
+            'taming': {
+                'canbetamed': rng.choice(['Yes', 'No']),
+                'tameaffinitybase': rng.randint(100, 10000),
+                'torpor1': round(rng.uniform(1, 5000), 2),
+                'equipment': 'Saddle, "Tek" Saddle',
+            },
+            # Stats a species lacks are None, and written as keyed items
+            'stats': [round(rng.uniform(1, 5000), 1)
+                      if rng.random() < 0.8 else None for _ in range(12)],
+            'colorization': {
+                str(region): {
+                    'name': f'Region {region}',
+                    'colors': rng.sample(range(1, 56), 6),
+                }
+                for region in range(6)
+            },
+        }
+    return species
+
+
+def as_lua(value: Any) -> Any:
+    '''
+    What luadata loads back: no nil fields, empty tables as lists, and lists
+    with nil items before the last one as tables keyed by index.
+    '''
+    if isinstance(value, dict):
+        value = {k: as_lua(v) for k, v in value.items() if v is not None}
+        return value or []
+    if isinstance(value, (list, tuple)):
+        value = list(value)
+        while value and value[-1] is None:
+            value.pop()
+        if any(v is None for v in value):
+            return {i: as_lua(v) for i, v in enumerate(value, 1)
+                    if v is not None} or []
+        return [as_lua(v) for v in value]
+    return value
+
+
+def measure(fn: Callable[[Any], str], data: Any, rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    input_path = cli.get_arg('input', None)
+    species = cli.get_int('species', 2000)
+    rounds = cli.get_int('rounds', 5)
+
+    if input_path:
+        data = json.loads(Path(input_path).read_text())
+    else:
+        data = generate_species(species)
+
+    try:
+        import luadata
+    except ImportError:
+        luadata = None
+
+    output = format_table(data)
+    size = len(output.encode('utf-8')) / (1 << 20)
+    native = measure(format_table, data, rounds)
+    print(f'core.lua:  {native:.3f}s ({size / native:.1f} MB/s)')
+
+    if not luadata:
+        print('luadata is not installed, nothing to compare against')
+        return
+
+    if luadata.unserialize(output) != as_lua(data):
+        raise ValueError('core.lua output does not load back as the input')
+
+    reference = lambda value: luadata.serialize(value, indent='  ')
+    timing = measure(reference, data, rounds)
+    print(f'luadata:   {timing:.3f}s ({size / timing:.1f} MB/s)')
+    print(f'speed-up:  {timing / native:.1f}x')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,267 @@
+'''
+Generates a synthetic Obelisk checkout and wiki spawn maps to run the tools
+and benchmarks on. The same parameters always give the same files.
+
+    python -m benchmarks.obelisk [-output data/synthetic] [-species 2000]
+                                 [-mods 3] [-modspecies 200] [-worlds 6]
+                                 [-seed 0]
+
+Writes:
+    <output>/obelisk/data/asb/values.json, _manifest.json and one
+        <id>-<tag>.json per mod
+    <output>/obelisk/data/wiki/species.json
+    <output>/maps/spawns/<world>/Spawning_<class>.svg, and mod maps in
+        <world>/<id>-<tag>/Spawning_<class>_(<id>).svg
+
+Run the tools on it with -obelisk <output>/obelisk and, for svgcheck,
+-svgs <output>/maps. Mods take the ids the filters under filters/ use.
+'''
+import json
+import random
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core import cli
+from core.data_context import ROOT_ASB, ROOT_WIKI
+
+VERSION = '358.6'
+FORMAT = '1.12'
+
+# Mods listed in the manifest, in the order they are generated
+MODS = [
+    ('839162288', 'PrimalFear', 'Primal Fear'),
+    ('1289071814', 'PFBosses', 'Primal Fear Bosses'),
+    ('1679826889', 'Caballus', 'Caballus'),
+    ('1522327484', 'ArkAdditions', 'ARK Additions'),
+    ('893735676', 'ArkEternal', 'ARK Eternal'),
+]
+
+WORLDS = [
+    'The Island', 'Scorched Earth', 'Aberration', 'Extinction',
+    'The Center', 'Ragnarok', 'Valguero', 'Crystal Isles', 'Genesis',
+    'Lost Island', 'Fjordur',
+]
+
+PACKAGES = [
+    'PrimalEarth', 'ScorchedEarth', 'Aberration', 'Extinction', 'Genesis',
+    'Genesis2', 'LostIsland', 'Fjordur',
+]
+
+VARIANTS = ['Alpha', 'Beta', 'Gamma', 'Aberrant', 'Tek', 'Corrupted',
+            'Boss', 'Minion']
+
+NAME_PARTS = ['Raptor', 'Rex', 'Dodo', 'Wyvern', 'Carno', 'Para', 'Stego',
+              'Trike', 'Ptero', 'Argent', 'Mega', 'Spino', 'Theri', 'Giga',
+              'Bary', 'Moschops', 'Yuty', 'Rhynio', 'Tuso', 'Basilo']
+
+STAT_COUNT = 12
+
+SVG_TEMPLATE = ('<svg xmlns="http://www.w3.org/2000/svg" width="300" '
+                'height="300">{}</svg>\n')
+
+
+@dataclass
+class Creature:
+    path: str
+    name: str
+    variants: List[str]
+    mod_id: Optional[str]
+
+    @property
+    def class_name(self) -> str:
+        return self.path[self.path.rindex('.') + 1:]
+
+
+def _make_creatures(rng: random.Random, count: int, root: str,
+                    mod_id: Optional[str],
+                    known_paths: Sequence[str] = ()) -> List[Creature]:
+    creatures = list()
+    used = set()
+    for index in range(count):
+        name = f'{rng.choice(NAME_PARTS)} {index}'
+        asset = '/' + rng.choice(known_paths).strip('/') \
+                if known_paths and rng.random() < 0.1 else None
+        if not asset or asset in used:
+            folder = name.replace(' ', '')
+            package = rng.choice(PACKAGES) if root == '/Game' else 'Dinos'
+            asset = f'{root}/{package}/Dinos/{folder}/' \
+                    f'{folder}_Character_BP'
+            if rng.random() < 0.15:
+                asset += '_' + rng.choice(VARIANTS)
+        used.add(asset)
+        asset_name = asset[asset.rindex('/') + 1:]
+        variants = sorted(rng.sample(VARIANTS, rng.randrange(3))) \
+                   if rng.random() < 0.3 else []
+        creatures.append(Creature(f'{asset}.{asset_name}', name, variants,
+                                  mod_id))
+    return creatures
+
+
+def _make_stats(rng: random.Random) -> List[Any]:
+    stats: List[Any] = list()
+    for stat in range(STAT_COUNT):
+        if stat in (10, 11) or rng.random() < 0.05:
+            stats.append(None)
+            continue
+        stats.append([
+            round(rng.uniform(1, 5000), 1),
+            round(rng.uniform(0, 0.3), 3),
+            round(rng.uniform(0, 0.3), 3),
+            round(rng.uniform(0, 1), 2),
+            round(rng.uniform(0, 1), 2),
+        ])
+    # Torpor does not increase when tamed
+    if stats[2]:
+        stats[2][2] = 0
+    return stats
+
+
+def _make_colors(rng: random.Random) -> List[Any]:
+    return [
+        {'name': f'Region {region}',
+         'colors': [f'Dino {color}' for color in
+                    rng.sample(range(60), rng.randrange(4, 20))]}
+        if rng.random() < 0.8 else None
+        for region in range(6)
+    ]
+
+
+def _make_breeding(rng: random.Random) -> Dict[str, Any]:
+    return {
+        'gestationTime': 0 if rng.random() < 0.6
+                         else round(rng.uniform(1000, 40000), 2),
+        'incubationTime': round(rng.uniform(1000, 20000), 2),
+        'maturationTime': round(rng.uniform(1000, 400000), 2),
+        'matingCooldownMin': 64800,
+        'matingCooldownMax': 172800,
+    }
+
+
+def asb_record(rng: random.Random, creature: Creature) -> Dict[str, Any]:
+    return {
+        'blueprintPath': creature.path,
+        'name': creature.name,
+        'fullStatsRaw': _make_stats(rng),
+        'breeding': _make_breeding(rng),
+        'colors': _make_colors(rng),
+        'taming': {
+            'nonViolent': rng.random() < 0.3,
+            'violent': rng.random() < 0.8,
+            'tamingIneffectiveness': round(rng.uniform(0.5, 8), 3),
+            'affinityNeeded0': round(rng.uniform(500, 10000), 1),
+        },
+        'doesNotUseOxygen': rng.random() < 0.2,
+    }
+
+
+def wiki_record(rng: random.Random, creature: Creature) -> Dict[str, Any]:
+    # The wiki extractor refers to the generated class
+    record: Dict[str, Any] = {
+        'bp': creature.path + '_C',
+        'name': creature.name,
+    }
+    if creature.variants:
+        record['variants'] = creature.variants
+    if rng.random() < 0.8:
+        record['cloning'] = {
+            'costBase': round(rng.uniform(50, 2000), 2),
+            'costLevel': round(rng.uniform(1, 50), 3),
+            'timeBase': round(rng.uniform(1000, 20000), 2),
+            'timeLevel': round(rng.uniform(10, 500), 3),
+        }
+    record['breeding'] = _make_breeding(rng)
+    record['flags'] = sorted(rng.sample(['isServerSide', 'canHaveWings',
+                                         'preventCharacterBasing'],
+                                        rng.randrange(2)))
+    return record
+
+
+def _write_json(path: Path, data: Any):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wt') as fp:
+        json.dump(data, fp, indent='\t')
+
+
+def _write_maps(rng: random.Random, path: Path, creatures: List[Creature],
+                worlds: List[str], mod_folder: Optional[str]):
+    for creature in creatures:
+        for world in rng.sample(worlds, rng.randrange(len(worlds) + 1)):
+            folder = path / 'spawns' / world
+            name = f'Spawning_{creature.class_name}'
+            if mod_folder:
+                folder /= mod_folder
+                name += f'_({creature.mod_id})'
+            folder.mkdir(parents=True, exist_ok=True)
+            points = ''.join(
+                f'<circle cx="{rng.randrange(300)}" cy="{rng.randrange(300)}" '
+                'r="2"/>' for _ in range(rng.randrange(1, 20)))
+            (folder / f'{name}.svg').write_text(SVG_TEMPLATE.format(points))
+
+
+def generate(output: Path, species: int = 2000, mods: int = 3,
+             mod_species: int = 200, worlds: int = 6, seed: int = 0,
+             known_paths: Sequence[str] = ()) -> Tuple[Path, Path]:
+    '''
+    Writes the Obelisk data and spawn maps, returning the paths of the two.
+    `known_paths` are asset paths, like the ones filters list, that some of
+    the core creatures take.
+    '''
+    if mods > len(MODS):
+        raise ValueError(f'At most {len(MODS)} mods can be generated')
+
+    rng = random.Random(seed)
+    obelisk_path = output / 'obelisk'
+    maps_path = output / 'maps'
+    map_worlds = WORLDS[:worlds]
+
+    core = _make_creatures(rng, species, '/Game', None, known_paths)
+    manifest: Dict[str, Any] = {'files': {
+        'values.json': {'version': VERSION, 'format': FORMAT},
+    }}
+    _write_json(obelisk_path / ROOT_ASB / 'values.json', {
+        'version': VERSION,
+        'format': FORMAT,
+        'species': [asb_record(rng, creature) for creature in core],
+    })
+    _write_maps(rng, maps_path, core, map_worlds, None)
+
+    for mod_id, tag, title in MODS[:mods]:
+        creatures = _make_creatures(rng, mod_species, f'/Game/Mods/{tag}',
+                                    mod_id)
+        filename = f'{mod_id}-{tag}.json'
+        mod = {'id': mod_id, 'tag': tag, 'title': title}
+        manifest['files'][filename] = {'version': VERSION, 'format': FORMAT,
+                                       'mod': mod}
+        _write_json(obelisk_path / ROOT_ASB / filename, {
+            'version': VERSION,
+            'format': FORMAT,
+            'mod': mod,
+            'species': [asb_record(rng, creature) for creature in creatures],
+        })
+        _write_maps(rng, maps_path, creatures, map_worlds, f'{mod_id}-{tag}')
+
+    _write_json(obelisk_path / ROOT_ASB / '_manifest.json', manifest)
+    _write_json(obelisk_path / ROOT_WIKI / 'species.json', {
+        'version': VERSION,
+        'species': [wiki_record(rng, creature) for creature in core],
+    })
+    return obelisk_path, maps_path
+
+
+def run():
+    output = cli.get_path('output', Path('data/synthetic'))
+    obelisk_path, maps_path = generate(
+        output,
+        species=cli.get_int('species', 2000),
+        mods=cli.get_int('mods', 3),
+        mod_species=cli.get_int('modspecies', 200),
+        worlds=cli.get_int('worlds', 6),
+        seed=cli.get_int('seed', 0),
+    )
+    print(f'Obelisk data in {obelisk_path}, spawn maps in {maps_path}')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,95 @@
+'''
+Compares query() as it checked the condition dicts on every entry with the
+compiled conditions of query() and query_mask().
+
+    python -m benchmarks.query [-rows 100000] [-classes 300] [-rounds 5]
+
+Rows are generated with a class name, a cloning section on most of them and
+a level. The conditions pick a list of wanted classes, like the cloning
+tool's includeDinoClasses, and require the other fields.
+'''
+import random
+import time
+
+from typing import Any, Callable, Dict, Iterable, List
+
+from core import cli
+from core.file import JsonData, query, query_mask
+
+
+def query_per_entry(data: Iterable[JsonData], *conditions):
+    for entry in data:
+        for args in conditions:
+            where = args['where']
+            contained_in = args.get('contained_in', None)
+            equals = args.get('equals', None)
+            not_null = args.get('not_null', None)
+            greater_than = args.get('greater_than', None)
+
+            if callable(where):
+                val = where(entry)
+            else:
+                val = entry.get(where, None)
+
+            if not ((contained_in and val in contained_in)
+                    or (equals != None and val == equals)
+                    or (not_null and val)
+                    or (greater_than and val > greater_than)):
+                break
+        else:
+            yield entry
+
+
+def generate_rows(count: int, classes: int, seed: int = 0) -> List[JsonData]:
+    rng = random.Random(seed)
+    return [
+        dict(
+            className=f'Dino{rng.randrange(classes * 4)}_Character_BP_C',
+            cloning=dict(costBase=1) if rng.random() < 0.8 else None,
+            level=rng.randrange(1, 450),
+        )
+        for _ in range(count)
+    ]
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    count = cli.get_int('rows', 100000)
+    classes = cli.get_int('classes', 300)
+    rounds = cli.get_int('rounds', 5)
+
+    rows = generate_rows(count, classes)
+    wanted = [f'Dino{index * 4}_Character_BP_C' for index in range(classes)]
+    conditions: List[Dict[str, Any]] = [
+        dict(where=lambda entry: entry['level'], greater_than=100),
+        dict(where='className', contained_in=wanted),
+        dict(where='cloning', not_null=True),
+    ]
+
+    expected = list(query_per_entry(rows, *conditions))
+    mask = query_mask(rows, *conditions)
+    if list(query(rows, *conditions)) != expected \
+            or [row for row, keep in zip(rows, mask) if keep] != expected:
+        raise ValueError('Compiled queries select different rows')
+
+    per_entry = measure(lambda: list(query_per_entry(rows, *conditions)),
+                        rounds)
+    compiled = measure(lambda: list(query(rows, *conditions)), rounds)
+    masked = measure(lambda: query_mask(rows, *conditions), rounds)
+
+    print(f'{count} rows, {classes} wanted classes, {len(expected)} selected')
+    print(f'per entry: {per_entry:.3f}s')
+    print(f'compiled:  {compiled:.3f}s ({per_entry / compiled:.1f}x)')
+    print(f'mask:      {masked:.3f}s ({per_entry / masked:.1f}x)')
+
+
+if __name__ == '__main__':
+    run()
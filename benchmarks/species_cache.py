@@ -0,0 +1,97 @@
+'''
+Compares reading an Obelisk species file from JSON with reading it through
+the compiled species cache.
+
+    python -m benchmarks.species_cache [-input values.json] [-species 5000]
+
+Without an input file, ASB-shaped data for the given number of species is
+generated in a temporary directory. Cold is the first load, which parses the
+JSON and compiles the cache; warm is every load after that.
+'''
+import json
+import random
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any, Dict
+
+from core import cli
+from core.file import stream_json
+from core.speciescache import load_species
+
+
+def generate_values(count: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    species = list()
+    for index in range(count):
+        species.append({
+            'blueprintPath': f'/Game/Dinos/C{index}/C{index}_Character_BP.'
+                             f'C{index}_Character_BP',
+            'name': f'Creature {index}',
+            'fullStatsRaw': [
+                [round(rng.uniform(1, 5000), 3), rng.random(), rng.random(),
+                 0.0, 0.0] if rng.random() > 0.2 else None
+                for _ in range(12)
+            ],
+            'breeding': {
+                'gestationTime': 0,
+                'incubationTime': round(rng.uniform(1000, 20000), 2),
+                'maturationTime': round(rng.uniform(1000, 200000), 2),
+            },
+            'colors': [
+                {'name': f'Region {region}',
+                 'colors': [f'Color {color}' for color in range(20)]}
+                for region in range(6)
+            ],
+            'doesNotUseOxygen': rng.random() > 0.8,
+        })
+    return dict(version='1.0', format='1.12', species=species)
+
+
+def measure(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run():
+    input_path = cli.get_arg('input', None)
+    count = cli.get_int('species', 5000)
+    rounds = cli.get_int('rounds', 5)
+
+    with tempfile.TemporaryDirectory() as temp:
+        temp = Path(temp)
+        if input_path:
+            source = Path(input_path)
+        else:
+            source = temp / 'values.json'
+            source.write_text(json.dumps(generate_values(count)))
+        cache_dir = temp / 'cache'
+
+        records = list(stream_json(source))
+        last = records[-1]['blueprintPath']
+        size = source.stat().st_size / (1 << 20)
+        print(f'{len(records)} species, {size:.1f} MB')
+
+        json_time = min(measure(lambda: list(stream_json(source)))
+                        for _ in range(rounds))
+        cold = measure(lambda: list(load_species(source, cache_dir=cache_dir)))
+        warm = min(measure(lambda: list(load_species(source,
+                                                     cache_dir=cache_dir)))
+                   for _ in range(rounds))
+        lookup = min(measure(lambda: load_species(source, cache_dir=cache_dir)
+                             .get(last))
+                     for _ in range(rounds))
+
+        if list(load_species(source, cache_dir=cache_dir)) != records:
+            raise ValueError('Cached records differ from the source file')
+
+    print(f'json:      {json_time:.3f}s')
+    print(f'cold:      {cold:.3f}s')
+    print(f'warm:      {warm:.3f}s ({json_time / warm:.1f}x)')
+    print(f'lookup:    {lookup:.3f}s ({json_time / lookup:.1f}x)')
+
+
+if __name__ == '__main__':
+    run()
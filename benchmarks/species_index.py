@@ -0,0 +1,79 @@
+'''
+Times building a SpeciesIndex and joining species through it, over a sweep of
+checkout sizes, to show both grow linearly with the number of species.
+
+    python -m benchmarks.species_index [-species 1000,10000,50000]
+                                       [-rounds 5]
+
+Each size is a synthetic Obelisk checkout from benchmarks.obelisk, without
+mods or maps. The wiki species are indexed and the ASB species joined with
+them, as dvjson zips the two.
+'''
+import gc
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any, Callable, List
+
+from tabulate import tabulate
+
+from core import cli
+from core.data_context import ROOT_ASB, ROOT_WIKI
+from core.index import SpeciesIndex
+from core.species import load_species_records
+from core.speciescache import load_species
+from . import obelisk
+
+
+def measure(fn: Callable[[], Any], rounds: int) -> float:
+    # Like timeit, collections are left out, as their cost depends on
+    # everything else alive in the process
+    best = float('inf')
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return best
+
+
+def run():
+    sizes = [int(size) for size in
+             cli.get_arg('species', '1000,10000,50000').split(',')]
+    rounds = cli.get_int('rounds', 5)
+
+    rows: List[List[Any]] = list()
+    first = None
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            obelisk_path, _ = obelisk.generate(Path(temp_dir), species=size,
+                                               mods=0, worlds=0)
+            species = load_species_records(load_species(
+                obelisk_path / ROOT_ASB / 'values.json', cache_dir=None))
+            extended = load_species_records(load_species(
+                obelisk_path / ROOT_WIKI / 'species.json', cache_dir=None))
+
+        index = SpeciesIndex(extended)
+        joined = index.join(species)
+        if len(joined.matched) != size:
+            raise ValueError(f'Joined {len(joined.matched)} of {size} species')
+
+        build = measure(lambda: SpeciesIndex(extended), rounds)
+        join = measure(lambda: index.join(species), rounds)
+        per_species = (build + join) / size
+        if first is None:
+            first = per_species
+        rows.append([size, f'{build * 1000:.2f}', f'{join * 1000:.2f}',
+                     f'{per_species * 1e6:.3f}',
+                     f'{per_species / first:.2f}x'])
+
+    print(tabulate(rows, ('Species', 'Index ms', 'Join ms', 'us/species',
+                          'vs smallest')))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,60 @@
+'''
+Measures the memory held per species by raw JSON dicts and by Species
+records.
+
+    python -m benchmarks.species_memory [-input values.json] [-species 5000]
+
+Without an input file, ASB-shaped data for the given number of species is
+generated.
+'''
+import json
+import tracemalloc
+
+from pathlib import Path
+from typing import Any, Callable, List
+
+from core import cli
+from core.blueprint import get_class_name
+from core.species import Species
+from .species_cache import generate_values
+
+
+def measure(build: Callable[[], List[Any]]) -> int:
+    tracemalloc.start()
+    records = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def run():
+    input_path = cli.get_arg('input', None)
+    count = cli.get_int('species', 5000)
+
+    if input_path:
+        text = Path(input_path).read_text()
+    else:
+        text = json.dumps(generate_values(count))
+    count = len(json.loads(text)['species'])
+
+    def load_dicts():
+        records = json.loads(text)['species']
+        # Tools resolve class names on every record they select
+        for record in records:
+            get_class_name(record)
+        return records
+
+    def load_records():
+        return [Species(record) for record in json.loads(text)['species']]
+
+    raw = measure(load_dicts)
+    compact = measure(load_records)
+    print(f'{count} species')
+    print(f'dicts:     {raw / count / 1024:.1f} KB per species')
+    print(f'Species:   {compact / count / 1024:.1f} KB per species '
+          f'({raw / compact:.1f}x smaller)')
+
+
+if __name__ == '__main__':
+    run()
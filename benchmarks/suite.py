@@ -0,0 +1,341 @@
+'''
+Times the core steps of the tools on a synthetic Obelisk checkout, and
+compares them with a stored baseline.
+
+    python -m benchmarks.suite [-species 2000] [-rounds 7] [-only a,b]
+                               [-baseline benchmarks/baseline.json]
+                               [-save] [-tolerance 0.25] [-fail]
+
+The checkout is generated in a temporary directory with benchmarks.obelisk.
+Each case is run enough times per round to take at least -mintime seconds,
+and the median round is compared with the baseline. Cases slower than the
+baseline by more than the tolerance are marked, and with -fail make the run
+exit with an error. -save stores the results as the new baseline, with only
+the cases that ran; skipped ones are listed in it. Baselines are only compared
+when taken with the same parameters.
+
+The svgcheck case needs mwclient, and is skipped without it. mwclient is not
+in the Pipfile, so the stored baseline leaves it out.
+'''
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from tabulate import tabulate
+
+from core import cli, dino
+from core import filter as core_filter
+from core.data_context import ROOT_ASB, ROOT_WIKI, ObASB, ObSVGs, \
+                              clear_svg_indexes
+from core.file import JsonData, dump_json, load_json, query
+from core.filter import CreatureBPList, Filter, load_filter
+from core.index import get_class_path
+from core.jsonutils import format_json
+from core.species import load_species_records
+from core.speciescache import load_species
+from tools.dvjson.cli import zip_species
+from . import obelisk
+
+# Register the namespaces of the tools' filters
+import tools.cloning.filter_ext  # noqa: F401
+import tools.dvjson.filter_ext  # noqa: F401
+import tools.wildstats.filter_ext  # noqa: F401
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+FILTERS_PATH = Path('filters')
+
+
+@dataclass
+class Context:
+    obelisk_path: Path
+    maps_path: Path
+    # Raw JSON of the core ASB file
+    values: List[JsonData]
+    # Core ASB and wiki species, as the tools load them
+    species: List[JsonData]
+    extended: List[JsonData]
+    filters: Dict[str, Filter] = field(default_factory=dict)
+
+    def get_filter(self, path: str) -> Filter:
+        if path not in self.filters:
+            self.filters[path] = load_filter(path)
+        return self.filters[path]
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    rounds: List[float]
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.rounds)
+
+    @property
+    def best(self) -> float:
+        return min(self.rounds)
+
+    @property
+    def stddev(self) -> float:
+        return statistics.stdev(self.rounds) if len(self.rounds) > 1 else 0.0
+
+
+class SkipCase(Exception):
+    pass
+
+
+# Case name -> function preparing the timed call
+CASES: Dict[str, Callable[[Context], Callable[[], Any]]] = dict()
+
+
+def case(name: str):
+    def _register_(fn):
+        CASES[name] = fn
+        return fn
+
+    return _register_
+
+
+@case('load_filter')
+def case_load_filter(ctx: Context):
+    paths = [str(path) for path in sorted(FILTERS_PATH.rglob('*.yml'))]
+
+    def _load_():
+        # Parses the YAML every time
+        core_filter._DOCUMENTS.clear()
+        for path in paths:
+            load_filter(path)
+
+    return _load_
+
+
+@case('should_skip')
+def case_should_skip(ctx: Context):
+    flt = ctx.get_filter('filters/dv/core.yml')
+    species = ctx.species
+    return lambda: [dino.should_skip(flt, blueprint) for blueprint in species]
+
+
+@case('get_descriptive_name')
+def case_get_descriptive_name(ctx: Context):
+    flt = ctx.get_filter('filters/wildstats_filter.yml')
+    species = ctx.species
+
+    def _names_():
+        # Names are cached with the filter's derived data once resolved
+        flt.__dict__.pop('_derived', None)
+        return [dino.get_descriptive_name(flt, blueprint)
+                for blueprint in species]
+
+    return _names_
+
+
+@case('format_json')
+def case_format_json(ctx: Context):
+    values = ctx.values
+    return lambda: format_json(values, pretty=True)
+
+
+@case('dump_json')
+def case_dump_json(ctx: Context):
+    flt = ctx.get_filter('filters/wildstats_filter.yml')
+    data = {
+        record['name']: dict(stats=record['fullStatsRaw'],
+                             breeding=record['breeding'])
+        for record in ctx.values
+    }
+    return lambda: dump_json(flt, data, io.StringIO())
+
+
+@case('dvjson_zip')
+def case_dvjson_zip(ctx: Context):
+    flt = ctx.get_filter('filters/dv/core.yml')
+    species = list(query(
+        ctx.species,
+        dict(where=lambda x: dino.should_skip(flt, x), equals=False),
+    ))
+    wanted = set(get_class_path(blueprint) for blueprint in species)
+    extended = list(query(ctx.extended,
+                          dict(where=get_class_path, contained_in=wanted)))
+    return lambda: zip_species(species, extended)
+
+
+@case('svgcheck_gather')
+def case_svgcheck_gather(ctx: Context):
+    try:
+        from tools.svgcheck.cli import gather_maps
+    except ImportError as error:
+        raise SkipCase(str(error))
+    from tqdm import tqdm
+
+    flt = ctx.get_filter('filters/svg/core.yml')
+    asb = ObASB(ctx.obelisk_path)
+    asb.get_dinos()
+
+    def _gather_():
+        # Includes scanning the maps
+        clear_svg_indexes()
+        svgs = ObSVGs(ctx.maps_path, None)
+        with tqdm(total=len(asb.get_dinos()), disable=True) as t:
+            return gather_maps(flt, None, asb, svgs, t)
+
+    return _gather_
+
+
+def measure(name: str, fn: Callable[[], Any], rounds: int,
+            min_time: float) -> Result:
+    '''
+    Times `fn` in rounds of as many calls as it takes to run for `min_time`,
+    returning seconds per call.
+    '''
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    iterations = max(1, int(min_time / once) if once else 1000)
+
+    times = list()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        times.append((time.perf_counter() - start) / iterations)
+    return Result(name, iterations, times)
+
+
+def get_ignored_paths() -> List[str]:
+    '''Blueprint paths the repo's filters ignore, for realistic selection.'''
+    paths = list()
+    for filename in sorted(FILTERS_PATH.rglob('*.yml')):
+        selectors = load_filter(str(filename)).selectors
+        for bps in (selectors.ignoreBPs, selectors.includeBPs):
+            if isinstance(bps, CreatureBPList):
+                paths.extend(bps.values)
+    return sorted(set(paths))
+
+
+def make_context(output: Path, params: Dict[str, int]) -> Context:
+    obelisk_path, maps_path = obelisk.generate(
+        output, known_paths=get_ignored_paths(), **params)
+    values_path = obelisk_path / ROOT_ASB / 'values.json'
+    wiki_path = obelisk_path / ROOT_WIKI / 'species.json'
+    return Context(
+        obelisk_path=obelisk_path,
+        maps_path=maps_path,
+        values=load_json(values_path)['species'],
+        species=load_species_records(load_species(values_path,
+                                                  cache_dir=None)),
+        extended=load_species_records(load_species(wiki_path,
+                                                   cache_dir=None)),
+    )
+
+
+def load_baseline(path: Path) -> Optional[JsonData]:
+    if not path.is_file():
+        return None
+    return load_json(path)
+
+
+def save_baseline(path: Path, params: Dict[str, int],
+                  results: List[Result], skipped: List[str]):
+    data = dict(
+        params=params,
+        python=platform.python_version(),
+        machine=platform.machine(),
+        skipped=skipped,
+        cases={
+            result.name: dict(median=result.median, best=result.best,
+                              iterations=result.iterations)
+            for result in results
+        },
+    )
+    with open(path, 'wt') as fp:
+        json.dump(data, fp, indent=2)
+        fp.write('\n')
+
+
+def report(results: List[Result], baseline: Optional[JsonData],
+           tolerance: float) -> List[str]:
+    '''Prints the results and returns the names of slower cases.'''
+    cases = baseline['cases'] if baseline else dict()
+    slower = list()
+    rows = list()
+    for result in results:
+        row = [result.name, f'{result.median * 1000:.3f}',
+               f'{result.best * 1000:.3f}', f'{result.stddev * 1000:.3f}']
+        reference = cases.get(result.name, None)
+        if reference:
+            ratio = result.median / reference['median']
+            status = ''
+            if ratio > 1 + tolerance:
+                status = 'slower'
+                slower.append(result.name)
+            elif ratio < 1 / (1 + tolerance):
+                status = 'faster'
+            row += [f'{reference["median"] * 1000:.3f}', f'{ratio:.2f}x',
+                    status]
+        rows.append(row)
+
+    print(tabulate(rows, ('Case', 'Median ms', 'Best ms', 'Stddev ms',
+                          'Baseline ms', 'Ratio', '')))
+    return slower
+
+
+def run():
+    params = dict(
+        species=cli.get_int('species', 2000),
+        mods=cli.get_int('mods', 3),
+        mod_species=cli.get_int('modspecies', 200),
+        # Enough for maps on worlds the core svg filter does not skip
+        worlds=cli.get_int('worlds', 9),
+        seed=cli.get_int('seed', 0),
+    )
+    rounds = cli.get_int('rounds', 7)
+    min_time = cli.get_float('mintime', 0.05)
+    baseline_path = cli.get_path('baseline', BASELINE_PATH)
+    tolerance = cli.get_float('tolerance', 0.25)
+    only = cli.get_arg('only', None)
+    names = only.split(',') if only else list(CASES)
+    for name in names:
+        if name not in CASES:
+            raise ValueError(f'Unknown benchmark case: {name}')
+
+    baseline = load_baseline(baseline_path)
+    if baseline and baseline['params'] != params:
+        print(f'{baseline_path} was taken with other parameters, '
+              'not comparing.')
+        baseline = None
+
+    results = list()
+    skipped = list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ctx = make_context(Path(temp_dir), params)
+        print(f'{len(ctx.species)} core species, {params["mods"]} mods')
+        for name in names:
+            try:
+                fn = CASES[name](ctx)
+            except SkipCase as reason:
+                print(f'Skipping {name}: {reason}')
+                skipped.append(name)
+                continue
+            results.append(measure(name, fn, rounds, min_time))
+
+    slower = report(results, baseline, tolerance)
+    if cli.get_bool('save'):
+        save_baseline(baseline_path, params, results, skipped)
+        print(f'Baseline saved to {baseline_path}')
+    if slower and cli.get_bool('fail'):
+        print('Slower than the baseline:', ', '.join(slower))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,9 +1,7 @@
-from typing import Union
+from typing import Dict, Union
 
 from .file import JsonData
 
-EXT_BP_CLASS = 'x-bp-class'
-
 
 def get_path(blueprint: JsonData, no_class=False) -> str:
     out = blueprint.get('bp', None)
@@ -16,6 +14,10 @@ def get_path(blueprint: JsonData, no_class=False) -> str:
     return out
 
 
+# Class names by blueprint path, shared by every record of a blueprint
+_CLASS_NAMES: Dict[str, str] = dict()
+
+
 def get_class_name(blueprint: Union[JsonData, str]) -> str:
     if isinstance(blueprint, str):
         index = blueprint.index('.')
@@ -23,10 +25,14 @@ def get_class_name(blueprint: Union[JsonData, str]) -> str:
         if not out.endswith('_C'):
             return out + '_C'
         return out
-    else:
-        cached = blueprint.get(EXT_BP_CLASS, None)
-        if cached:
-            return cached
 
-        blueprint[EXT_BP_CLASS] = get_class_name(get_path(blueprint))
-        return blueprint[EXT_BP_CLASS]
+    # Species records resolve their class name once
+    out = getattr(blueprint, 'class_name', None)
+    if out:
+        return out
+
+    path = get_path(blueprint)
+    out = _CLASS_NAMES.get(path, None)
+    if out is None:
+        out = _CLASS_NAMES[path] = get_class_name(path)
+    return out
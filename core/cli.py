@@ -1,7 +1,10 @@
 import sys
+from contextlib import contextmanager
 from typing import Any
 from pathlib import Path
 
+from . import instrument
+
 
 def get_arg(name: str, default: Any) -> Any:
     name = '-' + name
@@ -29,4 +32,25 @@ def get_float(name: str, default: float) -> float:
 
 
 def get_path(name: str, default: Path) -> Path:
-    return Path(get_arg(name, default))
\ No newline at end of file
+    return Path(get_arg(name, default))
+
+
+@contextmanager
+def profiled(tool: str):
+    '''
+    Profiles the block if -profile <report.json> is given, writing the report
+    there once it ends. -nomemory leaves out memory tracing, which slows down
+    code that allocates a lot.
+    '''
+    report_path = get_arg('profile', None)
+    if not report_path:
+        yield
+        return
+
+    profiler = instrument.enable(tool, trace_memory=not get_bool('nomemory'))
+    try:
+        yield
+    finally:
+        profiler.write_report(Path(report_path))
+        instrument.disable()
+        print(f'Profile written to {report_path}', file=sys.stderr)
\ No newline at end of file
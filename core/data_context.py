@@ -1,8 +1,18 @@
+import os
+import re
+import threading
+
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union, List
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Union, \
+    List, Tuple
 
+from . import instrument
 from .const import CORE_GAME
 from .file import load_json, JsonData
+from .index import BY_CLASS, SpeciesIndex
+from .species import Species, load_species_records
+from .speciescache import load_species
 
 # TODO: extracted from metalpike experiment, clean up
 
@@ -20,24 +30,127 @@ def find_mod(manifest, id):
     return None
 
 
+class ObManifest:
+    '''
+    Species files listed in an ASB manifest, indexed by mod id. The core game
+    is listed under CORE_GAME. The first file listed for an id wins.
+    '''
+    def __init__(self, manifest: JsonData):
+        self.files: Dict[str, Tuple[str, Optional[JsonData]]] = dict()
+        for file, metadata in manifest['files'].items():
+            mod = metadata.get('mod', None)
+            self.files.setdefault(mod['id'] if mod else CORE_GAME, (file, mod))
+
+    def get_file(self, id: str) -> Optional[str]:
+        found = self.files.get(id, None)
+        return found[0] if found else None
+
+    def get_mod(self, id: str) -> Optional[JsonData]:
+        found = self.files.get(id, None)
+        return found[1] if found else None
+
+
+# Parsed once per Obelisk checkout
+_MANIFESTS: Dict[Path, ObManifest] = dict()
+
+
+def get_manifest(obelisk_path: Path) -> ObManifest:
+    key = obelisk_path.resolve()
+    manifest = _MANIFESTS.get(key, None)
+    if manifest is None:
+        manifest = _MANIFESTS[key] = ObManifest(
+            load_json(obelisk_path / ROOT_ASB / '_manifest.json'))
+    return manifest
+
+
 def find_mod_ex(obelisk_path, id):
-    manifest = load_json(obelisk_path / ROOT_ASB / '_manifest.json')
-    for file, metadata in manifest['files'].items():
-        mod = metadata.get('mod', None)
-        if not mod and id == CORE_GAME:
-            return None
-        elif mod and mod['id'] == id:
-            return mod
-    return None
+    return get_manifest(obelisk_path).get_mod(id)
 
 
-class ObASB:
-    data: List[JsonData]
+class SpeciesFile(NamedTuple):
+    # A list when the file is shared, otherwise read as it is iterated
+    species: Iterable[JsonData]
+    # Fields stored after the species are only set once they were iterated
+    fields: JsonData
 
-    def __init__(self, obelisk: Path, mod):
+    @property
+    def version(self) -> Optional[str]:
+        return self.fields.get('version', None)
+
+
+# Files read in the innermost shared_species_files() block, None outside one
+_shared_files: Optional[Dict[Path, SpeciesFile]] = None
+_SHARED_FILES_LOCK = threading.Lock()
+
+
+@contextmanager
+def shared_species_files():
+    '''
+    Within the block, each species file is read once and its species are kept
+    for every later load, from any thread. They are freed when the block
+    exits.
+    '''
+    global _shared_files
+    previous = _shared_files
+    _shared_files = dict()
+    try:
+        yield
+    finally:
+        _shared_files = previous
+
+
+def _stream_species(records: Iterable[JsonData]) -> Iterator[Species]:
+    count = 0
+    try:
+        for record in records:
+            count += 1
+            yield Species(record)
+    finally:
+        instrument.count('species.read', count)
+
+
+def load_species_file(path: Path) -> SpeciesFile:
+    '''
+    Opens an Obelisk species file, whose species can be iterated once and are
+    read as they are. Within shared_species_files(), the file is read once
+    instead and its species list is shared, so callers copy it before sorting
+    or changing it.
+    '''
+    shared = _shared_files
+    if shared is None:
+        records = load_species(path)
+        return SpeciesFile(_stream_species(records), records.fields)
+
+    key = path.resolve()
+    with _SHARED_FILES_LOCK:
+        loaded = shared.get(key, None)
+        if loaded is None:
+            instrument.count('species_files.misses')
+            with instrument.span(f'read {path.name}'):
+                records = load_species(path)
+                loaded = shared[key] = SpeciesFile(
+                    load_species_records(records), records.fields)
+            instrument.count('species.read', len(loaded.species))
+        else:
+            instrument.count('species_files.hits')
+    return loaded
+
+
+class ObASB:
+    '''
+    Species from one or more ASB value files. Files are only read when the
+    species are first needed, and lookups by blueprint path or class name go
+    through an index. The species are kept by the instance, or streamed
+    without keeping them through stream_dinos().
+    '''
+    def __init__(self, obelisk: Path, mod=None, mod_ids: Iterable[str] = ()):
         self.obelisk_path = obelisk
-        self.data = list()
+        self.files: List[str] = list()
+        self.versions: Dict[str, Optional[str]] = dict()
+        self._index: Optional[SpeciesIndex] = None
         self.include(self.get_file_name(mod))
+        for mod_id in mod_ids:
+            self.include_mod(mod_id)
 
     def get_file_name(self, mod):
         if not mod:
@@ -46,16 +159,133 @@ class ObASB:
         return mod['id'] + '-' + mod['tag'] + '.json'
 
     def include(self, filename):
-        new_data = load_json(self.obelisk_path / ROOT_ASB / filename)
-        self.data += new_data['species']
+        if filename in self.files:
+            return
+        self.files.append(filename)
+        self._index = None
+
+    def include_mod(self, id: str):
+        filename = get_manifest(self.obelisk_path).get_file(id)
+        if not filename:
+            # Official mods are published as '<id>-<id>.json'
+            filename = f'{id}-{id}.json'
+        self.include(filename)
+
+    @property
+    def paths(self) -> List[Path]:
+        return [self.obelisk_path / ROOT_ASB / filename
+                for filename in self.files]
+
+    def _read(self, filename: str, path: Path) -> Iterator[JsonData]:
+        species_file = load_species_file(path)
+        yield from species_file.species
+        self.versions[filename] = species_file.version
+
+    def stream_dinos(self) -> Iterator[JsonData]:
+        '''Species of every file in order, read as they are iterated.'''
+        if self._index is not None:
+            yield from self._index.species
+            return
+        for filename, path in zip(self.files, self.paths):
+            yield from self._read(filename, path)
+
+    @property
+    def index(self) -> SpeciesIndex:
+        if self._index is None:
+            index = SpeciesIndex()
+            for filename, path in zip(self.files, self.paths):
+                index.extend(self._read(filename, path))
+            self._index = index
+        return self._index
+
+    @property
+    def data(self) -> List[JsonData]:
+        return self.index.species
+
+    @property
+    def version(self) -> Optional[str]:
+        '''Version of the first included file.'''
+        if self.files[0] not in self.versions:
+            self.index  # Reads the files and their versions
+        return self.versions[self.files[0]]
 
     def get_dinos(self):
         return self.data
 
     def get_dino(self, blueprint_path: str):
-        for dino in self.get_dinos():
-            if dino['blueprintPath'] == blueprint_path:
-                return dino
+        return self.index.get(blueprint_path)
+
+    def get_dino_by_class(self, class_name: str):
+        return self.index.get(class_name, on=BY_CLASS)
+
+
+SVG_NAME_REGEX = re.compile(r'^Spawning_(.+?)(?:_\((.+)\))?\.svg$')
+
+SvgKey = Tuple[Optional[str], str, Optional[str]]
+SvgEntry = Tuple[str, Path]
+
+
+def _scan_files(path: str):
+    with os.scandir(path) as entries:
+        for entry in entries:
+            yield entry
+
+
+class SvgIndex:
+    '''
+    Spawn maps found under a spawns directory, keyed by mod folder
+    ("<id>-<tag>", None for the core game), class name and the mod of the
+    species (None for the core game). Worlds are listed in name order.
+    '''
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[SvgKey, List[SvgEntry]] = dict()
+        self._scan()
+
+    def _add(self, mod_tag: Optional[str], world: str, entry: os.DirEntry):
+        match = SVG_NAME_REGEX.match(entry.name)
+        if not match or not entry.is_file():
+            return
+        class_name, dino_mod = match.groups()
+        key = (mod_tag, class_name, dino_mod)
+        self.entries.setdefault(key, list()).append((world,
+                                                     Path(entry.path)))
+
+    def _scan(self):
+        if not self.path.is_dir():
+            return
+
+        worlds = sorted((entry for entry in _scan_files(self.path)
+                         if entry.is_dir()), key=lambda entry: entry.name)
+        for world in worlds:
+            for entry in sorted(_scan_files(world.path),
+                                key=lambda entry: entry.name):
+                if entry.is_dir():
+                    for file in _scan_files(entry.path):
+                        self._add(entry.name, world.name, file)
+                else:
+                    self._add(None, world.name, entry)
+
+    def get(self, mod_tag: Optional[str], class_name: str,
+            dino_mod: Optional[str]) -> List[SvgEntry]:
+        return self.entries.get((mod_tag, class_name, dino_mod), [])
+
+
+# Shared by every ObSVGs over the same directory
+_SVG_INDEXES: Dict[Path, SvgIndex] = dict()
+
+
+def clear_svg_indexes():
+    '''Forgets the scanned spawns directories, so they are scanned again.'''
+    _SVG_INDEXES.clear()
+
+
+def get_svg_index(path: Path) -> SvgIndex:
+    key = path.resolve()
+    index = _SVG_INDEXES.get(key, None)
+    if index is None:
+        index = _SVG_INDEXES[key] = SvgIndex(path)
+    return index
 
 
 class ObSVGs:
@@ -64,14 +294,21 @@ class ObSVGs:
     def __init__(self, path: Path, mod):
         self.mod = mod
         self.path = path / 'spawns'
+        self._index: Optional[SvgIndex] = None
+
+    @property
+    def index(self) -> SvgIndex:
+        if self._index is None:
+            self._index = get_svg_index(self.path)
+        return self._index
+
+    def find(self, mod, class_name: str,
+             dino_mod: Optional[str]) -> List[SvgEntry]:
+        '''Returns the (world, path) pairs of the maps of a species.'''
+        mod_tag = mod['id'] + '-' + mod['tag'] if mod else None
+        if dino_mod == CORE_GAME:
+            dino_mod = None
+        return self.index.get(mod_tag, class_name, dino_mod or None)
 
     def list(self, mod, class_name: str, dino_mod: Optional[str]):
-        pattern = '*'
-        if mod:
-            pattern += '/' + mod['id'] + '-' + mod['tag']
-        pattern += f'/Spawning_{class_name}'
-        if dino_mod and dino_mod != CORE_GAME:
-            pattern += f'_({dino_mod})'
-        pattern += '.svg'
-
-        return self.path.glob(pattern)
+        return [path for _, path in self.find(mod, class_name, dino_mod)]
@@ -1,12 +1,14 @@
 import re
-from typing import Optional
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
 
+from . import instrument
 from .blueprint import get_class_name, get_path
 from .file import JsonData
-from .filter import Filter
+from .filter import BPTrie, Filter
 
 
-def get_descriptive_name(flt: Optional[Filter], blueprint: JsonData) -> str:
+def resolve_descriptive_name(flt: Optional[Filter], blueprint: JsonData) -> str:
     def _get_name() -> str:
         if not flt or not flt.dinoNameOverrides:
             return blueprint['name']
@@ -35,38 +37,127 @@ def get_descriptive_name(flt: Optional[Filter], blueprint: JsonData) -> str:
     return name
 
 
-def should_skip(flt: Filter, blueprint: JsonData) -> bool:
-    blueprint_path = get_path(blueprint, no_class=True)
-    class_name = get_class_name(blueprint)
-    name = get_descriptive_name(flt, blueprint)
-    selectors = flt.selectors
-
-    # Execute custom regex checks if any are given
-    if selectors.matchRegex:
-        re_name = selectors.matchRegex.get('name', None)
-        if re_name and not re.match(re_name, name):
-            return True
+class NameResolver:
+    '''
+    Descriptive names of a filter, cached by blueprint path. Dropped together
+    with other derived data when the filter is updated.
+    '''
+    def __init__(self, flt: Filter):
+        self.flt = flt
+        # Blueprint path -> (raw name, variants, descriptive name)
+        self.names: Dict[str, Tuple[str, Any, str]] = dict()
+
+    def resolve(self, blueprint: JsonData) -> str:
+        key = get_path(blueprint)
+        cached = self.names.get(key, None)
+        # Data sets may disagree on the name of a blueprint, so only reuse
+        # names computed from the same inputs.
+        if cached and cached[0] == blueprint['name'] \
+                and cached[1] == blueprint.get('variants', None):
+            instrument.count('names.hits')
+            return cached[2]
+
+        instrument.count('names.misses')
+        name = resolve_descriptive_name(self.flt, blueprint)
+        self.names[key] = (blueprint['name'], blueprint.get('variants',
+                                                            None), name)
+        return name
+
+
+def get_name_resolver(flt: Filter) -> NameResolver:
+    return flt.get_derived('names', NameResolver)
+
+
+def get_descriptive_name(flt: Optional[Filter], blueprint: JsonData) -> str:
+    if not flt:
+        return resolve_descriptive_name(flt, blueprint)
+    return get_name_resolver(flt).resolve(blueprint)
+
 
-    # Check if dino is in the ignore list.
-    if blueprint_path in selectors.ignoreBPs:
-        return True
+@dataclass(frozen=True)
+class CompiledSelectors:
+    '''
+    Predicate form of a filter's CreatureSelectors. Regexes are compiled,
+    lists turned into sets and BP lists into segment tries once, instead of on
+    every should_skip call.
+    '''
+    flt: Filter
+    match_name: Optional[Pattern]
+    ignore_bps: BPTrie
+    include_bps: BPTrie
+    include_classes: FrozenSet[str]
+    ignore_classes: FrozenSet[str]
+    ignore_variants: FrozenSet[str]
+    use_ignore_lists: bool
 
-    # Branch off if the ignore options are used
-    if selectors.ignoreClasses or selectors.ignoreVariants:
-        # Force include a dino if it's in includeDinoClasses
-        if class_name in selectors.includeClasses:
-            return False
+    @classmethod
+    def compile(cls, flt: Filter) -> 'CompiledSelectors':
+        selectors = flt.selectors
+        re_name = selectors.matchRegex.get('name', None) \
+                  if selectors.matchRegex else None
+        return cls(
+            flt=flt,
+            match_name=re.compile(re_name) if re_name else None,
+            ignore_bps=selectors.ignoreBPs.compile(),
+            include_bps=selectors.includeBPs.compile(),
+            include_classes=frozenset(selectors.includeClasses),
+            ignore_classes=frozenset(selectors.ignoreClasses),
+            ignore_variants=frozenset(selectors.ignoreVariants),
+            use_ignore_lists=bool(selectors.ignoreClasses
+                                  or selectors.ignoreVariants),
+        )
 
-        # Ignore it if it's listed on one of the lists
-        if class_name in selectors.ignoreClasses:
+    def should_skip(self, blueprint: JsonData) -> bool:
+        # Execute custom regex checks if any are given
+        if self.match_name and not self.match_name.match(
+                get_descriptive_name(self.flt, blueprint)):
             return True
-        elif any(variant in selectors.ignoreVariants
-                 for variant in blueprint.get('variants', [])):
+
+        # Check if dino is in the ignore list.
+        blueprint_path = get_path(blueprint, no_class=True)
+        if blueprint_path in self.ignore_bps:
             return True
-    elif selectors.includeBPs.values and blueprint_path not in selectors.includeBPs:
-        return True
-    elif selectors.includeClasses:
-        if class_name not in selectors.includeClasses:
+
+        # Branch off if the ignore options are used
+        if self.use_ignore_lists:
+            class_name = get_class_name(blueprint)
+            # Force include a dino if it's in includeDinoClasses
+            if class_name in self.include_classes:
+                return False
+
+            # Ignore it if it's listed on one of the lists
+            if class_name in self.ignore_classes:
+                return True
+            elif self.ignore_variants and not self.ignore_variants.isdisjoint(
+                    blueprint.get('variants', [])):
+                return True
+        elif self.include_bps and blueprint_path not in self.include_bps:
             return True
+        elif self.include_classes:
+            if get_class_name(blueprint) not in self.include_classes:
+                return True
+
+        return False
+
+    __call__ = should_skip
 
-    return False
+    def partition(
+        self, species: Iterable[JsonData]
+    ) -> Tuple[List[JsonData], List[JsonData]]:
+        '''Splits species into included and skipped lists, keeping order.'''
+        included: List[JsonData] = list()
+        skipped: List[JsonData] = list()
+        for blueprint in species:
+            if self.should_skip(blueprint):
+                skipped.append(blueprint)
+            else:
+                included.append(blueprint)
+        return included, skipped
+
+
+def get_selectors(flt: Filter) -> CompiledSelectors:
+    return flt.get_derived('selectors', CompiledSelectors.compile)
+
+
+def should_skip(flt: Filter, blueprint: JsonData) -> bool:
+    return get_selectors(flt).should_skip(blueprint)
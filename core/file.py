@@ -1,17 +1,24 @@
+import difflib
 import json
+import os
 import re
+import threading
+
+from operator import itemgetter
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Iterable, \
+                   Iterator, NamedTuple, Optional, Sequence, Set, TextIO
 
-from typing import Dict, Any, List, Iterable
 from .filter import Filter
+from .jsonutils import DUMP_PROFILE, layout_json, write_json
 
-JsonData = Dict[str, Any]
+if TYPE_CHECKING:
+    import numpy as np
 
-# Reduce 2-12 numbers in an array onto a single line
-JOIN_MULTIPLE_NUMBERS_REGEX = re.compile(
-    r'(\n\s+)[-+.\de]+,(?:\n\s+(?:[-+.\de"]|null)+,?){1,12}')
+JsonData = Dict[str, Any]
 
-# Reduce arrays with only a single line of content (including previously joined multiple fields) to a single line
-COLLAPSE_SINGLE_LINE_ARRAY_REGEX = re.compile(r'\[\s+(.+)\s+\]')
+WHITESPACE_REGEX = re.compile(r'[ \t\n\r]*')
+VALUE_TERMINATORS = frozenset(' \t\n\r,:]}')
+STREAM_CHUNK_SIZE = 1 << 16
 
 
 def load_json(filename: str) -> JsonData:
@@ -19,22 +26,150 @@ def load_json(filename: str) -> JsonData:
         return json.load(fp)
 
 
-def _flatten_re_result(match):
-    txt = match[0]
-    txt = re.sub(r'\s*\n\s+', '', txt)
-    txt = txt.replace(',', ', ')
-    return f'{match[1]}{txt}'
+def save_json_atomic(filename, data: Any):
+    '''
+    Writes the data next to `filename` and moves it into place, so readers
+    never see a partially written file.
+    '''
+    # Unique per process and thread, as several may save the same file
+    temp_filename = f'{filename}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temp_filename, 'wt') as fp:
+        json.dump(data, fp)
+    os.replace(temp_filename, filename)
+
+
+class JsonStream:
+    '''
+    Reads records from one array field of a JSON document one at a time,
+    without loading the whole document. Other top-level fields are collected
+    in `fields` as they are passed; fields stored after the array are only
+    available once the records have been consumed.
+    '''
+    def __init__(self, filename: str, key: str = 'species'):
+        self.filename = filename
+        self.key = key
+        self.fields: JsonData = dict()
+        self._decoder = json.JSONDecoder()
+        self._consumed = False
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.fields.get('version', None)
+
+    def __iter__(self) -> Iterator[JsonData]:
+        if self._consumed:
+            raise ValueError(f'{self.filename} has already been streamed')
+        self._consumed = True
+
+        with open(self.filename, 'rt') as fp:
+            self._fp = fp
+            self._buffer = ''
+            self._pos = 0
+            self._eof = False
+            yield from self._read_document()
+            self._fp = None
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._fp.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop consumed text before growing the buffer
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = WHITESPACE_REGEX.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError(f'Unexpected end of {self.filename}')
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f'Expected one of "{chars}" at offset '
+                             f'{self._pos} of {self.filename}, found "{char}"')
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # Keys and values inside a container are always followed by a
+                # separator, anything else may be a truncated number.
+                if end < len(self._buffer) \
+                        and self._buffer[end] in VALUE_TERMINATORS:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill():
+                raise ValueError(f'Unexpected end of {self.filename}')
+
+    def _read_document(self) -> Iterator[JsonData]:
+        self._expect('{')
+        if self._peek() == '}':
+            return
+
+        while True:
+            name = self._value()
+            self._expect(':')
+            if name == self.key:
+                yield from self._read_array()
+            else:
+                self.fields[name] = self._value()
+
+            if self._expect(',}') == '}':
+                return
+
+    def _read_array(self) -> Iterator[JsonData]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
 
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+
+def stream_json(filename: str, key: str = 'species') -> JsonStream:
+    return JsonStream(filename, key)
+
+
+def dump_json(flt: Filter, data: JsonData,
+              fp: Optional[TextIO] = None) -> Optional[str]:
+    '''
+    Returns the data as text, or writes it to `fp` in chunks as it is laid
+    out if one is given.
+    '''
+    if fp is None:
+        if flt.prettifyOutput:
+            return layout_json(data, DUMP_PROFILE)
+        return json.dumps(data, indent=None)
 
-def dump_json(flt: Filter, data: JsonData) -> str:
     if flt.prettifyOutput:
-        result = json.dumps(data, indent='  ')
-        result = re.sub(JOIN_MULTIPLE_NUMBERS_REGEX, _flatten_re_result,
-                        result)
-        result = re.sub(COLLAPSE_SINGLE_LINE_ARRAY_REGEX, r"[ \1 ]", result)
-        return result
+        write_json(fp, data, DUMP_PROFILE)
     else:
-        return json.dumps(data, indent=None)
+        json.dump(data, fp, indent=None)
+    return None
+
+
+def print_output(flt: Filter, fp: TextIO, game_version: Optional[str],
+                 data: Any):
+    '''Writes the data after a line with the game version.'''
+    print('// Version:', game_version, file=fp)
+    dump_json(flt, data, fp)
+    print(file=fp)
 
 
 def load_strml(filename: str) -> List[str]:
@@ -43,41 +178,219 @@ def load_strml(filename: str) -> List[str]:
         return [line for line in lines if not line.startswith('#')]
 
 
-def query(data: List[JsonData], *conditions) -> Iterable[JsonData]:
-    for entry in data:
-        for args in conditions:
-            where = args['where']
-            contained_in = args.get('contained_in', None)
-            equals = args.get('equals', None)
-            not_null = args.get('not_null', None)
-            greater_than = args.get('greater_than', None)
-
-            if callable(where):
-                val = where(entry)
-            else:
-                val = entry.get(where, None)
+Predicate = Callable[[Any], bool]
+
+
+def _compile_contained_in(values: Iterable[Any]) -> Predicate:
+    values = list(values)
+    try:
+        members: Optional[frozenset] = frozenset(values)
+    except TypeError:
+        members = None
+
+    def _contained_in_(val: Any) -> bool:
+        if members is not None:
+            try:
+                return val in members
+            except TypeError:
+                # Unhashable values are compared one by one, as in a list
+                pass
+        return val in values
+
+    return _contained_in_
+
+
+def compile_condition(args: Dict[str, Any]) -> Predicate:
+    '''
+    Turns a condition of query() into a function of an entry. The value
+    passes if any of the given tests does; they are tried cheapest first,
+    with greater_than, which may raise, left for last.
+    '''
+    where = args['where']
+    contained_in = args.get('contained_in', None)
+    equals = args.get('equals', None)
+    not_null = args.get('not_null', None)
+    greater_than = args.get('greater_than', None)
+
+    get: Callable[[Any], Any]
+    if callable(where):
+        get = where
+    else:
+        get = lambda entry: entry.get(where, None)
+
+    tests: List[Predicate] = []
+    if not_null:
+        tests.append(bool)
+    if equals != None:
+        tests.append(lambda val: val == equals)
+    if contained_in:
+        tests.append(_compile_contained_in(contained_in))
+    if greater_than:
+        tests.append(lambda val: val > greater_than)
+
+    if not tests:
+        return lambda entry: False
+    if len(tests) == 1:
+        test = tests[0]
+        return lambda entry: bool(test(get(entry)))
+
+    def _condition_(entry: Any) -> bool:
+        val = get(entry)
+        for test in tests:
+            if test(val):
+                return True
+        return False
+
+    return _condition_
+
+
+def plan_query(conditions: Sequence[Dict[str, Any]]) -> List[Predicate]:
+    '''
+    Compiles the conditions of a query, checking fields of the entries before
+    conditions that call functions. Those keep their order, as earlier ones
+    may exclude the entries later ones would fail on.
+    '''
+    def _cost_(args: Dict[str, Any]) -> int:
+        if callable(args['where']) or args.get('greater_than', None):
+            return 1
+        return 0
+
+    return [compile_condition(args)
+            for args in sorted(conditions, key=_cost_)]
+
 
-            if not ( (contained_in and val in contained_in) \
-                or   (equals != None and val == equals) \
-                or   (not_null and val) \
-                or   (greater_than and val > greater_than) ):
+def query(data: Iterable[JsonData], *conditions) -> Iterable[JsonData]:
+    plan = plan_query(conditions)
+    if len(plan) == 1:
+        yield from filter(plan[0], data)
+        return
+
+    for entry in data:
+        for condition in plan:
+            if not condition(entry):
                 break
         else:
             yield entry
 
 
-def validate(data: List[JsonData], contains_range=None, of=None):
-    tracker = set()
+def query_mask(data: Sequence[JsonData], *conditions) -> 'np.ndarray':
+    '''
+    Which entries of `data` match the conditions, as a boolean array. Each
+    condition is only checked on the entries that passed the ones before.
+    '''
+    # Only tools that work on arrays pay for importing numpy
+    import numpy as np
+
+    mask = np.ones(len(data), dtype=bool)
+    for condition in plan_query(conditions):
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            break
+        entries = itemgetter(*rows)(data) if len(rows) > 1 \
+            else (data[rows[0]],)
+        passed = np.fromiter(map(condition, entries), dtype=bool,
+                             count=len(rows))
+        mask[rows[~passed]] = False
+    return mask
+
+
+def _key_function(of) -> Callable[[JsonData], Any]:
+    if callable(of):
+        return of
+    return lambda entry: entry.get(of, None)
+
+
+class Coverage(NamedTuple):
+    # Entries whose key is required, in the order of the data
+    rows: List[JsonData]
+    # Required keys no entry had, in the order they were given
+    missing: List[Any]
+    # Keys of the entries read
+    seen: Set[Any]
+
+    def check(self):
+        report_uncovered(self.missing, self.seen)
+
+
+def select_covering(data: Iterable[JsonData], required: Iterable[Any], of,
+                    first_only: bool = False) -> Coverage:
+    '''
+    Keeps the entries whose key is one of `required`, and finds the keys none
+    of them had. Each entry's key is computed once. With `first_only`, only
+    the first entry of each key is kept, and reading stops as soon as every
+    key was found.
+    '''
+    get = _key_function(of)
+    required = list(dict.fromkeys(required))
+    wanted = set(required)
+    remaining = set(wanted)
+    rows: List[JsonData] = []
+    seen: Set[Any] = set()
 
     for entry in data:
-        if callable(of):
-            val = of(entry)
-        else:
-            val = entry.get(of, None)
-        tracker.add(val)
-
-    diff = set(contains_range) - tracker
-    if diff:
-        message = 'This data cannot be used to cover the filter: following entries could not be satisfied.\n\n' \
-                  + ', '.join(diff)
-        raise ValueError(message)
+        key = get(entry)
+        seen.add(key)
+        if key not in wanted:
+            continue
+        if first_only and key not in remaining:
+            continue
+
+        rows.append(entry)
+        remaining.discard(key)
+        if first_only and not remaining:
+            break
+
+    missing = [key for key in required if key in remaining]
+    return Coverage(rows, missing, seen)
+
+
+def validate(data: Iterable[JsonData], contains_range=None, of=None):
+    select_covering(data, contains_range, of, first_only=True).check()
+
+
+def validated(data: Iterable[JsonData], contains_range=None,
+              of=None) -> Iterator[JsonData]:
+    '''
+    Passes entries through, raising the same error as validate() once the data
+    is exhausted. Keys stop being computed once every one was found.
+    '''
+    get = _key_function(of)
+    required = list(dict.fromkeys(contains_range))
+    remaining = set(required)
+    seen: Set[Any] = set()
+
+    for entry in data:
+        if remaining:
+            key = get(entry)
+            seen.add(key)
+            remaining.discard(key)
+        yield entry
+
+    report_uncovered([key for key in required if key in remaining], seen)
+
+
+def report_uncovered(diff: Iterable[str], candidates: Iterable[Any] = ()):
+    '''
+    Raises ValueError listing the keys that were not found. Keys similar to
+    them among `candidates` are suggested.
+    '''
+    diff = list(diff)
+    if not diff:
+        return
+
+    message = 'This data cannot be used to cover the filter: following entries could not be satisfied.\n\n' \
+              + ', '.join(map(str, diff))
+
+    names = [name for name in candidates if isinstance(name, str)]
+    suggestions = []
+    for key in diff:
+        if not isinstance(key, str):
+            continue
+        close = difflib.get_close_matches(key, names, n=3)
+        if close:
+            suggestions.append(f'  {key}: did you mean {", ".join(close)}?')
+    if suggestions:
+        message += '\n\nSimilar entries in the data:\n' \
+                   + '\n'.join(suggestions)
+
+    raise ValueError(message)
@@ -1,12 +1,23 @@
 import yaml
 import copy
+import hashlib
+import os
+import pickle
 from pathlib import Path
-from typing import List, Dict, Optional, Type, Any, cast, Union
+from typing import List, Dict, Optional, Type, Any, Callable, Tuple, cast, \
+                   Union
 
+from . import instrument
 from .const import CORE_GAME
 
 _FILTERS_: Dict[str, Type] = dict()
 
+FILTER_CACHE_DIR = Path('data/cache/filters')
+FILTER_CACHE_VERSION = 1
+
+# Parsed filter documents by path, with the mtime and size they were read at
+_DOCUMENTS: Dict[Path, Tuple[int, int, Any]] = dict()
+
 
 def namespace(name):
     def _ns_filter_(kls):
@@ -17,11 +28,18 @@ def namespace(name):
 
 
 class Deserializable:
+    '''
+    Fields start out as copies of the defaults of the class, which are flat
+    or fresh instances. Lists and dicts taken from a source are copied too,
+    as parsed documents are shared.
+    '''
     def __init__(self):
         for field_name in self.get_fields():
             value = getattr(self, field_name, None)
-            if value != None:
-                setattr(self, field_name, copy.deepcopy(value))
+            if isinstance(value, Deserializable):
+                setattr(self, field_name, type(value)())
+            elif isinstance(value, (list, dict, BPTrie)):
+                setattr(self, field_name, value.copy())
 
     def get_fields(self):
         # Yields all type annotations from this object.
@@ -37,33 +55,95 @@ class Deserializable:
 
             if field != None:
                 existing = getattr(self, field_name, None)
+                # Pass data to a Deserializable object
+                if isinstance(existing, Deserializable):
+                    existing.update(field, override)
+                    continue
+
                 if not override and existing:
-                    # Pass data to a Deserializable object
-                    if isinstance(existing, Deserializable):
-                        existing.update(field, override)
-                        continue
                     # Join lists and dicts
-                    elif isinstance(existing, list):
-                        existing += field
+                    if isinstance(existing, list):
+                        existing += copy.deepcopy(field)
                         continue
                     elif isinstance(existing, dict):
                         existing = {**existing, **field}
                         continue
 
                 # Set field list
+                if isinstance(field, (list, dict)):
+                    field = copy.deepcopy(field)
                 setattr(self, field_name, field)
 
 
 BPTree = List[Union[str, Dict[str, Any]]]
 
 
+class BPTrie:
+    '''
+    Blueprint paths stored as a tree of path segments. A path is contained if
+    it, or one of its parents, was added to the tree.
+    '''
+    # Marks the end of an added path; never a segment of a split path.
+    LEAF = ''
+
+    def __init__(self):
+        self.root: Dict[str, Any] = dict()
+
+    def __bool__(self) -> bool:
+        return bool(self.root)
+
+    def split(self, path: str) -> List[str]:
+        # Collapses spurious slashes and single dots, like pathlib does
+        parts = [part for part in path.split('/') if part and part != '.']
+        if path.startswith('/'):
+            parts.insert(0, '/')
+        return parts
+
+    def add(self, path: str):
+        node = self.root
+        for part in self.split(path):
+            node = node.setdefault(part, dict())
+        node[self.LEAF] = True
+
+    def copy(self) -> 'BPTrie':
+        out = BPTrie()
+        out.root = copy.deepcopy(self.root)
+        return out
+
+    def __contains__(self, path: str) -> bool:
+        node = self.root
+        if not node:
+            return False
+
+        if path.startswith('/'):
+            node = node.get('/', None)
+            if node is None:
+                return False
+            if self.LEAF in node:
+                return True
+
+        for part in path.split('/'):
+            if not part or part == '.':
+                continue
+
+            node = node.get(part, None)
+            if node is None:
+                return False
+            if self.LEAF in node:
+                return True
+
+        return False
+
+
 class CreatureBPList(Deserializable):
-    values: List[Path] = list()
+    values: List[str] = list()
+    tree: BPTrie = BPTrie()
 
     def update(self, source: Any, override=False):
         source = cast(BPTree, source)
         if override:
             self.values = list()
+            self.tree = BPTrie()
 
         self.update_slice(source)
 
@@ -72,8 +152,9 @@ class CreatureBPList(Deserializable):
 
     def update_slice(self, source: Union[str, BPTree], path: List[str] = ['']):
         if isinstance(source, str):
-            result = Path('/'.join([*path, self.clean_node(source)]))
+            result = '/'.join([*path, self.clean_node(source)])
             self.values.append(result)
+            self.tree.add(result)
             return
 
         if isinstance(source, list):
@@ -89,18 +170,12 @@ class CreatureBPList(Deserializable):
 
         raise ValueError('Unknown field type when updating CreatureBPList')
 
-    def __contains__(self, item: str):
-        # End if list is empty
-        if not self.values:
-            return False
+    def compile(self) -> BPTrie:
+        # Detached from later updates to this list
+        return copy.deepcopy(self.tree)
 
-        itemp = Path(item)
-        for node in self.values:
-            # Check if the node is the same as item or a parent of itemp
-            if node == itemp or node in itemp.parents:
-                return True
-
-        return False
+    def __contains__(self, item: str):
+        return item in self.tree
 
 
 class CreatureSelectors(Deserializable):
@@ -128,16 +203,56 @@ class Filter(Deserializable):
 
     debugNames: bool = False
 
-
-def load_filter(filename: str) -> Filter:
-    with open(filename, 'rt') as fp:
+    def update(self, source: Any, override=False):
+        super().update(source, override)
+        # Derived data has to be rebuilt from the new field values
+        self.__dict__.pop('_derived', None)
+
+    def get_derived(self, key: str, factory: Callable[['Filter'], Any]) -> Any:
+        '''
+        Returns data computed from this filter's fields, caching it until the
+        filter is updated.
+        '''
+        derived = self.__dict__.setdefault('_derived', dict())
+        if key not in derived:
+            derived[key] = factory(self)
+        return derived[key]
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_document(filename: Union[str, Path]) -> Any:
+    '''
+    Parses a filter file, reusing the document from an earlier call if the
+    file has not changed since. Documents are shared, and must not be
+    modified; filters copy what they take from them.
+    '''
+    path = Path(filename).resolve()
+    mtime, size = _stat(path)
+    cached = _DOCUMENTS.get(path, None)
+    if cached and cached[:2] == (mtime, size):
+        instrument.count('filter_documents.hits')
+        return cached[2]
+    instrument.count('filter_documents.misses')
+
+    with open(path, 'rt') as fp:
         doc = yaml.safe_load(fp)
+    _DOCUMENTS[path] = (mtime, size, doc)
+    return doc
+
+
+def _resolve_filter(filename: str, sources: List[Path]) -> Filter:
+    doc = load_document(filename)
+    sources.append(Path(filename))
 
     nsname = doc.get('namespace', 'default')
     fltcls = _FILTERS_[nsname]
 
     if 'import' in doc:
-        out = load_filter(doc['import'])
+        out = _resolve_filter(doc['import'], sources)
         assert isinstance(out, fltcls)
     else:
         out = fltcls()
@@ -151,3 +266,64 @@ def load_filter(filename: str) -> Filter:
         out.update(overrides, override=True)
 
     return out
+
+
+def _get_cache_path(filename: str, cache_dir: Path) -> Path:
+    key = str(Path(filename).resolve()).encode('utf-8')
+    return cache_dir / f'{hashlib.sha1(key).hexdigest()}.pickle'
+
+
+def _load_cached_filter(filename: str, cache_path: Path) -> Optional[Filter]:
+    try:
+        with open(cache_path, 'rb') as fp:
+            version, sources, flt = pickle.load(fp)
+        if version != FILTER_CACHE_VERSION:
+            return None
+        for source, stat in sources:
+            if _stat(Path(source)) != stat:
+                return None
+    except (OSError, EOFError, ValueError, TypeError, AttributeError,
+            ImportError, pickle.UnpicklingError):
+        return None
+
+    flt.path = filename
+    return flt
+
+
+def _save_cached_filter(flt: Filter, sources: List[Path], cache_path: Path):
+    data = (FILTER_CACHE_VERSION,
+            [(str(source.resolve()), _stat(source)) for source in sources],
+            flt)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per process and thread, as jobs may load the same filter
+        temp_path = cache_path.with_name(
+            f'{cache_path.name}.{os.getpid()}-{id(sources)}.tmp')
+        with open(temp_path, 'wb') as fp:
+            pickle.dump(data, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def load_filter(filename: str, cache_dir: Optional[Path] = None) -> Filter:
+    '''
+    Loads a filter and the chain of filters it imports. With `cache_dir`, the
+    resolved filter is also pickled there and reused until any file of the
+    chain changes.
+    '''
+    filename = str(filename)
+    if cache_dir is None:
+        return _resolve_filter(filename, [])
+
+    cache_path = _get_cache_path(filename, cache_dir)
+    flt = _load_cached_filter(filename, cache_path)
+    if flt is not None:
+        instrument.count('filter_cache.hits')
+        return flt
+    instrument.count('filter_cache.misses')
+
+    sources: List[Path] = []
+    flt = _resolve_filter(filename, sources)
+    _save_cached_filter(flt, sources, cache_path)
+    return flt
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from . import instrument
+from .file import save_json_atomic
+
+__all__ = [
+    'HashCache',
+    'StatKey',
+    'hash_file',
+    'load_hash_cache',
+]
+
+CACHE_VERSION = 1
+HASH_CHUNK_SIZE = 1 << 16
+
+# Size and mtime_ns of a file
+StatKey = Tuple[int, int]
+
+
+def hash_file(path: Path) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(HASH_CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class HashCache:
+    '''
+    SHA-1 digests of local files, keyed by path and trusted for as long as
+    the file keeps its size and mtime_ns. The stat is taken before a file is
+    hashed, so one changed while being hashed is hashed again next time.
+    '''
+    path: Optional[Path]
+
+    def __init__(self, path: Optional[Path] = None,
+                 entries: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.entries: Dict[str, dict] = entries if entries is not None \
+                                        else dict()
+        self._dirty = False
+
+    def stat_key(self, file: Path) -> StatKey:
+        stat = os.stat(file)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, file: Path, stat_key: StatKey) -> Optional[str]:
+        '''Returns the cached digest if the file had the same stat then.'''
+        entry = self.entries.get(str(file), None)
+        if entry and (entry['size'], entry['mtime_ns']) == stat_key:
+            instrument.count('hash_cache.hits')
+            return entry['sha1']
+        instrument.count('hash_cache.misses')
+        return None
+
+    def put(self, file: Path, sha1: str, stat_key: StatKey):
+        '''Caches a digest with the stat taken before the file was hashed.'''
+        size, mtime_ns = stat_key
+        entry = self.entries.get(str(file), None)
+        if entry and entry['sha1'] == sha1 and entry['size'] == size \
+                and entry['mtime_ns'] == mtime_ns:
+            return
+        self.entries[str(file)] = dict(size=size, mtime_ns=mtime_ns,
+                                       sha1=sha1)
+        self._dirty = True
+
+    def prune(self):
+        '''Forgets the files that no longer exist.'''
+        missing = [file for file in self.entries if not os.path.exists(file)]
+        for file in missing:
+            del self.entries[file]
+        self._dirty = self._dirty or bool(missing)
+
+    def clear(self):
+        self._dirty = self._dirty or bool(self.entries)
+        self.entries.clear()
+
+    def save(self):
+        '''Writes the cache out if anything changed since it was loaded.'''
+        if not self.path or not self._dirty:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        save_json_atomic(self.path,
+                         dict(version=CACHE_VERSION, files=self.entries))
+        self._dirty = False
+
+
+def load_hash_cache(path: Path) -> HashCache:
+    '''
+    Reads a cache written by HashCache.save. A missing, unreadable or
+    outdated file yields an empty cache that will be written to `path`.
+    '''
+    try:
+        with open(path, 'rt') as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return HashCache(path)
+
+    if data.get('version', None) != CACHE_VERSION:
+        return HashCache(path)
+    return HashCache(path, data['files'])
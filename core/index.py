@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, \
+                   Tuple, TypeVar, Union
+
+from .blueprint import get_class_name, get_path
+from .file import JsonData, report_uncovered
+
+__all__ = [
+    'BY_BLUEPRINT',
+    'BY_CLASS',
+    'BY_ASSET',
+    'JoinResult',
+    'SpeciesIndex',
+]
+
+BY_BLUEPRINT = 'blueprint'
+BY_CLASS = 'class'
+BY_ASSET = 'asset'
+
+T = TypeVar('T')
+Key = Union[JsonData, str]
+
+
+def get_asset_path(blueprint: Key) -> str:
+    if isinstance(blueprint, str):
+        index = blueprint.find('.')
+        return blueprint if index < 0 else blueprint[:index]
+    return get_path(blueprint, no_class=True)
+
+
+def get_class_path(blueprint: Key) -> str:
+    # Species records resolve their class path once
+    class_path = getattr(blueprint, 'class_path', None)
+    if class_path:
+        return class_path
+    # ASB refers to the asset object ("X.Y"), the wiki extractor to the
+    # generated class ("X.Y_C"). Both resolve to the same class path.
+    return get_asset_path(blueprint) + '.' + get_class_name(blueprint)
+
+
+_KEY_FUNCTIONS: Dict[str, Callable[[Key], str]] = {
+    BY_BLUEPRINT: get_class_path,
+    BY_CLASS: get_class_name,
+    BY_ASSET: get_asset_path,
+}
+
+
+@dataclass
+class JoinResult(Generic[T]):
+    matched: List[Tuple[T, JsonData]] = field(default_factory=list)
+    unmatched_left: List[T] = field(default_factory=list)
+    unmatched_right: List[JsonData] = field(default_factory=list)
+
+
+class SpeciesIndex:
+    '''
+    Hash indexes over a list of species, keyed by class path, class name and
+    asset path. The first entry wins when keys repeat, matching the order the
+    species were given in.
+    '''
+    species: List[JsonData]
+
+    def __init__(self, species: Iterable[JsonData] = ()):
+        self.species = list()
+        self._by_blueprint: Dict[str, JsonData] = dict()
+        self._by_class: Dict[str, List[JsonData]] = dict()
+        self._by_asset: Dict[str, JsonData] = dict()
+        self.extend(species)
+
+    def add(self, blueprint: JsonData):
+        self.species.append(blueprint)
+        self._by_blueprint.setdefault(get_class_path(blueprint), blueprint)
+        self._by_class.setdefault(get_class_name(blueprint),
+                                  list()).append(blueprint)
+        self._by_asset.setdefault(get_asset_path(blueprint), blueprint)
+
+    def extend(self, species: Iterable[JsonData]):
+        for blueprint in species:
+            self.add(blueprint)
+
+    def __len__(self) -> int:
+        return len(self.species)
+
+    def __iter__(self):
+        return iter(self.species)
+
+    def __contains__(self, blueprint: Key) -> bool:
+        return get_class_path(blueprint) in self._by_blueprint
+
+    def get(self, key: str, on: str = BY_BLUEPRINT) -> Optional[JsonData]:
+        if on == BY_BLUEPRINT:
+            return self._by_blueprint.get(get_class_path(key), None)
+        elif on == BY_CLASS:
+            found = self._by_class.get(key, None)
+            return found[0] if found else None
+        elif on == BY_ASSET:
+            return self._by_asset.get(key, None)
+
+        raise ValueError(f'Unknown species index: {on}')
+
+    def get_all_by_class(self, class_name: str) -> List[JsonData]:
+        return self._by_class.get(class_name, [])
+
+    def join(self,
+             items: Iterable[T],
+             on: str = BY_BLUEPRINT,
+             key: Optional[Callable[[T], Any]] = None) -> JoinResult[T]:
+        '''
+        Pairs every item with an indexed species in one pass over the items.
+        Items are keyed with the same function the index uses for `on`,
+        unless `key` is given.
+        '''
+        if on not in _KEY_FUNCTIONS:
+            raise ValueError(f'Unknown species index: {on}')
+        if key is None:
+            key = _KEY_FUNCTIONS[on]
+        # Keys are produced in index format already, avoid renormalising them.
+        if on == BY_BLUEPRINT:
+            lookup = self._by_blueprint.get
+        elif on == BY_CLASS:
+            lookup = lambda k: (self._by_class.get(k, None) or [None])[0]
+        else:
+            lookup = self._by_asset.get
+
+        result: JoinResult[T] = JoinResult()
+        seen = set()
+        for item in items:
+            match = lookup(key(item))
+            if match is None:
+                result.unmatched_left.append(item)
+                continue
+
+            seen.add(id(match))
+            result.matched.append((item, match))
+
+        result.unmatched_right = [
+            blueprint for blueprint in self.species if id(blueprint) not in seen
+        ]
+        return result
+
+    def validate(self, keys: Iterable[str], on: str = BY_CLASS):
+        '''Raises ValueError if any of the keys has no indexed species.'''
+        coverage = self.join(keys, on=on, key=lambda key: key)
+        if on == BY_BLUEPRINT:
+            candidates = self._by_blueprint.keys()
+        elif on == BY_CLASS:
+            candidates = self._by_class.keys()
+        else:
+            candidates = self._by_asset.keys()
+        report_uncovered(coverage.unmatched_left, candidates)
@@ -0,0 +1,238 @@
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+__all__ = [
+    'Span',
+    'Profiler',
+    'count',
+    'disable',
+    'enable',
+    'get_profiler',
+    'span',
+]
+
+REPORT_VERSION = 1
+HITS_SUFFIX = '.hits'
+MISSES_SUFFIX = '.misses'
+
+
+class Span:
+    '''
+    Time, memory and counters of a named stage. Stages entered more than once
+    under the same parent, like per-species work, are summed into one span.
+    '''
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        # Bytes still allocated when the span ended, and the most allocated
+        # at any point while it ran
+        self.memory = 0
+        self.peak = 0
+        self.counters: Dict[str, int] = dict()
+        self.children: Dict[str, 'Span'] = dict()
+
+    def child(self, name: str) -> 'Span':
+        found = self.children.get(name, None)
+        if found is None:
+            found = self.children[name] = Span(name)
+        return found
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(name=self.name, calls=self.calls,
+                                   seconds=round(self.seconds, 6))
+        if self.peak:
+            out['memory'] = self.memory
+            out['peak'] = self.peak
+        if self.counters:
+            out['counters'] = dict(sorted(self.counters.items()))
+            rates = hit_rates(self.counters)
+            if rates:
+                out['hitRates'] = rates
+        if self.children:
+            out['children'] = [span.to_json()
+                               for span in self.children.values()]
+        return out
+
+
+class _Frame:
+    __slots__ = ('span', 'start', 'memory', 'peak')
+
+    def __init__(self, span: Span, start: float, memory: int):
+        self.span = span
+        self.start = start
+        self.memory = memory
+        self.peak = memory
+
+
+def hit_rates(counters: Dict[str, int]) -> Dict[str, float]:
+    '''Share of hits of every counter with both "x.hits" and "x.misses".'''
+    prefixes = sorted(set(
+        name[:-len(suffix)]
+        for name in counters for suffix in (HITS_SUFFIX, MISSES_SUFFIX)
+        if name.endswith(suffix)
+    ))
+    rates = dict()
+    for prefix in prefixes:
+        hits = counters.get(prefix + HITS_SUFFIX, 0)
+        misses = counters.get(prefix + MISSES_SUFFIX, 0)
+        if hits + misses:
+            rates[prefix] = round(hits / (hits + misses), 4)
+    return rates
+
+
+class Profiler:
+    '''
+    Collects spans and counters of a run. Spans nest per thread; threads
+    that have not entered a span of their own add theirs under the root.
+    Memory is traced for the whole process, so with several threads running
+    a span's peak includes what the others allocated meanwhile.
+    '''
+    def __init__(self, name: str, trace_memory: bool = True):
+        self.root = Span(name)
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._root_frame = _Frame(self.root, time.perf_counter(), 0)
+        # tracemalloc.reset_peak is only available from Python 3.9
+        self._reset_peak = getattr(tracemalloc, 'reset_peak', None)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self) -> List[_Frame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = [self._root_frame]
+        return stack
+
+    def _memory(self) -> int:
+        if not self.trace_memory:
+            return 0
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack():
+            frame.peak = max(frame.peak, peak)
+        if self._reset_peak:
+            self._reset_peak()
+        return current
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        stack = self._stack()
+        with self._lock:
+            current = stack[-1].span.child(name)
+        frame = _Frame(current, 0.0, self._memory())
+        stack.append(frame)
+        frame.start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            elapsed = time.perf_counter() - frame.start
+            memory = self._memory()
+            stack.pop()
+            with self._lock:
+                current.calls += 1
+                current.seconds += elapsed
+                current.memory = memory
+                current.peak = max(current.peak, frame.peak)
+
+    def count(self, name: str, value: int = 1):
+        counters = self._stack()[-1].span.counters
+        with self._lock:
+            counters[name] = counters.get(name, 0) + value
+
+    def totals(self) -> Dict[str, int]:
+        '''Counters summed over every span.'''
+        totals: Dict[str, int] = dict()
+        pending = [self.root]
+        while pending:
+            current = pending.pop()
+            for name, value in current.counters.items():
+                totals[name] = totals.get(name, 0) + value
+            pending.extend(current.children.values())
+        return totals
+
+    def report(self) -> Dict[str, Any]:
+        self.root.calls = 1
+        self.root.seconds = time.perf_counter() - self._root_frame.start
+        if self.trace_memory:
+            self.root.memory = self._memory()
+            self.root.peak = self._root_frame.peak
+
+        totals = self.totals()
+        return dict(
+            version=REPORT_VERSION,
+            started=time.strftime('%Y-%m-%dT%H:%M:%S',
+                                  time.localtime(self.started)),
+            python=platform.python_version(),
+            argv=sys.argv[1:],
+            seconds=round(self.root.seconds, 6),
+            peakMemory=self.root.peak if self.trace_memory else None,
+            counters=dict(sorted(totals.items())),
+            hitRates=hit_rates(totals),
+            spans=self.root.to_json(),
+        )
+
+    def write_report(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wt') as fp:
+            json.dump(self.report(), fp, indent=2)
+            fp.write('\n')
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+class _NoSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable(name: str, trace_memory: bool = True) -> Profiler:
+    global _PROFILER
+    _PROFILER = Profiler(name, trace_memory)
+    return _PROFILER
+
+
+def disable():
+    global _PROFILER
+    if _PROFILER is not None and _PROFILER.trace_memory:
+        tracemalloc.stop()
+    _PROFILER = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _PROFILER
+
+
+def span(name: str):
+    '''
+    Times the block as a stage of the current span. Does nothing unless
+    profiling was enabled.
+    '''
+    if _PROFILER is None:
+        return _NO_SPAN
+    return _PROFILER.span(name)
+
+
+def count(name: str, value: int = 1):
+    '''
+    Adds to a counter of the current span. Counters named "x.hits" and
+    "x.misses" are reported as the hit rate of "x".
+    '''
+    if _PROFILER is not None:
+        _PROFILER.count(name, value)
@@ -1,91 +1,614 @@
 import hashlib
 import json
-import re
+import sys
+from dataclasses import dataclass
+from json.encoder import encode_basestring_ascii
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
 
 __all__ = [
+    'DUMP_PROFILE',
+    'FORMAT_PROFILE',
+    'LayoutProfile',
     'format_json',
+    'layout_json',
+    'write_json',
 ]
 
-# Join 2-line color (name, [r,g,b,e]) data onto one line
-JOIN_COLORS_REGEX = re.compile(r"\[\n\s+([\w\" ]+),\n\s+(.{,90})\n\s+\]")
+# Sets of named fields that should be combined onto a single line
+# Only applies if all fields are found
+JOIN_LINE_FIELDS = (
+    ('x', 'y'),
+    ('x', 'y', 'z'),
+    ('a', 'b'),
+    ('a', 'b', 'c'),
+    ('lat', 'lon', 'long'),
+    ('name', 'interval', 'dmg', 'radius', 'stamina'),
+    ('base', 'sprint'),
+    ('base', 'crouch', 'sprint'),
+    ('min', 'max'),
+    ('min', 'max', 'pow'),
+)
+# Number of consecutive fields each set above needs
+JOIN_LINE_FIELD_COUNTS = (2, 3, 2, 3, 2, 5, 2, 3, 2, 3)
+JOIN_LINE_NAMES = frozenset(name for names in JOIN_LINE_FIELDS
+                            for name in names)
 
-# Reduce 2-12 numbers in an array onto a single line
-JOIN_MULTIPLE_NUMBERS_REGEX = re.compile(
-    r'(\n\s+)[-+.\de]+,(?:\n\s+[-+.\de"]+,?){1,12}')
+# Arrays of up to this many numbers are reduced onto a single line
+MAX_NUMBERS_PER_LINE = 13
 
-# Reduce short arrays of strings onto a single line
-JOIN_MULTIPLE_STRINGS_REGEX = re.compile(
-    r'\[((?:\n\s+".{1,30}",?\s*$){1,4})\n\s+\]', re.MULTILINE)
+# Arrays of up to 4 strings, each at most 30 characters, share a single line
+MAX_SHORT_STRINGS = 4
+MAX_SHORT_STRING_LENGTH = 30
 
-# Reduces dict fields with only a single line of content (including previously joined multiple fields) to a single line
-COLLAPSE_SINGLE_LINE_DICT_REGEX = re.compile(
-    r"\{\n\s+(\"\w+\": [^}\n\]]{1,120})\n\s+\}")
+# Dicts with a single line of content are collapsed if it fits
+MAX_DICT_LINE_LENGTH = 120
 
-# Reduce arrays with only a single line of content (including previously joined multiple fields) to a single line
-COLLAPSE_SINGLE_LINE_ARRAY_REGEX = re.compile(r'\[\s+(.+)\s+\]')
+# Two-element (name, [r,g,b,e]) color data is joined if the value fits
+MAX_COLOR_LINE_LENGTH = 90
 
-# Sets of named fields that should be combined onto a single line
-# Only applies if all fields are found
-JOIN_LINE_FIELDS = (
-    'x|y',
-    'x|y|z',
-    'a|b',
-    'a|b|c',
-    'lat|long?',
-    'name|interval|dmg|radius|stamina',
-    'base|sprint',
-    'base|crouch|sprint',
-    'min|max',
-    'min|max|pow',
+CONTAINER_TYPES = (dict, list, tuple)
+NUMBER_TYPES = frozenset((int, float))
+
+NUMBER_CHARS = '-+.0123456789e'
+NUMBER_OR_QUOTE_CHARS = NUMBER_CHARS + '"'
+WORD_CHARS = ('abcdefghijklmnopqrstuvwxyz'
+              'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+COLOR_NAME_CHARS = WORD_CHARS + '" '
+
+# Pass in which a node's text became a single line
+SINGLE_LINE = 0  # scalars and empty containers
+SHORT_STRINGS = 1
+COLLAPSED_DICT = 2
+COLLAPSED_ARRAY = 3
+COLLAPSED_COLOR = 4
+NEVER = 5
+
+# Lines gathered before they are written out, and the lines at the end that
+# are always held back: the tail of the last element can still be rewritten
+FLUSH_LINES = 4096
+KEEP_LINES = 4
+
+
+class _Node:
+    '''
+    Laid out value. Its first line continues the parent's line, the rest
+    carry their own indentation.
+    '''
+    __slots__ = ('count', 'single', 'color_tail')
+
+    def __init__(self, count: int, single: int = NEVER):
+        self.count = count
+        self.single = single
+        # Set on two-line arrays whose closing bracket trails their last
+        # element; the parent's bracket will be pulled up as well.
+        self.color_tail: Optional[Tuple[str, str]] = None
+
+
+@dataclass(frozen=True)
+class LayoutProfile:
+    '''Indentation and the set of layout rules applied to a document.'''
+    indent: str = '\t'
+    join_fields: bool = True
+    short_strings: bool = True
+    collapse_dicts: bool = True
+    join_colors: bool = True
+    # Whether a null continues a run of numbers
+    null_in_numbers: bool = False
+
+
+# Layout of format_json, used for the data files published on the wiki
+FORMAT_PROFILE = LayoutProfile()
+
+# Layout of dump_json, used for tool output
+DUMP_PROFILE = LayoutProfile(
+    indent='  ',
+    join_fields=False,
+    short_strings=False,
+    collapse_dicts=False,
+    join_colors=False,
+    null_in_numbers=True,
 )
 
 
-def _flattener(group=0, prefix='', postfix=None):
-    '''Flatten spaces/newlines in the found string.'''
-    if postfix is None:
-        postfix = prefix
+def _encode_float(value: float) -> str:
+    if value - value == 0:
+        return float.__repr__(value)
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _encode_scalar(value: Any) -> Optional[str]:
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if kind is float:
+        return _encode_float(value)
+    if kind is int:
+        return int.__repr__(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _encode_float(value)
+    return None
+
+
+def _encode_key(key: Any) -> str:
+    if type(key) is not str and not isinstance(key, str):
+        if isinstance(key, float):
+            key = _encode_float(key)
+        elif key is True:
+            key = 'true'
+        elif key is False:
+            key = 'false'
+        elif key is None:
+            key = 'null'
+        elif isinstance(key, int):
+            key = int.__repr__(key)
+        else:
+            raise TypeError('keys must be str, int, float, bool or None, '
+                            f'not {key.__class__.__name__}')
+    return encode_basestring_ascii(key)
+
+
+def _is_complete(value: Any) -> bool:
+    '''Whether a field's value ends on its own line, without commas.'''
+    if isinstance(value, (dict, list, tuple)):
+        return not value
+    text = _encode_scalar(value)
+    return text is not None and ',' not in text
+
+
+def _ends_run(value: Any) -> bool:
+    '''Whether a field can be the last one of a joined run.'''
+    if isinstance(value, (dict, list, tuple)):
+        return True
+    text = _encode_scalar(value)
+    if text is None:
+        return False
+    comma = text.find(',')
+    return comma < 0 or ' ' in text[1:comma] \
+        or text[comma + 1:comma + 2] == ' '
+
+
+def _has_run(items: List[Tuple[Any, Any]], index: int, names: Tuple[str, ...],
+             length: int) -> bool:
+    '''Whether `length` fields named from `names` follow from `index`.'''
+    while True:
+        key, value = items[index]
+        if not isinstance(key, str) or key not in names:
+            return False
+        length -= 1
+        if not length:
+            return _ends_run(value)
+        if isinstance(value, dict) and value:
+            items = list(value.items())
+            index = 0
+        elif _is_complete(value) and index < len(items) - 1:
+            index += 1
+        else:
+            return False
+
+
+def _space_run_comma(text: str, null_in_numbers: bool) -> str:
+    '''
+    Spaces out the comma following the number characters a string in a run
+    of numbers starts with, the only part of it the old pass matched.
+    '''
+    index, length = 0, len(text)
+    while index < length:
+        if text[index] in NUMBER_OR_QUOTE_CHARS:
+            index += 1
+        elif null_in_numbers and text.startswith('null', index):
+            index += 4
+        else:
+            break
+    if text[index:index + 1] == ',':
+        return f'{text[:index + 1]} {text[index + 1:]}'
+    return text
+
+
+def _unserializable(value: Any):
+    raise TypeError(f'Object of type {value.__class__.__name__} '
+                    'is not JSON serializable')
+
+
+class _Layout:
+    '''
+    Lays a value out in a single walk over the tree. Every node is decided
+    with the rules the old regular expression passes applied over the whole
+    document, including the order they ran in.
+
+    Lines are kept in `out` until no rule can rewrite them anymore. With a
+    `write` callback they are then passed on in chunks, so only the lines of
+    containers that may still be collapsed stay in memory.
+    '''
+
+    def __init__(self, profile: LayoutProfile = FORMAT_PROFILE,
+                 write: Optional[Callable[[str], Any]] = None):
+        self.profile = profile
+        self.indent = profile.indent
+        self.write = write
+        self.out = ['']
+        # Number of lines already written out
+        self.base = 0
+        # First lines of containers that may still rewrite their head
+        self.open: List[int] = []
+        self.flush_at = FLUSH_LINES if write else sys.maxsize
+
+    def flush(self):
+        out = self.out
+        limit = len(out) - KEEP_LINES
+        if self.open:
+            limit = min(limit, self.open[0] - self.base)
+        if limit > 0:
+            self.write('\n'.join(out[:limit]) + '\n')
+            del out[:limit]
+            self.base += limit
+
+    def finish(self) -> str:
+        '''Returns the lines that were not written yet.'''
+        text = '\n'.join(self.out)
+        self.out = ['']
+        return text
+
+    def node(self, value: Any, depth: int,
+             claimed: Optional[List[int]] = None) -> _Node:
+        if isinstance(value, dict):
+            return self.dict(value, depth, claimed)
+        if isinstance(value, (list, tuple)):
+            return self.array(value, depth)
+        text = _encode_scalar(value)
+        if text is None:
+            _unserializable(value)
+        self.out[-1] += text
+        return _Node(1, SINGLE_LINE)
+
+    def dict(self,
+             value: Dict[Any, Any],
+             depth: int,
+             claimed: Optional[List[int]] = None) -> _Node:
+        '''
+        `claimed` holds, per set of joined fields, how many fields of a run
+        started above continue at this dict's first field.
+        '''
+        out = self.out
+        if not value:
+            out[-1] += '{}'
+            return _Node(1, SINGLE_LINE)
+
+        items = list(value.items())
+        count = len(items)
+
+        # Join sets of named fields onto shared lines. Each set is matched
+        # left to right, a run of fields continuing either into the next
+        # field or into the first field of a nested dict. The sets are
+        # independent of each other: fields joined by one are still seen as
+        # consecutive by the next.
+        joined = [False] * count
+        nested: List[Optional[List[int]]] = [None] * count
+        if self.profile.join_fields \
+                and (claimed or not JOIN_LINE_NAMES.isdisjoint(value)):
+            for term, (names, length) in enumerate(
+                    zip(JOIN_LINE_FIELDS, JOIN_LINE_FIELD_COUNTS)):
+                index = 0
+                if claimed and claimed[term]:
+                    index = self._claim(items, 0, claimed[term], term, joined,
+                                        nested, True)
+                elif value.keys().isdisjoint(names):
+                    continue
+                while index < count:
+                    if items[index][0] in names \
+                            and _has_run(items, index, names, length):
+                        index = self._claim(items, index, length, term,
+                                            joined, nested, False)
+                    else:
+                        index += 1
+
+        inner = self.indent * (depth + 1)
+        first = self.base + len(out) - 1
+        opening = len(out[-1]) + 1
+        out[-1] += '{'
+        settled = not self.profile.collapse_dicts
+        if not settled:
+            self.open.append(first)
+
+        last = count - 1
+        for index, (key, child) in enumerate(items):
+            comma = ',' if index < last else ''
+            if isinstance(child, CONTAINER_TYPES):
+                entry = _encode_key(key) + ': '
+                if joined[index]:
+                    out[-1] += ' ' + entry
+                else:
+                    out.append(inner + entry)
+                self.node(child, depth + 1, nested[index])
+                out[-1] += comma
+            else:
+                text = _encode_scalar(child)
+                if text is None:
+                    _unserializable(child)
+                entry = f'{_encode_key(key)}: {text}{comma}'
+                if joined[index]:
+                    out[-1] += ' ' + entry
+                else:
+                    out.append(inner + entry)
+
+            # The head is final once its first line has content pulled up,
+            # or the line deciding whether it collapses is known.
+            if not settled:
+                if len(out[first - self.base]) != opening:
+                    settled = True
+                elif self.base + len(out) - first >= 3:
+                    self._collapse_dict(first, inner)
+                    settled = True
+                if settled:
+                    self.open.pop()
+            if len(out) > self.flush_at:
+                self.flush()
+
+        out.append(self.indent * depth + '}')
+        if not settled:
+            self.open.pop()
+            if self._collapse_dict(first, inner) \
+                    and self.base + len(out) - first == 1:
+                return _Node(1, COLLAPSED_DICT)
+
+        return _Node(self.base + len(out) - first)
+
+    def _collapse_dict(self, first: int, inner: str) -> bool:
+        '''
+        Collapses a single line of content into the braces. The closing
+        brace is whichever one starts the next line, which needs to be
+        indented; a nested dict pulled up onto the line closes it too.
+        '''
+        out = self.out
+        index = first - self.base
+        closing = out[index + 2]
+        if not closing[:1].isspace() or not closing.lstrip().startswith('}'):
+            return False
+
+        line = out[index + 1][len(inner):]
+        quote = line.find('"', 1)
+        key, rest = line[1:quote], line[quote + 3:]
+        if key and not key.strip(WORD_CHARS) \
+                and line[quote + 1:quote + 3] == ': ' \
+                and len(rest) <= MAX_DICT_LINE_LENGTH \
+                and '}' not in rest and ']' not in rest:
+            out[index:index + 3] = [
+                f'{out[index]} {line} }}' + closing.lstrip()[1:]
+            ]
+            return True
+        return False
+
+    @staticmethod
+    def _claim(items: List[Tuple[Any, Any]], index: int, length: int,
+               term: int, joined: List[bool],
+               nested: List[Optional[List[int]]], continued: bool) -> int:
+        '''
+        Joins a run of fields starting at `index`. Returns the index of the
+        first field after the run.
+        '''
+        joined[index] = joined[index] or continued
+        while True:
+            length -= 1
+            child = items[index][1]
+            if not length:
+                return index + 1
+            if isinstance(child, dict) and child:
+                if nested[index] is None:
+                    nested[index] = [0] * len(JOIN_LINE_FIELDS)
+                nested[index][term] = length
+                return index + 1
+            index += 1
+            joined[index] = True
+
+    def array(self, value: List[Any], depth: int) -> _Node:
+        out = self.out
+        if not value:
+            out[-1] += '[]'
+            return _Node(1, SINGLE_LINE)
+
+        count = len(value)
+        kinds = set(map(type, value))
+        if kinds.issubset(NUMBER_TYPES) and count <= MAX_NUMBERS_PER_LINE:
+            # Plain numbers always end up on a single line
+            line = json.dumps(value)
+            if 'N' not in line and 'I' not in line:
+                out[-1] += f'[ {line[1:-1]} ]'
+                return _Node(1, COLLAPSED_ARRAY)
+
+        # Containers are laid out in place, they never join other elements
+        texts: List[Optional[str]] = []
+        if kinds.isdisjoint(CONTAINER_TYPES):
+            texts = [_encode_scalar(child) for child in value]
+        if not texts or None in texts:
+            texts = []
+            for child in value:
+                if isinstance(child, CONTAINER_TYPES):
+                    texts.append(None)
+                    continue
+                text = _encode_scalar(child)
+                if text is None:
+                    _unserializable(child)
+                texts.append(text)
+
+        # Short arrays of short strings share a single line. Any commas are
+        # spaced out, including ones inside the strings.
+        if self.profile.short_strings and depth \
+                and count <= MAX_SHORT_STRINGS and all(
+                    text and text[0] == '"'
+                    and 3 <= len(text) <= MAX_SHORT_STRING_LENGTH + 2
+                    for text in texts):
+            line = ','.join(texts).replace(',', ', ')
+            out[-1] += f'[ {line} ]'
+            return _Node(1, SHORT_STRINGS)
+
+        inner = self.indent * (depth + 1)
+        first = self.base + len(out) - 1
+        out[-1] += '['
+        self.open.append(first)
+        settled = False
+        join_colors = self.profile.join_colors and depth
+        null_in_numbers = self.profile.null_in_numbers
+
+        # Stages of the first and last element, and whether all lines of
+        # content were single lines before the pairs below got joined
+        first_single = last_single = NEVER
+        last_node: Optional[_Node] = None
+        entries = 0
+        all_single = True
+
+        # Runs of numbers are reduced onto shared lines. A run starts at a
+        # number followed by another element and takes up to 12 more of
+        # them, as long as each begins with a number or a quote; a string
+        # that is not all digits still joins, but ends the run. The comma
+        # right after its leading digits, if any, is spaced out as well.
+        last = count - 1
+        index = 0
+        while index < count:
+            text = texts[index]
+            node = None
+            single = SINGLE_LINE
+            end = index + 1
+            if index < last and text is not None \
+                    and not text.strip(NUMBER_CHARS):
+                tail = ', '
+                while end - index < MAX_NUMBERS_PER_LINE:
+                    text = texts[end]
+                    if text is None:
+                        break
+                    rest = text
+                    if null_in_numbers and 'null' in text:
+                        rest = text.replace('null', '')
+                        if text[0] not in NUMBER_OR_QUOTE_CHARS \
+                                and not text.startswith('null'):
+                            break
+                    elif text[0] not in NUMBER_OR_QUOTE_CHARS:
+                        break
+                    end += 1
+                    ends_run = bool(rest.strip(NUMBER_OR_QUOTE_CHARS))
+                    if ends_run:
+                        texts[end - 1] = _space_run_comma(text,
+                                                          null_in_numbers)
+                    if end == count:
+                        tail = ''
+                        break
+                    if ends_run:
+                        tail = ','
+                        break
+                text = texts[index]
+
+            if end - index > 1:
+                out.append(inner + ', '.join(texts[index:end]) + tail)
+            elif text is None:
+                out.append(inner)
+                node = self.node(value[index], depth + 1)
+                single = node.single
+                if index < last:
+                    out[-1] += ','
+            else:
+                out.append(inner + text + (',' if index < last else ''))
+
+            if not entries:
+                first_single = single
+            last_single = single
+            last_node = node
+            entries += 1
+            all_single = all_single and single <= COLLAPSED_ARRAY
+            index = end
+
+            # The head is final once it has more than one line of content,
+            # unless it may still be joined as a color.
+            if not settled and self.base + len(out) - first > 2 \
+                    and not (join_colors and all_single and entries <= 2
+                             and first_single != SHORT_STRINGS):
+                self._open_array(first, inner, first_single)
+                self.open.pop()
+                settled = True
+            if len(out) > self.flush_at:
+                self.flush()
+
+        if not settled:
+            self.open.pop()
+            # Arrays with only a single line of content are collapsed
+            if self.base + len(out) - first == 2 \
+                    and last_single <= COLLAPSED_DICT:
+                index = first - self.base
+                out[index:] = [f'{out[index]} {out[index + 1][len(inner):]} ]']
+                return _Node(1, COLLAPSED_ARRAY)
+            self._open_array(first, inner, first_single)
+
+        # A trailing short array takes the closing bracket along
+        closed = last_single == SHORT_STRINGS
+        if closed:
+            out[-1] += ' ]'
+        else:
+            out.append(self.indent * depth + ']')
+
+        # Two lines of (name, value) pairs share a single line
+        if not settled and join_colors and entries == 2 and all_single \
+                and first_single != SHORT_STRINGS:
+            index = first - self.base
+            name = out[index + 1][len(inner):-1]
+            second = out[index + 2][len(inner):]
+            if name and out[index + 1][-1] == ',' \
+                    and not name.strip(COLOR_NAME_CHARS) \
+                    and len(second) <= MAX_COLOR_LINE_LENGTH:
+                if not closed:
+                    out[index:] = [f'{out[index]} {name}, {second} ]']
+                    return _Node(1, COLLAPSED_COLOR)
+                node = _Node(self.base + len(out) - first)
+                node.color_tail = (name, second)
+                return node
+
+        # A trailing pair whose bracket is already pulled up takes ours too
+        if depth and last_node and last_node.color_tail:
+            name, second = last_node.color_tail
+            out[-last_node.count - 1:] = [f'{inner}[ {name}, {second} ]']
+
+        return _Node(self.base + len(out) - first)
+
+    def _open_array(self, first: int, inner: str, first_single: int):
+        '''A leading short array is pulled up onto the opening bracket.'''
+        if first_single == SHORT_STRINGS:
+            out = self.out
+            index = first - self.base
+            out[index:index + 2] = [
+                f'{out[index]} {out[index + 1][len(inner):]}'
+            ]
 
-    def _fn(match):
-        txt = match[group]
-        txt = re.sub(r'\s*\n\s+', '', txt)
-        txt = txt.replace(',', ', ')
-        return f'{prefix}{txt}{postfix}'
 
-    return _fn
+def write_json(fp: TextIO, data: Any, profile: LayoutProfile = FORMAT_PROFILE):
+    '''Writes the laid out data to a file object as it is produced.'''
+    layout = _Layout(profile, fp.write)
+    layout.node(data, 0)
+    fp.write(layout.finish())
 
 
-def _flatten_re_result(match):
-    txt = match[0]
-    txt = re.sub(r'\s*\n\s+', '', txt)
-    txt = txt.replace(',', ', ')
-    return f'{match[1]}{txt}'
+def layout_json(data: Any, profile: LayoutProfile = FORMAT_PROFILE) -> str:
+    layout = _Layout(profile)
+    layout.node(data, 0)
+    return layout.finish()
 
 
 def format_json(data, pretty=False):
     '''JSON with added beautification!'''
     if pretty:
-        json_string = json.dumps(data, indent='\t')
-
-        # Handle moving sets of terms onto single lines
-        for term in JOIN_LINE_FIELDS:
-            field_part = rf'(?:(\"(?:{term})\": [^,\n]+,?))'
-            field_count = term.count('|') + 1
-            full_re = r'\s+'.join([field_part] * field_count) + r'(\s+)'
-            subs = ' '.join(f'\\{n+1}'
-                            for n in range(field_count)) + f'\\{field_count+1}'
-            json_string = re.sub(full_re, subs, json_string)
-
-        json_string = re.sub(JOIN_MULTIPLE_NUMBERS_REGEX, _flatten_re_result,
-                             json_string)
-        json_string = re.sub(JOIN_MULTIPLE_STRINGS_REGEX,
-                             _flattener(1, '[ ', ' ]'), json_string)
-        json_string = re.sub(COLLAPSE_SINGLE_LINE_DICT_REGEX, r"{ \1 }",
-                             json_string)
-        json_string = re.sub(COLLAPSE_SINGLE_LINE_ARRAY_REGEX, r"[ \1 ]",
-                             json_string)
-        json_string = re.sub(JOIN_COLORS_REGEX, r"[ \1, \2 ]", json_string)
+        json_string = layout_json(data)
     else:
         json_string = json.dumps(data, indent=None, separators=(',', ':'))
     return json_string
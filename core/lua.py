@@ -1,7 +1,168 @@
-import luadata
+from typing import Any, Callable, Dict, TextIO
 
+__all__ = [
+    'format_table',
+    'write_table',
+]
 
-def format_table(data):
-    return luadata.serialize(data,
-                             form=True).replace('\\t',
-                                                '  ').replace('\\n', '\n')
+INDENT = '  '
+
+# Parts gathered before they are written out
+FLUSH_PARTS = 1 << 13
+
+CONTAINER_TYPES = (dict, list, tuple)
+
+
+def _encode_string(value: str) -> str:
+    # Newlines are escaped with a backslash before the line break, which is
+    # what luadata reads back.
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    if '\n' in value or '\r' in value:
+        value = value.replace('\r', '\\r').replace('\n', '\\\n')
+    return '"' + value + '"'
+
+
+def _encode_number(value: float) -> str:
+    if value != value:
+        return '0/0'
+    if value == float('inf'):
+        return 'math.huge'
+    if value == -float('inf'):
+        return '-math.huge'
+    return float.__repr__(value)
+
+
+def _encode_value(value: Any) -> str:
+    kind = type(value)
+    if kind is str:
+        return _encode_string(value)
+    if kind is int:
+        return int.__repr__(value)
+    if kind is float:
+        return _encode_number(value)
+    if value is None:
+        return 'nil'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, str):
+        return _encode_string(value)
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return _encode_number(value)
+    raise TypeError(f'Object of type {value.__class__.__name__} '
+                    'cannot be stored in a Lua table')
+
+
+def _encode_key(key: Any) -> str:
+    if key is None or (isinstance(key, float) and key != key):
+        raise TypeError(f'{key} cannot be used as a Lua table key')
+    return '[' + _encode_value(key) + ']'
+
+
+class _TableWriter:
+    '''
+    Writes Lua tables one field per line. Dicts keep their order and have
+    every key in brackets, lists are written without keys. Fields set to
+    None are left out, as a nil field does not exist in Lua. In lists, the
+    items after a None are written with their index as key, so they keep
+    their positions.
+    '''
+
+    def __init__(self, write: Callable[[str], Any], indent: str = INDENT):
+        self.write = write
+        self.indent = indent
+        self.parts = []
+        # Field names repeat across records, encode each only once
+        self.keys: Dict[str, str] = dict()
+
+    def flush(self):
+        self.write(''.join(self.parts))
+        self.parts.clear()
+
+    def value(self, value: Any, depth: int):
+        if isinstance(value, dict):
+            self.dict(value, depth)
+        elif isinstance(value, (list, tuple)):
+            self.list(value, depth)
+        else:
+            self.parts.append(_encode_value(value))
+
+    def dict(self, value: dict, depth: int):
+        parts = self.parts
+        keys = self.keys
+        inner = '\n' + self.indent * (depth + 1)
+        separator = '{'
+        for key, child in value.items():
+            if child is None:
+                continue
+            if type(key) is str:
+                name = keys.get(key, None)
+                if name is None:
+                    name = keys[key] = f'[{_encode_string(key)}] = '
+            else:
+                name = _encode_key(key) + ' = '
+
+            if type(child) is str:
+                parts.append(separator + inner + name + _encode_string(child))
+            elif isinstance(child, CONTAINER_TYPES):
+                parts.append(separator + inner + name)
+                self.value(child, depth + 1)
+            else:
+                parts.append(separator + inner + name + _encode_value(child))
+            separator = ','
+        if separator == '{':
+            parts.append('{}')
+            return
+        parts.append('\n' + self.indent * depth + '}')
+
+        if len(parts) > FLUSH_PARTS:
+            self.flush()
+
+    def list(self, value: list, depth: int):
+        parts = self.parts
+        if not value:
+            parts.append('{}')
+            return
+
+        inner = '\n' + self.indent * (depth + 1)
+        separator = '{'
+        keyed = False
+        for index, child in enumerate(value, 1):
+            if child is None:
+                keyed = True
+                continue
+            prefix = separator + inner
+            if keyed:
+                prefix += f'[{index}] = '
+
+            if isinstance(child, CONTAINER_TYPES):
+                parts.append(prefix)
+                self.value(child, depth + 1)
+            else:
+                parts.append(prefix + _encode_value(child))
+            separator = ','
+        if separator == '{':
+            parts.append('{}')
+            return
+        parts.append('\n' + self.indent * depth + '}')
+
+        if len(parts) > FLUSH_PARTS:
+            self.flush()
+
+
+def write_table(fp: TextIO, data: Any, indent: str = INDENT):
+    '''Writes data as a Lua table to a file object as it is produced.'''
+    writer = _TableWriter(fp.write, indent)
+    writer.value(data, 0)
+    writer.flush()
+
+
+def format_table(data: Any, indent: str = INDENT) -> str:
+    chunks = []
+    writer = _TableWriter(chunks.append, indent)
+    writer.value(data, 0)
+    writer.flush()
+    return ''.join(chunks)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from . import instrument
+from .file import JsonData, load_json, save_json_atomic
+from .filter import BPTrie, Deserializable, Filter
+from .hashcache import HashCache, hash_file, load_hash_cache
+from .speciescache import CACHE_DIR
+
+__all__ = [
+    'OutputState',
+    'fingerprint',
+    'fingerprint_filter',
+]
+
+STATE_VERSION = 1
+STATE_SUFFIX = '.state.json'
+CORE_PATH = Path(__file__).parent
+# Digests of the files outputs were generated from, trusted while a file
+# keeps its size and mtime
+FILE_HASHES_PATH = CACHE_DIR / 'output-inputs.json'
+
+# Fields that do not change what a filter selects or how output looks
+IGNORED_FILTER_FIELDS = frozenset(('path', 'tree'))
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f'Object of type {value.__class__.__name__} '
+                    'cannot be fingerprinted')
+
+
+def fingerprint(data: Any) -> str:
+    text = json.dumps(data, sort_keys=True, default=_encode)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _filter_data(value: Any) -> Any:
+    if isinstance(value, Deserializable):
+        return {
+            name: _filter_data(getattr(value, name, None))
+            for name in sorted(set(value.get_fields()))
+            if name not in IGNORED_FILTER_FIELDS
+        }
+    if isinstance(value, BPTrie):
+        return None
+    if isinstance(value, dict):
+        return {key: _filter_data(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_filter_data(item) for item in value]
+    return value
+
+
+def fingerprint_filter(flt: Filter) -> str:
+    '''
+    Hash of the filter's fields once loaded, so the files it imports are
+    covered as well.
+    '''
+    return fingerprint(_filter_data(flt))
+
+
+def hash_files(files: Iterable[Path], cache: HashCache) -> Dict[str, str]:
+    '''Digests of the files, only reading those whose stat changed.'''
+    digests = dict()
+    for file in files:
+        path = file.resolve()
+        stat_key = cache.stat_key(path)
+        sha1 = cache.get(path, stat_key)
+        if sha1 is None:
+            sha1 = hash_file(path)
+            cache.put(path, sha1, stat_key)
+        digests[str(file)] = sha1
+    return digests
+
+
+def fingerprint_code(directories: Iterable[Path], cache: HashCache) -> str:
+    files = sorted(file for directory in directories
+                   for file in directory.glob('*.py'))
+    return fingerprint(list(hash_files(files, cache).values()))
+
+
+class OutputState:
+    '''
+    What an output was generated from: the tool code, the resolved filter,
+    the input files and, for tools that splice unchanged species into the
+    last output, each species record, saved next to the output.
+    An output is current when none of these changed since it was written.
+    Species hashes are only compared when the tool and filter are the same,
+    as otherwise every record may render differently.
+
+    The code is that of core, `code_path` and the directories in `uses`, for
+    tools that import code of other tools.
+    '''
+    def __init__(self, output_path: Path, tool: str, flt: Filter,
+                 inputs: Iterable[Path], code_path: Path,
+                 outputs: Iterable[Path] = (), options: Any = None,
+                 uses: Iterable[Path] = ()):
+        self.output_path = output_path
+        self.outputs = [output_path, *outputs]
+        self.path = output_path.with_name(output_path.name + STATE_SUFFIX)
+        hashes = load_hash_cache(FILE_HASHES_PATH)
+        self.key: JsonData = dict(
+            tool=tool,
+            code=fingerprint_code([CORE_PATH, code_path, *uses], hashes),
+            filter=fingerprint_filter(flt),
+            options=options,
+            inputs=hash_files(inputs, hashes),
+        )
+        # Inputs of outputs made from temporary files are not kept around
+        hashes.prune()
+        try:
+            hashes.save()
+        except OSError:
+            pass
+        self.species: Dict[str, str] = dict()
+        self.previous = self._load()
+        self.spliceable = self._can_splice()
+
+    def _load(self) -> Optional[JsonData]:
+        try:
+            state = load_json(self.path)
+        except (OSError, ValueError):
+            return None
+        if state.get('version', None) != STATE_VERSION:
+            return None
+        return state
+
+    def _outputs_exist(self) -> bool:
+        return all(path.exists() for path in self.outputs)
+
+    def is_current(self) -> bool:
+        current = self.previous is not None and self._outputs_exist() \
+            and self.previous['key'] == self.key
+        instrument.count('output_state.hits' if current
+                      else 'output_state.misses')
+        return current
+
+    def _can_splice(self) -> bool:
+        # Whether unchanged species may be copied from the last output
+        if self.previous is None or not self._outputs_exist():
+            return False
+        previous = self.previous['key']
+        return all(previous.get(name, None) == self.key[name]
+                   for name in ('tool', 'code', 'filter', 'options'))
+
+    def add_species(self, key: str, record: Any) -> bool:
+        '''
+        Records the hash of a species' data, returning whether it is the same
+        as when the last output was written.
+        '''
+        digest = self.species[key] = fingerprint(record)
+        if not self.spliceable:
+            return False
+        unchanged = self.previous['species'].get(key, None) == digest
+        instrument.count('species_state.hits' if unchanged
+                      else 'species_state.misses')
+        return unchanged
+
+    def save(self):
+        save_json_atomic(self.path, dict(version=STATE_VERSION, key=self.key,
+                                         species=self.species))
@@ -0,0 +1,106 @@
+import marshal
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .blueprint import get_class_name, get_path
+from .file import JsonData
+
+__all__ = [
+    'FIELDS',
+    'Species',
+    'load_species_records',
+]
+
+# Fields the tools read, kept in slots. Anything else stays encoded until it
+# is first accessed.
+FIELDS = (
+    'blueprintPath',
+    'bp',
+    'name',
+    'variants',
+    'fullStatsRaw',
+    'cloning',
+    'breeding',
+    'doesNotUseOxygen',
+)
+_FIELD_SET = frozenset(FIELDS)
+
+
+class Species(MutableMapping):
+    '''
+    A species record that reads like the JSON object it was made from. The
+    class name and class path are resolved once, when it is created.
+    '''
+    __slots__ = FIELDS + ('class_name', 'class_path', '_rest')
+
+    def __init__(self, data: JsonData):
+        rest = dict()
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                setattr(self, key, value)
+            else:
+                rest[key] = value
+        self._rest = marshal.dumps(rest) if rest else None
+
+        path = get_path(self)
+        self.class_name = get_class_name(path)
+        self.class_path = path[:path.index('.')] + '.' + self.class_name
+
+    def _get_rest(self) -> Dict[str, Any]:
+        rest = self._rest
+        if rest is None:
+            rest = self._rest = dict()
+        elif isinstance(rest, bytes):
+            rest = self._rest = marshal.loads(rest)
+        return rest
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self._get_rest()[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self._get_rest()[key] = value
+
+    def __delitem__(self, key: str):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        else:
+            del self._get_rest()[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return key in self._get_rest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        return self._get_rest().get(key, default)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._rest is not None:
+            yield from self._get_rest()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f'Species({dict(self)!r})'
+
+
+def load_species_records(records: Iterable[JsonData]) -> List[Species]:
+    return [Species(record) for record in records]
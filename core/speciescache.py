@@ -0,0 +1,195 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import threading
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from . import instrument
+from .file import JsonData, JsonStream, stream_json
+from .hashcache import StatKey, hash_file
+from .index import Key, get_class_path
+
+__all__ = [
+    'CACHE_DIR',
+    'SpeciesCache',
+    'compile_species',
+    'load_species',
+    'remove_caches',
+]
+
+# Under the repository, whichever directory the tools are run from
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / 'cache'
+
+# Magic, the offset of the index, which follows the records, and the size and
+# mtime_ns the source file had when it was compiled or last hashed
+MAGIC = b'OBSPC\x00\x02' + bytes((marshal.version,))
+HEADER = struct.Struct('<8sQqq')
+
+
+class SpeciesCache:
+    '''
+    Species records of an Obelisk file, memory-mapped from a file written by
+    compile_species. Only the offsets are read up front; each record is
+    decoded when it is accessed, and every access returns a fresh copy.
+    '''
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_offset, *_ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a species cache')
+        self.fields: JsonData
+        self._offsets: List[int]
+        self._keys: Dict[str, int]
+        self.fields, self._offsets, self._keys = \
+            marshal.loads(self._map[index_offset:])
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.fields.get('version', None)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> JsonData:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return marshal.loads(self._map[start:end])
+
+    def __iter__(self) -> Iterator[JsonData]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def get(self, blueprint: Key) -> Optional[JsonData]:
+        index = self._keys.get(get_class_path(blueprint), None)
+        return None if index is None else self[index]
+
+    def close(self):
+        self._map.close()
+
+
+def compile_species(stream: JsonStream, path: Path,
+                    source_stat: StatKey = (-1, -1)):
+    '''
+    Writes the records of the stream to `path` one after another in marshal
+    format, followed by their offsets and a class path index. `source_stat`
+    is the stat of the source file, taken before it was read.
+    '''
+    offsets = list()
+    keys = dict()
+    # Unique per process and thread, as several may compile the same file
+    temp_path = path.with_name(
+        f'{path.name}.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        with open(temp_path, 'wb') as fp:
+            fp.write(HEADER.pack(MAGIC, 0, *source_stat))
+            for index, record in enumerate(stream):
+                offsets.append(fp.tell())
+                fp.write(marshal.dumps(record))
+                keys.setdefault(get_class_path(record), index)
+            offsets.append(fp.tell())
+
+            index_offset = fp.tell()
+            marshal.dump((stream.fields, offsets, keys), fp)
+            fp.seek(0)
+            fp.write(HEADER.pack(MAGIC, index_offset, *source_stat))
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def read_source_stat(path: Path) -> Optional[StatKey]:
+    '''Returns the source stat recorded in a cache, None if unreadable.'''
+    try:
+        with open(path, 'rb') as fp:
+            header = fp.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) != HEADER.size:
+        return None
+    magic, _, size, mtime_ns = HEADER.unpack(header)
+    return (size, mtime_ns) if magic == MAGIC else None
+
+
+def write_source_stat(path: Path, source_stat: StatKey):
+    with open(path, 'r+b') as fp:
+        magic, index_offset, *_ = HEADER.unpack(fp.read(HEADER.size))
+        fp.seek(0)
+        fp.write(HEADER.pack(magic, index_offset, *source_stat))
+
+
+def _cache_prefix(filename: Path, key: str) -> str:
+    # Files with the same name in different directories get their own caches
+    source = f'{filename.resolve()}\0{key}'.encode('utf-8')
+    return f'{filename.stem}-{key}-{hashlib.sha1(source).hexdigest()}'
+
+
+def _find_caches(cache_dir: Path, prefix: str) -> List[Path]:
+    # Named after the contents they were compiled from
+    return sorted(cache_dir.glob(f'{prefix}-{"?" * 40}.bin'))
+
+
+def remove_caches(filename: Union[str, Path], key: str = 'species',
+                  cache_dir: Path = CACHE_DIR):
+    '''Removes the compiled caches of a file, such as a temporary one.'''
+    for path in _find_caches(cache_dir, _cache_prefix(Path(filename), key)):
+        path.unlink(missing_ok=True)
+
+
+def load_species(filename: Union[str, Path], key: str = 'species',
+                 cache_dir: Optional[Path] = CACHE_DIR) \
+        -> Union[SpeciesCache, JsonStream]:
+    '''
+    Opens the records of an Obelisk file through a compiled cache in
+    `cache_dir`, compiling it first if the file's contents have changed.
+    A cache is trusted while the file keeps the size and mtime_ns it was
+    compiled with; the file is only hashed when they differ. Streams the file
+    instead if `cache_dir` is None or cannot be written.
+    '''
+    filename = Path(filename)
+    if cache_dir is None:
+        return stream_json(filename, key)
+
+    stat = os.stat(filename)
+    source_stat = (stat.st_size, stat.st_mtime_ns)
+    prefix = _cache_prefix(filename, key)
+    caches = _find_caches(cache_dir, prefix)
+    for cached in caches:
+        if read_source_stat(cached) == source_stat:
+            instrument.count('species_cache.hits')
+            return SpeciesCache(cached)
+
+    path = cache_dir / f'{prefix}-{hash_file(filename)}.bin'
+    if path.is_file():
+        # Touched but unchanged
+        instrument.count('species_cache.rehashed')
+        try:
+            write_source_stat(path, source_stat)
+        except OSError:
+            pass
+        return SpeciesCache(path)
+
+    instrument.count('species_cache.misses')
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with instrument.span('compile species cache'):
+            compile_species(stream_json(filename, key), path, source_stat)
+    except OSError:
+        return stream_json(filename, key)
+
+    # Caches of older contents of the same file are no longer used
+    for stale in caches:
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return SpeciesCache(path)
@@ -0,0 +1,115 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, \
+                   Union
+
+import numpy as np
+
+from .file import JsonData
+
+__all__ = [
+    'STAT_COUNT',
+    'PARAM_COUNT',
+    'Column',
+    'StatTable',
+]
+
+STAT_COUNT = 12
+PARAM_COUNT = 5
+
+# Stat indices in fullStatsRaw
+HEALTH = 0
+STAMINA = 1
+TORPOR = 2
+OXYGEN = 3
+FOOD = 4
+WATER = 5
+TEMPERATURE = 6
+WEIGHT = 7
+DAMAGE = 8
+SPEED = 9
+FORTITUDE = 10
+CRAFTING = 11
+
+# Parameter indices of a stat
+BASE = 0
+INC_WILD = 1
+INC_TAMED = 2
+ADD_TAMED = 3
+AFFINITY = 4
+
+# Output name, stat, parameter and the factor it is scaled by
+Column = Tuple[str, int, int, Union[int, float]]
+
+
+class StatTable:
+    '''
+    fullStatsRaw of a list of species as one (species, stat, parameter)
+    array. Stats a species does not have are NaN. Which values were integers
+    in the data is kept, so extracted values print as they did before.
+    '''
+    def __init__(self, species: Sequence[JsonData]):
+        self.species = species
+        shape = (len(species), STAT_COUNT, PARAM_COUNT)
+        self.values = np.full(shape, np.nan)
+        self.is_int = np.zeros(shape, dtype=bool)
+
+        for row, blueprint in enumerate(species):
+            for stat, params in enumerate(blueprint['fullStatsRaw'] or ()):
+                if params is None:
+                    continue
+                self.values[row, stat, :len(params)] = params
+                self.is_int[row, stat, :len(params)] = [
+                    type(param) is int for param in params
+                ]
+
+    def __len__(self) -> int:
+        return len(self.species)
+
+    def column(self, stat: int, param: int) -> np.ndarray:
+        return self.values[:, stat, param]
+
+    def wild_curves(self, points: Iterable[int]) -> np.ndarray:
+        '''
+        Wild values of every stat after the given numbers of level-ups in it,
+        as a (species, stat, points) array.
+        '''
+        points = np.asarray(points, dtype=float)
+        base = self.values[:, :, BASE, np.newaxis]
+        increase = self.values[:, :, INC_WILD, np.newaxis]
+        return base * (1 + points * increase)
+
+    def wild_curve(self, stat: int, points: Iterable[int]) -> np.ndarray:
+        '''Wild values of one stat, as a (species, points) array.'''
+        points = np.asarray(points, dtype=float)
+        base = self.values[:, stat, BASE, np.newaxis]
+        increase = self.values[:, stat, INC_WILD, np.newaxis]
+        return base * (1 + points * increase)
+
+    def extract(self, columns: Sequence[Column]) -> List[Dict[str, Any]]:
+        '''
+        One dict of the named values per species. Stats a species does not
+        have come out as None.
+        '''
+        stats = [stat for _, stat, _, _ in columns]
+        params = [param for _, _, param, _ in columns]
+        factors = np.array([factor for _, _, _, factor in columns],
+                           dtype=float)
+
+        values = (self.values[:, stats, params] * factors).tolist()
+        is_int = (self.is_int[:, stats, params]
+                  & np.array([type(factor) is int for _, _, _, factor
+                              in columns])).tolist()
+        names = [name for name, _, _, _ in columns]
+
+        return [
+            {
+                name: _to_python(value, as_int)
+                for name, value, as_int in zip(names, row, row_is_int)
+            }
+            for row, row_is_int in zip(values, is_int)
+        ]
+
+
+def _to_python(value: float, as_int: bool) -> Optional[Union[int, float]]:
+    if value != value:
+        return None
+    return int(value) if as_int else value
@@ -0,0 +1,93 @@
+'''
+Species files are streamed unless a shared_species_files() block is open, and
+ObASB keeps what it reads to itself.
+'''
+from functools import partial
+
+import pytest
+
+import json
+
+from benchmarks import obelisk
+from core import data_context
+from core.data_context import ROOT_ASB, ObASB, load_species_file, \
+    shared_species_files
+from core.speciescache import load_species
+
+
+@pytest.fixture(scope='module')
+def obelisk_path(tmp_path_factory):
+    path, _ = obelisk.generate(tmp_path_factory.mktemp('synthetic'),
+                               species=50, mods=0, worlds=0)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    # Instead of the repository's
+    monkeypatch.setattr(data_context, 'load_species',
+                        partial(load_species, cache_dir=tmp_path))
+    return tmp_path
+
+
+def test_streamed_outside_block(obelisk_path):
+    path = obelisk_path / ROOT_ASB / 'values.json'
+    species_file = load_species_file(path)
+    assert not isinstance(species_file.species, list)
+    assert len(list(species_file.species)) == 50
+    assert species_file.version is not None
+    assert load_species_file(path) is not load_species_file(path)
+    assert data_context._shared_files is None
+
+
+def test_shared_within_block(obelisk_path):
+    path = obelisk_path / ROOT_ASB / 'values.json'
+    with shared_species_files():
+        first = load_species_file(path)
+        assert isinstance(first.species, list)
+        assert load_species_file(path) is first
+        with shared_species_files():
+            assert load_species_file(path) is not first
+        assert load_species_file(path) is first
+    assert data_context._shared_files is None
+
+
+def test_asb_keeps_its_own_species(obelisk_path):
+    first, second = ObASB(obelisk_path), ObASB(obelisk_path)
+    assert len(first.get_dinos()) == 50
+    assert first.get_dinos() is not second.get_dinos()
+    assert first.get_dinos()[0] is not second.get_dinos()[0]
+    assert first.version == second.version
+
+
+def test_asb_streams_without_index(obelisk_path):
+    asb = ObASB(obelisk_path)
+    names = [dino['name'] for dino in asb.stream_dinos()]
+    assert asb._index is None
+    assert asb.version is not None
+    assert asb._index is None
+    assert names == [dino['name'] for dino in asb.get_dinos()]
+
+
+def test_mods_found_by_manifest(tmp_path):
+    path, _ = obelisk.generate(tmp_path / 'synthetic', species=5, mods=1,
+                               mod_species=3, worlds=0)
+    manifest = json.loads((path / ROOT_ASB / '_manifest.json').read_text())
+    filename, entry = next((filename, entry) for filename, entry
+                           in manifest['files'].items() if 'mod' in entry)
+
+    asb = ObASB(path, None, [entry['mod']['id']])
+    assert asb.files == ['values.json', filename]
+    assert len(asb.get_dinos()) == 8
+
+
+def test_unlisted_mods_found_by_file_name(tmp_path):
+    path, _ = obelisk.generate(tmp_path / 'synthetic', species=5, mods=0,
+                               worlds=0)
+    values = json.loads((path / ROOT_ASB / 'values.json').read_text())
+    values['species'] = values['species'][:2]
+    (path / ROOT_ASB / '1234-1234.json').write_text(json.dumps(values))
+
+    asb = ObASB(path, None, ['1234'])
+    assert asb.files == ['values.json', '1234-1234.json']
+    assert len(asb.get_dinos()) == 7
@@ -0,0 +1,51 @@
+'''
+Descriptive names are cached per filter, and the cache reports its hit rate
+through the profiler.
+'''
+import pytest
+
+from core import instrument
+from core.dino import get_name_resolver
+from core.filter import Filter
+
+
+@pytest.fixture
+def profiler():
+    profiler = instrument.enable('test', trace_memory=False)
+    yield profiler
+    instrument.disable()
+
+
+def make_blueprint(name, variants=None):
+    blueprint = dict(blueprintPath=f'/Game/{name}/{name}_C.{name}_C',
+                     name=name)
+    if variants:
+        blueprint['variants'] = variants
+    return blueprint
+
+
+def test_hits_and_misses_are_counted(profiler):
+    flt = Filter()
+    flt.dinoNameOverrides = dict(Raptor_C='Utahraptor')
+    flt.displayVariants = dict(Aberrant='')
+    resolver = get_name_resolver(flt)
+    rex, raptor = make_blueprint('Rex'), make_blueprint('Raptor')
+
+    assert resolver.resolve(rex) == 'Rex'
+    assert resolver.resolve(rex) == 'Rex'
+    assert resolver.resolve(raptor) == 'Utahraptor'
+    # Same path, other variants
+    aberrant = make_blueprint('Rex', ['Aberrant'])
+    assert resolver.resolve(aberrant) == 'Rex (Aberrant)'
+    assert resolver.resolve(aberrant) == 'Rex (Aberrant)'
+
+    totals = profiler.totals()
+    assert totals['names.hits'] == 2
+    assert totals['names.misses'] == 3
+
+
+def test_counting_without_profiler():
+    assert instrument.get_profiler() is None
+    resolver = get_name_resolver(Filter())
+    assert resolver.resolve(make_blueprint('Rex')) == 'Rex'
+    assert resolver.resolve(make_blueprint('Rex')) == 'Rex'
@@ -0,0 +1,30 @@
+'''
+core.file only imports numpy once query_mask needs it.
+'''
+import subprocess
+import sys
+
+from pathlib import Path
+
+from core.file import query, query_mask
+
+ROOT_PATH = Path(__file__).parent.parent
+
+
+def test_import_leaves_out_numpy():
+    process = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, core.file; print("numpy" in sys.modules)'],
+        cwd=ROOT_PATH, capture_output=True, text=True, check=True)
+    assert process.stdout.strip() == 'False'
+
+
+def test_query_mask_matches_query():
+    rows = [dict(name=f'Dino {index}', level=index % 7 or None)
+            for index in range(50)]
+    conditions = (dict(where='level', not_null=True),
+                  dict(where=lambda row: row['level'] > 3, equals=True))
+    mask = query_mask(rows, *conditions)
+    assert [row for row, keep in zip(rows, mask) if keep] \
+        == list(query(rows, *conditions))
+    assert not query_mask([], *conditions).any()
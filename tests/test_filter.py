@@ -0,0 +1,74 @@
+'''
+Filters loaded from memoized documents can be changed without changing the
+documents, or other filters loaded from them.
+'''
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from benchmarks.filters import describe
+from core import filter as core_filter
+from core.filter import Deserializable, load_filter
+
+# Register the namespaces of the tools' filters
+import tools.cloning.filter_ext  # noqa: F401
+import tools.dvjson.filter_ext  # noqa: F401
+import tools.wildstats.filter_ext  # noqa: F401
+
+ROOT_PATH = Path(__file__).parent.parent
+FILTER_PATHS = sorted(path.relative_to(ROOT_PATH)
+                      for path in (ROOT_PATH / 'filters').rglob('*.yml'))
+
+
+@pytest.fixture(autouse=True)
+def in_root(monkeypatch):
+    # Filters import each other by paths relative to the repository
+    monkeypatch.chdir(ROOT_PATH)
+
+
+def scribble(value: Any):
+    '''Changes every list and dict reachable from a filter in place.'''
+    if isinstance(value, Deserializable):
+        for name in set(value.get_fields()):
+            scribble(getattr(value, name, None))
+    elif isinstance(value, list):
+        for item in value:
+            scribble(item)
+        value.append('scribbled')
+    elif isinstance(value, dict):
+        for item in list(value.values()):
+            scribble(item)
+        value['scribbled'] = 'scribbled'
+
+
+@pytest.mark.parametrize('path', FILTER_PATHS, ids=str)
+def test_changing_filter_keeps_documents(path):
+    core_filter._DOCUMENTS.clear()
+    expected = describe(load_filter(str(path)))
+    documents = describe(dict(core_filter._DOCUMENTS))
+
+    scribble(load_filter(str(path)))
+    assert describe(dict(core_filter._DOCUMENTS)) == documents
+    assert describe(load_filter(str(path))) == expected
+
+
+def test_imported_lists_are_joined_into_copies(tmp_path):
+    base, child = tmp_path / 'base.yml', tmp_path / 'child.yml'
+    base.write_text('filter:\n'
+                    '  skipMaps: [Island]\n'
+                    '  selectors:\n'
+                    '    includeClasses: [Rex_C]\n')
+    child.write_text(f'import: {base}\n'
+                     'filter:\n'
+                     '  skipMaps: [Ragnarok]\n')
+
+    first = load_filter(str(child))
+    assert first.skipMaps == ['Island', 'Ragnarok']
+    first.skipMaps.append('Valguero')
+    first.selectors.includeClasses.append('Raptor_C')
+
+    second = load_filter(str(base))
+    assert second.skipMaps == ['Island']
+    assert second.selectors.includeClasses == ['Rex_C']
+    assert load_filter(str(child)).skipMaps == ['Island', 'Ragnarok']
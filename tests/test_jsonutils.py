@@ -0,0 +1,88 @@
+'''
+The layout walk against the regular expression passes it replaced.
+'''
+import json
+import re
+
+import pytest
+
+from core.jsonutils import DUMP_PROFILE, format_json, layout_json
+
+JOIN_COLORS_REGEX = re.compile(r"\[\n\s+([\w\" ]+),\n\s+(.{,90})\n\s+\]")
+JOIN_MULTIPLE_NUMBERS_REGEX = re.compile(
+    r'(\n\s+)[-+.\de]+,(?:\n\s+[-+.\de"]+,?){1,12}')
+DUMP_JOIN_MULTIPLE_NUMBERS_REGEX = re.compile(
+    r'(\n\s+)[-+.\de]+,(?:\n\s+(?:[-+.\de"]|null)+,?){1,12}')
+JOIN_MULTIPLE_STRINGS_REGEX = re.compile(
+    r'\[((?:\n\s+".{1,30}",?\s*$){1,4})\n\s+\]', re.MULTILINE)
+COLLAPSE_SINGLE_LINE_DICT_REGEX = re.compile(
+    r"\{\n\s+(\"\w+\": [^}\n\]]{1,120})\n\s+\}")
+COLLAPSE_SINGLE_LINE_ARRAY_REGEX = re.compile(r'\[\s+(.+)\s+\]')
+JOIN_LINE_FIELDS = (
+    'x|y',
+    'x|y|z',
+    'a|b',
+    'a|b|c',
+    'lat|long?',
+    'name|interval|dmg|radius|stamina',
+    'base|sprint',
+    'base|crouch|sprint',
+    'min|max',
+    'min|max|pow',
+)
+
+
+def _flatten(text: str) -> str:
+    return re.sub(r'\s*\n\s+', '', text).replace(',', ', ')
+
+
+def reference_format_json(data) -> str:
+    '''format_json(pretty=True) as the regular expression passes did it.'''
+    result = json.dumps(data, indent='\t')
+    for term in JOIN_LINE_FIELDS:
+        field_part = rf'(?:(\"(?:{term})\": [^,\n]+,?))'
+        field_count = term.count('|') + 1
+        full_re = r'\s+'.join([field_part] * field_count) + r'(\s+)'
+        subs = ' '.join(f'\\{n+1}'
+                        for n in range(field_count)) + f'\\{field_count+1}'
+        result = re.sub(full_re, subs, result)
+    result = JOIN_MULTIPLE_NUMBERS_REGEX.sub(
+        lambda match: match[1] + _flatten(match[0]), result)
+    result = JOIN_MULTIPLE_STRINGS_REGEX.sub(
+        lambda match: f'[ {_flatten(match[1])} ]', result)
+    result = COLLAPSE_SINGLE_LINE_DICT_REGEX.sub(r"{ \1 }", result)
+    result = COLLAPSE_SINGLE_LINE_ARRAY_REGEX.sub(r"[ \1 ]", result)
+    return JOIN_COLORS_REGEX.sub(r"[ \1, \2 ]", result)
+
+
+def reference_dump_json(data) -> str:
+    '''dump_json's pretty output as the regular expression passes did it.'''
+    result = json.dumps(data, indent='  ')
+    result = DUMP_JOIN_MULTIPLE_NUMBERS_REGEX.sub(
+        lambda match: match[1] + _flatten(match[0]), result)
+    return COLLAPSE_SINGLE_LINE_ARRAY_REGEX.sub(r"[ \1 ]", result)
+
+
+# Strings in runs of numbers and in short arrays of strings, with commas
+MIXED_ARRAYS = [
+    [1, '1,2', 3],
+    [1, 2, '1,2'],
+    [1, '12,5,3', 'x'],
+    [1, '1,2,3', 4, 5],
+    [1, 'a,b', 2],
+    [1, '-1e5,x', 2],
+    [1, '1", 2', 2],
+    [1, '12', '3,4', 5],
+    [1, None, 'null,1', 2],
+    [1, 'nullable,1', 2],
+    ['a,b', 'c'],
+    ['1,2', '3,4,5'],
+    ['a', 'b,c', 'd', 'e'],
+]
+
+
+@pytest.mark.parametrize('value', MIXED_ARRAYS, ids=json.dumps)
+def test_strings_with_commas_match_passes(value):
+    data = dict(values=value, nested=dict(values=value), rows=[value, value])
+    assert format_json(data, pretty=True) == reference_format_json(data)
+    assert layout_json(data, DUMP_PROFILE) == reference_dump_json(data)
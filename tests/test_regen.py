@@ -0,0 +1,85 @@
+'''
+When OutputState finds an output current, and which files it reads to tell.
+'''
+import os
+
+from pathlib import Path
+
+import pytest
+
+from core import regen
+from core.filter import Filter
+from core.regen import OutputState
+
+
+@pytest.fixture
+def hashed(monkeypatch, tmp_path):
+    '''Files read by hash_file, with the digests cached under tmp_path.'''
+    monkeypatch.setattr(regen, 'FILE_HASHES_PATH',
+                        tmp_path / 'cache' / 'hashes.json')
+    files = list()
+    hash_file = regen.hash_file
+
+    def _hash_file_(path):
+        files.append(Path(path).name)
+        return hash_file(path)
+
+    monkeypatch.setattr(regen, 'hash_file', _hash_file_)
+    return files
+
+
+@pytest.fixture
+def tool(tmp_path):
+    '''An output, its input, and the code of two tools.'''
+    for name in ('tool', 'other'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f'{name}.py').write_text('VALUE = 1\n')
+    (tmp_path / 'values.json').write_text('{"species": []}')
+    output = tmp_path / 'out.txt'
+    output.write_text('output')
+    return tmp_path
+
+
+def make_state(tool: Path, **kwargs) -> OutputState:
+    return OutputState(tool / 'out.txt', 'tool', Filter(),
+                       [tool / 'values.json'], tool / 'tool', **kwargs)
+
+
+def test_used_tool_code_is_fingerprinted(tool, hashed):
+    make_state(tool, uses=[tool / 'other']).save()
+    assert make_state(tool, uses=[tool / 'other']).is_current()
+
+    (tool / 'other' / 'other.py').write_text('VALUE = 2\n')
+    assert not make_state(tool, uses=[tool / 'other']).is_current()
+
+
+def test_inputs_hashed_once(tool, hashed):
+    make_state(tool).save()
+    assert 'values.json' in hashed
+
+    hashed.clear()
+    assert make_state(tool).is_current()
+    assert hashed == []
+
+    # Touched but unchanged
+    stat = (tool / 'values.json').stat()
+    os.utime(tool / 'values.json',
+             ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert make_state(tool).is_current()
+    assert hashed == ['values.json']
+
+
+def test_changed_input_is_not_current(tool, hashed):
+    make_state(tool).save()
+    (tool / 'values.json').write_text('{"species": [{}]}')
+    assert not make_state(tool).is_current()
+
+
+def test_removed_inputs_are_forgotten(tool, hashed):
+    make_state(tool).save()
+    (tool / 'values.json').rename(tool / 'moved.json')
+    OutputState(tool / 'out.txt', 'tool', Filter(), [tool / 'moved.json'],
+                tool / 'tool')
+    entries = regen.load_hash_cache(regen.FILE_HASHES_PATH).entries
+    assert str((tool / 'moved.json').resolve()) in entries
+    assert str((tool / 'values.json').resolve()) not in entries
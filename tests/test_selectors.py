@@ -0,0 +1,200 @@
+'''
+Compiled selectors against the should_skip they replaced, for every filter
+under filters/ and synthetic species from benchmarks.obelisk.
+'''
+import functools
+import json
+import re
+
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from benchmarks import obelisk
+from core import dino
+from core.blueprint import get_class_name, get_path
+from core.data_context import ROOT_ASB
+from core.file import JsonData
+from core.filter import CreatureBPList, Filter, load_filter
+from core.species import load_species_records
+from core.speciescache import load_species
+
+# Register the namespaces of the tools' filters
+import tools.cloning.filter_ext  # noqa: F401
+import tools.dvjson.filter_ext  # noqa: F401
+import tools.wildstats.filter_ext  # noqa: F401
+
+ROOT_PATH = Path(__file__).parent.parent
+FILTER_PATHS = sorted(path.relative_to(ROOT_PATH)
+                      for path in (ROOT_PATH / 'filters').rglob('*.yml'))
+
+
+@functools.lru_cache(maxsize=None)
+def as_paths(values: Tuple[str, ...]) -> List[Path]:
+    return [Path(value) for value in values]
+
+
+def bps_contain(bps: CreatureBPList, item: str) -> bool:
+    # Paths are matched on whole segments, as a parent or the path itself
+    itemp = Path(item)
+    parents = itemp.parents
+    return any(node == itemp or node in parents
+               for node in as_paths(tuple(bps.values)))
+
+
+def reference_should_skip(flt: Filter, blueprint: JsonData) -> bool:
+    '''should_skip as it was before selectors were compiled.'''
+    blueprint_path = get_path(blueprint, no_class=True)
+    class_name = get_class_name(blueprint)
+    name = dino.resolve_descriptive_name(flt, blueprint)
+    selectors = flt.selectors
+
+    if selectors.matchRegex:
+        re_name = selectors.matchRegex.get('name', None)
+        if re_name and not re.match(re_name, name):
+            return True
+
+    if bps_contain(selectors.ignoreBPs, blueprint_path):
+        return True
+
+    if selectors.ignoreClasses or selectors.ignoreVariants:
+        if class_name in selectors.includeClasses:
+            return False
+
+        if class_name in selectors.ignoreClasses:
+            return True
+        elif any(variant in selectors.ignoreVariants
+                 for variant in blueprint.get('variants', [])):
+            return True
+    elif selectors.includeBPs.values \
+            and not bps_contain(selectors.includeBPs, blueprint_path):
+        return True
+    elif selectors.includeClasses:
+        if class_name not in selectors.includeClasses:
+            return True
+
+    return False
+
+
+@pytest.fixture(autouse=True)
+def in_root(monkeypatch):
+    # Filters import each other by paths relative to the repository
+    monkeypatch.chdir(ROOT_PATH)
+
+
+def load_filters() -> List[Filter]:
+    return [load_filter(str(path)) for path in FILTER_PATHS]
+
+
+def listed_species(filters: List[Filter]) -> List[JsonData]:
+    '''Species for the classes and paths the filters name themselves.'''
+    species = list()
+    for flt in filters:
+        selectors = flt.selectors
+        names = [*selectors.includeClasses, *selectors.ignoreClasses,
+                 *flt.dinoNameOverrides]
+        variants = sorted(selectors.ignoreVariants)[:1]
+        for class_name in names:
+            asset = class_name[:-2] if class_name.endswith('_C') \
+                    else class_name
+            # With and without a variant the filter ignores
+            for listed_variants in {(), tuple(variants)}:
+                species.append(dict(
+                    blueprintPath=f'/Game/Listed/{asset}.{asset}',
+                    name=class_name,
+                    variants=list(listed_variants),
+                ))
+        for bps in (selectors.ignoreBPs, selectors.includeBPs):
+            for path in bps.values:
+                # The path itself, one below it, and a sibling sharing its
+                # name as a prefix
+                for asset in (path, path + '/Sub/Dino', path + 'X'):
+                    name = asset[asset.rindex('/') + 1:]
+                    species.append(dict(blueprintPath=f'{asset}.{name}',
+                                        name=name))
+    return species
+
+
+@pytest.fixture(scope='module')
+def species(tmp_path_factory) -> List[JsonData]:
+    output = tmp_path_factory.mktemp('synthetic')
+    known_paths = list()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(ROOT_PATH)
+        filters = load_filters()
+    for flt in filters:
+        for bps in (flt.selectors.ignoreBPs, flt.selectors.includeBPs):
+            known_paths.extend(bps.values)
+
+    obelisk_path, _ = obelisk.generate(output, species=600, mods=5,
+                                       mod_species=60, worlds=0,
+                                       known_paths=sorted(set(known_paths)))
+    records: List[JsonData] = list()
+    for path in sorted((obelisk_path / ROOT_ASB).glob('*.json')):
+        if path.name != '_manifest.json':
+            records.extend(load_species_records(load_species(path,
+                                                             cache_dir=None)))
+    return records + listed_species(filters)
+
+
+def test_filters_found():
+    assert len(FILTER_PATHS) >= 14
+
+
+@pytest.mark.parametrize('path', FILTER_PATHS, ids=str)
+def test_should_skip_matches_reference(path, species):
+    flt = load_filter(str(path))
+    expected = [reference_should_skip(flt, blueprint) for blueprint in species]
+    actual = [dino.should_skip(flt, blueprint) for blueprint in species]
+    assert actual == expected
+    assert not all(expected)
+
+
+# Selector combinations none of the repository's filters use
+SELECTOR_CASES = {
+    'ignore_lists': lambda classes, paths: dict(
+        includeClasses=classes[:3],
+        ignoreClasses=classes[2:40],
+        ignoreVariants=['Alpha', 'Tek'],
+    ),
+    'include_bps': lambda classes, paths: dict(
+        includeBPs=paths[:20],
+        ignoreBPs=paths[10:15],
+    ),
+    'include_classes': lambda classes, paths: dict(
+        includeClasses=classes[::3],
+        ignoreBPs=paths[:40],
+    ),
+    'ignore_bps_with_regex': lambda classes, paths: dict(
+        matchRegex=dict(name='^(Rex|Raptor|Giga)'),
+        ignoreBPs=[path.rsplit('/', 1)[0] for path in paths[:20]],
+    ),
+}
+
+
+@pytest.mark.parametrize('case', sorted(SELECTOR_CASES))
+def test_selector_cases_match_reference(case, species, tmp_path):
+    classes = sorted(set(get_class_name(blueprint) for blueprint in species))
+    paths = sorted(set(get_path(blueprint, no_class=True)
+                       for blueprint in species))
+    filter_path = tmp_path / f'{case}.yml'
+    filter_path.write_text(json.dumps(dict(
+        filter=dict(selectors=SELECTOR_CASES[case](classes, paths)))))
+
+    flt = load_filter(str(filter_path))
+    expected = [reference_should_skip(flt, blueprint) for blueprint in species]
+    assert [dino.should_skip(flt, blueprint)
+            for blueprint in species] == expected
+    assert any(expected) and not all(expected)
+
+
+@pytest.mark.parametrize('path', FILTER_PATHS, ids=str)
+def test_partition_matches_should_skip(path, species):
+    flt = load_filter(str(path))
+    selectors = dino.get_selectors(flt)
+    included, skipped = selectors.partition(species)
+    assert included == [blueprint for blueprint in species
+                        if not selectors.should_skip(blueprint)]
+    assert skipped == [blueprint for blueprint in species
+                       if selectors.should_skip(blueprint)]
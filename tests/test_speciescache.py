@@ -0,0 +1,135 @@
+'''
+Compiled species caches: when they are reused, rehashed, recompiled and
+removed.
+'''
+import json
+import os
+import threading
+
+from pathlib import Path
+
+import pytest
+
+from core import speciescache
+from core.file import stream_json
+from core.speciescache import CACHE_DIR, SpeciesCache, compile_species, \
+    load_species, remove_caches
+
+
+def write_values(path, names):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(dict(
+        version='1.0',
+        species=[dict(blueprintPath=f'/Game/{name}.{name}', name=name)
+                 for name in names])))
+
+
+def names_of(records):
+    return [record['name'] for record in records]
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    '''Files hashed by load_species.'''
+    hashed = list()
+    hash_file = speciescache.hash_file
+
+    def _hash_file_(path):
+        hashed.append(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(speciescache, 'hash_file', _hash_file_)
+    return hashed
+
+
+def test_warm_load_skips_hashing(tmp_path, hashes):
+    source, cache_dir = tmp_path / 'values.json', tmp_path / 'cache'
+    write_values(source, ['A', 'B'])
+
+    cold = load_species(source, cache_dir=cache_dir)
+    assert isinstance(cold, SpeciesCache)
+    assert len(hashes) == 1
+    warm = load_species(source, cache_dir=cache_dir)
+    assert warm.path == cold.path
+    assert names_of(warm) == ['A', 'B']
+    assert len(hashes) == 1
+
+
+def test_touched_file_is_rehashed_once(tmp_path, hashes):
+    source, cache_dir = tmp_path / 'values.json', tmp_path / 'cache'
+    write_values(source, ['A'])
+    path = load_species(source, cache_dir=cache_dir).path
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_species(source, cache_dir=cache_dir).path == path
+    assert len(hashes) == 2
+    assert load_species(source, cache_dir=cache_dir).path == path
+    assert len(hashes) == 2
+
+
+def test_changed_file_replaces_its_cache(tmp_path):
+    source, cache_dir = tmp_path / 'values.json', tmp_path / 'cache'
+    write_values(source, ['A'])
+    old = load_species(source, cache_dir=cache_dir).path
+    write_values(source, ['A', 'B', 'C'])
+
+    new = load_species(source, cache_dir=cache_dir)
+    assert names_of(new) == ['A', 'B', 'C']
+    assert sorted(cache_dir.iterdir()) == [new.path]
+    assert new.path != old
+
+
+def test_same_name_in_other_directory_is_kept(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    first, second = tmp_path / 'a' / 'values.json', \
+        tmp_path / 'b' / 'values.json'
+    write_values(first, ['A'])
+    write_values(second, ['B'])
+
+    load_species(first, cache_dir=cache_dir)
+    load_species(second, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 2
+    assert names_of(load_species(first, cache_dir=cache_dir)) == ['A']
+    assert names_of(load_species(second, cache_dir=cache_dir)) == ['B']
+
+
+def test_concurrent_compiles_leave_valid_cache(tmp_path):
+    source, cache_path = tmp_path / 'values.json', tmp_path / 'values.bin'
+    names = [f'Creature {index}' for index in range(2000)]
+    write_values(source, names)
+
+    errors = list()
+
+    def _compile_():
+        try:
+            compile_species(stream_json(source), cache_path)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=_compile_) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert names_of(SpeciesCache(cache_path)) == names
+    assert sorted(tmp_path.iterdir()) == [cache_path, source]
+
+
+def test_cache_dir_is_under_repository():
+    root = Path(__file__).resolve().parent.parent
+    assert CACHE_DIR == root / 'data' / 'cache'
+
+
+def test_remove_caches(tmp_path):
+    source, cache_dir = tmp_path / 'values.json', tmp_path / 'cache'
+    write_values(source, ['A'])
+    load_species(source, cache_dir=cache_dir)
+    other = tmp_path / 'other.json'
+    write_values(other, ['B'])
+    kept = load_species(other, cache_dir=cache_dir).path
+
+    remove_caches(source, cache_dir=cache_dir)
+    assert list(cache_dir.iterdir()) == [kept]
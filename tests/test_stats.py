@@ -0,0 +1,118 @@
+'''
+StatTable.extract and wildstats' columns against the per-species loop they
+replaced.
+'''
+import json
+import random
+
+from typing import Any, Dict, List
+
+import pytest
+
+from core.stats import PARAM_COUNT, STAT_COUNT, StatTable
+from tools.wildstats.cli import wild_stats
+from tools.wildstats.const import OXYGEN_COLUMNS, WILD_COLUMNS
+
+
+def reference_wild_stats(species: List[Dict[str, Any]]) \
+        -> List[Dict[str, Any]]:
+    '''wildstats' columns as they were read from each species' dict.'''
+    results = list()
+    for dino_data in species:
+        stats = dino_data['fullStatsRaw']
+        uses_oxygen = not dino_data['doesNotUseOxygen']
+
+        out: Dict[str, Any] = dict()
+        for name, stat, param, factor in WILD_COLUMNS:
+            if not uses_oxygen and name in OXYGEN_COLUMNS:
+                continue
+            # Stats the species does not have were an error before, and are
+            # None now
+            row = stats[stat] if stats and stat < len(stats) else None
+            out[name] = None if row is None else row[param] * factor
+        results.append(out)
+    return results
+
+
+def make_param(rng: random.Random):
+    kind = rng.random()
+    if kind < 0.3:
+        return rng.randint(0, 5000)
+    elif kind < 0.4:
+        return 0
+    elif kind < 0.5:
+        return 0.0
+    return round(rng.uniform(0, 2000), rng.randint(0, 6))
+
+
+def make_species(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    species = list()
+    for index in range(count):
+        stats = [
+            None if rng.random() < 0.15 else
+            [make_param(rng) for _ in range(PARAM_COUNT)]
+            for _ in range(STAT_COUNT)
+        ]
+        species.append(dict(
+            blueprintPath=f'/Game/C{index}/C{index}.C{index}',
+            fullStatsRaw=stats,
+            doesNotUseOxygen=rng.random() < 0.25,
+        ))
+    return species
+
+
+def as_printed(rows: List[Dict[str, Any]]) -> List[str]:
+    # Ints and floats of the same value print differently
+    return [json.dumps(row) for row in rows]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_wild_stats_match_loop(seed):
+    species = make_species(300, seed)
+    assert as_printed(wild_stats(species)) \
+        == as_printed(reference_wild_stats(species))
+
+
+def test_int_and_float_types_kept():
+    species = [
+        dict(fullStatsRaw=[[10, 0.2, 0, 0, 0]] * STAT_COUNT,
+             doesNotUseOxygen=False),
+        dict(fullStatsRaw=[[10.0, 1, 0, 0, 0]] * STAT_COUNT,
+             doesNotUseOxygen=False),
+    ]
+    first, second = wild_stats(species)
+    assert type(first['health1']) is int and type(first['healthInc']) is float
+    assert type(second['health1']) is float and type(second['healthInc']) is int
+    assert first['damage1'] == 1000 and type(first['damage1']) is int
+    assert second['damage1'] == 1000.0 and type(second['damage1']) is float
+
+
+def test_missing_stats_are_none():
+    species = [
+        dict(fullStatsRaw=[[1, 2, 3, 4, 5], None], doesNotUseOxygen=False),
+        dict(fullStatsRaw=None, doesNotUseOxygen=False),
+        dict(fullStatsRaw=[], doesNotUseOxygen=True),
+    ]
+    first, second, third = wild_stats(species)
+    assert (first['health1'], first['healthInc']) == (1, 2)
+    assert first['stamina1'] is None and first['damage1'] is None
+    assert set(second.values()) == {None}
+    assert set(third) == set(name for name, *_ in WILD_COLUMNS) \
+        - set(OXYGEN_COLUMNS)
+    assert set(third.values()) == {None}
+
+
+def test_oxygen_columns_dropped():
+    species = make_species(50, seed=7)
+    for dino_data, out in zip(species, wild_stats(species)):
+        has_oxygen = all(column in out for column in OXYGEN_COLUMNS)
+        assert has_oxygen == (not dino_data['doesNotUseOxygen'])
+
+
+def test_empty_selection():
+    assert wild_stats([]) == []
+    table = StatTable([])
+    assert len(table) == 0
+    assert table.extract(WILD_COLUMNS) == []
+    assert table.wild_curves([0, 10]).shape == (0, STAT_COUNT, 2)
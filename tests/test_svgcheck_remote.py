@@ -0,0 +1,214 @@
+'''
+svgcheck's remote hash fetching, against a fake MediaWiki api.php served
+from a local thread.
+'''
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+mwclient = pytest.importorskip('mwclient')
+
+from tools.svgcheck import remote  # noqa: E402
+
+FILE_COUNT = 1234
+# Files in the category that no longer exist
+MISSING_EVERY = 97
+# Longest request line accepted, as by common front-end servers
+MAX_REQUEST_LINE = 8192
+
+
+class FakeWiki:
+    '''Answers the queries mwclient and svgcheck make, and records them.'''
+    def __init__(self, rights: List[str]):
+        self.rights = rights
+        self.files: Dict[str, Optional[str]] = {
+            f'File:Spawning Creature {index} The Island.svg':
+                None if index % MISSING_EVERY == 0 else f'{index:040x}'
+            for index in range(FILE_COUNT)
+        }
+        self.lock = threading.Lock()
+        self.listings = 0
+        self.batches: List[int] = list()
+        # HTTP methods the imageinfo queries were sent with
+        self.batch_methods = set()
+        # Client addresses requests came from, one per connection
+        self.connections = set()
+
+    @property
+    def limit(self) -> int:
+        return 500 if 'apihighlimits' in self.rights else 50
+
+    def answer(self, method: str, params: Dict[str, str]) -> dict:
+        query: dict = dict(userinfo=dict(id=0, name='127.0.0.1', anon='',
+                                         rights=self.rights))
+        result: dict = dict(batchcomplete='', query=query)
+
+        if 'siteinfo' in params.get('meta', ''):
+            query['general'] = dict(generator='MediaWiki 1.35.0',
+                                    sitename='Fake')
+            query['namespaces'] = {
+                '0': dict(id=0, case='first-letter'),
+                '6': dict(id=6, case='first-letter', **{'*': 'File'}),
+            }
+
+        if params.get('list', None) == 'categorymembers':
+            assert params['cmtitle'] == remote.CATEGORY
+            limit = int(params['cmlimit'])
+            assert limit <= self.limit
+            start = int(params.get('cmcontinue', 0))
+            titles = list(self.files)[start:start + limit]
+            query['categorymembers'] = [dict(ns=6, title=title)
+                                        for title in titles]
+            if start + limit < len(self.files):
+                result['continue'] = dict(cmcontinue=str(start + limit),
+                                          **{'continue': '-||'})
+            with self.lock:
+                self.listings += 1
+
+        if params.get('prop', None) == 'imageinfo':
+            assert params['iiprop'] == 'sha1'
+            titles = params['titles'].split('|')
+            if len(titles) > self.limit:
+                return dict(error=dict(code='toomanyvalues',
+                                       info='Too many titles'))
+            pages = dict()
+            for index, title in enumerate(titles):
+                sha1 = self.files.get(title, None)
+                if sha1 is None:
+                    pages[str(-1 - index)] = dict(ns=6, title=title,
+                                                  missing='')
+                else:
+                    pages[str(1000 + index)] = dict(
+                        pageid=1000 + index, ns=6, title=title,
+                        imagerepository='local',
+                        imageinfo=[dict(sha1=sha1)])
+            query['pages'] = pages
+            with self.lock:
+                self.batches.append(len(titles))
+                self.batch_methods.add(method)
+
+        return result
+
+
+def make_handler(wiki: FakeWiki):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are written separately
+        disable_nagle_algorithm = True
+
+        def _reply(self, params: Dict[str, List[str]]):
+            assert self.path.startswith('/api.php')
+            with wiki.lock:
+                wiki.connections.add(self.client_address)
+            data = wiki.answer(self.command, {
+                key: values[-1] for key, values in params.items()})
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if len(self.requestline) > MAX_REQUEST_LINE:
+                self.send_error(414)
+                return
+            self._reply(parse_qs(urlsplit(self.path).query))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self._reply(parse_qs(self.rfile.read(length).decode('utf-8')))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture(params=[[], ['apihighlimits']], ids=['low', 'high'])
+def wiki(request):
+    wiki = FakeWiki(request.param)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(wiki))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    wiki.address = f'127.0.0.1:{server.server_address[1]}'
+    yield wiki
+    server.shutdown()
+    server.server_close()
+
+
+def make_connect(wiki: FakeWiki):
+    sites = list()
+
+    def _connect_():
+        site = mwclient.Site(wiki.address, path='/', scheme='http')
+        sites.append(site)
+        return site
+
+    return _connect_, sites
+
+
+def expected_hashes(wiki: FakeWiki) -> Dict[str, str]:
+    return {title: sha1 for title, sha1 in wiki.files.items() if sha1}
+
+
+def test_list_files_follows_continuation(wiki):
+    connect, _ = make_connect(wiki)
+    titles = remote.list_files(connect())
+    assert titles == list(wiki.files)
+    assert wiki.listings == -(-FILE_COUNT // wiki.limit)
+
+
+def test_fetch_hashes_skips_missing(wiki):
+    connect, _ = make_connect(wiki)
+    titles = list(wiki.files)[:wiki.limit]
+    hashes = remote.fetch_hashes(connect(), titles)
+    assert hashes == {title: sha1 for title, sha1 in expected_hashes(wiki)
+                      .items() if title in titles}
+    assert len(hashes) < len(titles)
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_build_hash_db(wiki, jobs, monkeypatch):
+    connect, sites = make_connect(wiki)
+    calls = list()
+    fetch_hashes = remote.fetch_hashes
+
+    def _fetch_(mw, titles):
+        with wiki.lock:
+            calls.append((threading.get_ident(), id(mw)))
+        return fetch_hashes(mw, titles)
+
+    monkeypatch.setattr(remote, 'fetch_hashes', _fetch_)
+    hashes = remote.build_hash_db(connect, jobs)
+
+    assert hashes == expected_hashes(wiki)
+    # Batched to the limit of the account
+    assert sum(wiki.batches) == FILE_COUNT
+    assert max(wiki.batches) == wiki.limit
+    assert wiki.batch_methods == {'POST'}
+
+    # Each worker fetches through a site of its own
+    threads_by_site = dict()
+    for thread, site in calls:
+        threads_by_site.setdefault(site, set()).add(thread)
+    assert all(len(threads) == 1 for threads in threads_by_site.values())
+    assert len(set(thread for thread, _ in calls)) <= jobs
+    # One site lists the files, the others only fetch
+    assert len(sites) == len(threads_by_site) + 1
+    assert len(wiki.connections) >= len(sites)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / 'remote.json'
+    hashes = {'File:A.svg': 'a' * 40}
+    remote.save_snapshot(path, 'wiki', hashes)
+    assert remote.load_snapshot(path, 'wiki', 60) == hashes
+    assert remote.load_snapshot(path, 'wiki', None) == hashes
+    assert remote.load_snapshot(path, 'other', None) is None
+    assert remote.load_snapshot(path, 'wiki', -1) is None
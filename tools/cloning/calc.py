@@ -0,0 +1,44 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .const import DinoData, CLONING_SECTION, \
+                   BASE_COST, LEVEL_COST, BASE_TIME, LEVEL_TIME
+
+# Decimals kept in level tables
+TABLE_DECIMALS = 2
+
+LevelTable = Dict[str, List[float]]
+
+
+def get_levels(min_level: int, max_level: int) -> np.ndarray:
+    return np.arange(min_level, max_level + 1, dtype=float)
+
+
+def level_costs(base: np.ndarray, per_level: np.ndarray,
+                levels: np.ndarray) -> np.ndarray:
+    '''base + per_level * level for every species and level at once.'''
+    values = base[:, np.newaxis] + per_level[:, np.newaxis] * levels
+    return np.round(values, TABLE_DECIMALS)
+
+
+def build_level_tables(species: Sequence[DinoData], min_level: int,
+                       max_level: int,
+                       include_times: bool = True) -> List[LevelTable]:
+    '''
+    Cloning cost, and time if asked for, of each species at every level from
+    `min_level` to `max_level`, in the order of `species`.
+    '''
+    levels = get_levels(min_level, max_level)
+    sections = [dino_data[CLONING_SECTION] for dino_data in species]
+    columns = np.array([[section[BASE_COST], section[LEVEL_COST],
+                         section[BASE_TIME], section[LEVEL_TIME]]
+                        for section in sections], dtype=float)
+    columns = columns.reshape(len(sections), 4)
+
+    costs = level_costs(columns[:, 0], columns[:, 1], levels).tolist()
+    if not include_times:
+        return [dict(cost=cost) for cost in costs]
+
+    times = level_costs(columns[:, 2], columns[:, 3], levels).tolist()
+    return [dict(cost=cost, time=time) for cost, time in zip(costs, times)]
@@ -1,10 +1,14 @@
 import sys
 
-from typing import Dict, Any, List, Iterable, Tuple, Union, Callable
+from typing import Dict, Any, List, Iterable, Optional, Tuple, \
+                   Union, Callable
 
-from core import blueprint, dino, cli
-from core.file import load_json, query, validate, dump_json
+from core import blueprint, dino, cli, instrument
+from core.data_context import load_species_file
+from core.file import query, dump_json, print_output, select_covering
 from core.filter import load_filter, Filter
+from core.regen import OutputState
+from .calc import build_level_tables
 from .const import DinoData, CLONING_SECTION, \
                    BASE_COST, LEVEL_COST, BASE_TIME, LEVEL_TIME
 from .filter_ext import FilterCloning
@@ -18,9 +22,12 @@ DinoCloningValues = Union[OutputTupleCC, OutputTupleCCTT]
 def run():
     obelisk_path = cli.get_path('obelisk', Path('data/obelisk'))
     filter_path = cli.get_path('filter', Path('filters/cloning_filter.yml'))
+    tables_path = cli.get_arg('tables', None)
+    output_path = cli.get_arg('output', None)
     flt = load_filter(filter_path)
     assert isinstance(flt, FilterCloning)
-    main(flt, obelisk_path)
+    main(flt, obelisk_path, Path(tables_path) if tables_path else None,
+         Path(output_path) if output_path else None, cli.get_bool('force'))
 
 
 def sort_dinos_by_name(flt: Filter) -> Callable[[DinoData], str]:
@@ -30,42 +37,93 @@ def sort_dinos_by_name(flt: Filter) -> Callable[[DinoData], str]:
     return _key_
 
 
-def main(flt: FilterCloning, obelisk_path: Path):
-    species = load_json(obelisk_path /
-                        'data/wiki/species.json')  # TODO: allow mods
-
-    game_version = species['version']
-    species = species['species']
-    species.sort(key=sort_dinos_by_name(flt))
-
-    if flt.includeDinoClasses:
-        validate(species,
-                 contains_range=flt.includeDinoClasses,
-                 of=blueprint.get_class_name)
-        conditions = [
-            dict(where=blueprint.get_class_name, contained_in=flt.includeDinoClasses)
-        ]
-    else:
-        conditions = [
-            dict(where=lambda x: dino.should_skip(flt, x), equals=True)
-        ]
-
-    results: Dict[str, DinoCloningValues] = dict()
-    for dino_data in query(species, *conditions,
-                           dict(where=CLONING_SECTION, not_null=True)):
-        cloning = dino_data[CLONING_SECTION]
-        cost_base = cloning[BASE_COST]
-        cost_level = cloning[LEVEL_COST]
-        time_base = cloning[BASE_TIME]
-        time_level = cloning[LEVEL_TIME]
-
-        out: DinoCloningValues = (cost_base, cost_level, time_base, time_level)
-        name = dino.get_descriptive_name(flt, dino_data)
-
-        if not flt.includeCloningTimes:
-            out = out[:2]
-
-        results[name] = out
-
-    print('// Version:', game_version)
-    print(dump_json(flt, results))
+def main(flt: FilterCloning, obelisk_path: Path,
+         tables_path: Optional[Path] = None,
+         output_path: Optional[Path] = None, force: bool = False):
+    '''
+    Prints the values, or writes them to `output_path`. Written outputs are
+    skipped when nothing they were generated from has changed.
+    '''
+    species_path = obelisk_path / 'data/wiki/species.json'  # TODO: allow mods
+
+    state = None
+    if output_path:
+        state = OutputState(output_path, 'cloning', flt, [species_path],
+                            Path(__file__).parent,
+                            outputs=[tables_path] if tables_path
+                                    and flt.levelTables else [],
+                            options=dict(tables=bool(tables_path)))
+        if not force and state.is_current():
+            print(f'{output_path} is up to date.')
+            return
+
+    with instrument.span('load'):
+        stream = load_species_file(species_path)
+
+    # Only selected species are kept, sorting them keeps the original order
+    with instrument.span('select'):
+        if flt.includeDinoClasses:
+            coverage = select_covering(stream.species,
+                                       flt.includeDinoClasses,
+                                       blueprint.get_class_name)
+            coverage.check()
+            species = coverage.rows
+        else:
+            species = list(query(
+                stream.species,
+                dict(where=lambda x: dino.should_skip(flt, x), equals=True),
+            ))
+        instrument.count('species.selected', len(species))
+    with instrument.span('sort'):
+        species.sort(key=sort_dinos_by_name(flt))
+    game_version = stream.version
+
+    with instrument.span('format'):
+        cloneable = list(query(species,
+                               dict(where=CLONING_SECTION, not_null=True)))
+        results: Dict[str, DinoCloningValues] = dict()
+        for dino_data in cloneable:
+            cloning = dino_data[CLONING_SECTION]
+            cost_base = cloning[BASE_COST]
+            cost_level = cloning[LEVEL_COST]
+            time_base = cloning[BASE_TIME]
+            time_level = cloning[LEVEL_TIME]
+
+            out: DinoCloningValues = (cost_base, cost_level, time_base,
+                                      time_level)
+            name = dino.get_descriptive_name(flt, dino_data)
+
+            if not flt.includeCloningTimes:
+                out = out[:2]
+
+            results[name] = out
+        instrument.count('species.output', len(results))
+
+    output: Any = results
+    if flt.levelTables:
+        with instrument.span('level tables'):
+            names = [dino.get_descriptive_name(flt, dino_data)
+                     for dino_data in cloneable]
+            tables = build_level_tables(cloneable, flt.minLevel,
+                                        flt.maxLevel,
+                                        flt.includeCloningTimes)
+            packed = dict(
+                version=game_version,
+                levels=[flt.minLevel, flt.maxLevel],
+                tables=dict(zip(names, tables)),
+            )
+            if tables_path:
+                with open(tables_path, 'wt') as tables_fp:
+                    dump_json(flt, packed, tables_fp)
+            else:
+                output = dict(values=results, levels=packed['levels'],
+                              tables=packed['tables'])
+
+    with instrument.span('write'):
+        if not output_path:
+            print_output(flt, sys.stdout, game_version, output)
+            return
+
+        with open(output_path, 'wt') as fp:
+            print_output(flt, fp, game_version, output)
+        state.save()
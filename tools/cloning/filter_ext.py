@@ -1,7 +1,13 @@
+from typing import List
 from core.filter import Filter, namespace
 
 
 @namespace('Cloning')
 class FilterCloning(Filter):
+    includeDinoClasses: List[str] = list()
     includeCloningTimes: bool = True
-    prettifyOutput: bool = False
\ No newline at end of file
+    prettifyOutput: bool = False
+    # Per-level cost and time tables
+    levelTables: bool = False
+    minLevel: int = 1
+    maxLevel: int = 450
\ No newline at end of file
@@ -4,10 +4,13 @@ from typing import Dict, Any, List, Iterable
 from pathlib import Path
 from collections import namedtuple
 
-from core import blueprint, dino, cli
-from core.file import load_json, query, validate, dump_json
+from core import blueprint, dino, cli, instrument
+from core.file import load_json, query
 from core.filter import load_filter
-from core.jsonutils import format_json
+from core.index import SpeciesIndex, get_class_path
+from core.jsonutils import write_json
+from core.regen import OutputState
+from core.data_context import load_species_file
 from .const import DinoData, WHITELISTED_FIELDS
 from .filter_ext import FilterDv
 from .mwimpl import get_dv_compatible_key, prepare_object
@@ -19,64 +22,111 @@ def run():
     filter_path = cli.get_path('filter', Path('filters/dv_filter.yml'))
     flt = load_filter(filter_path)
     assert isinstance(flt, FilterDv)
-    main(flt, obelisk_path, output_path)
+    main(flt, obelisk_path, output_path, cli.get_bool('force'))
 
 
 DataCollection = namedtuple('DataCollection', ('stats', 'extended'))
 
 
-def main(flt: FilterDv, obelisk_path: Path, output_path: Path):
-    data = DataCollection(
-        stats=load_json(obelisk_path / 'data/asb/values.json'),
-        extended=load_json(obelisk_path / 'data/wiki/species.json'),
+def zip_species(species: List[DinoData],
+                extended: List[DinoData]) -> Dict[int, DinoData]:
+    '''
+    Extended data of each species, keyed by the id() of its record. Records
+    are shared with other tools so they are left untouched.
+    '''
+    zipped = SpeciesIndex(extended).join(species)
+    extras: Dict[int, DinoData] = dict()
+    for dino1, dino2 in zipped.matched:
+        extras[id(dino1)] = dino2
+    for dino1 in zipped.unmatched_left:
+        bp1 = dino1['blueprintPath']
+        print(f'Zipping error: {bp1} does not have any extended data.')
+        extras[id(dino1)] = dict()
+    return extras
+
+
+def main(flt: FilterDv, obelisk_path: Path, output_path: Path,
+         force: bool = False):
+    inputs = DataCollection(
+        stats=obelisk_path / 'data/asb/values.json',
+        extended=obelisk_path / 'data/wiki/species.json',
     )
-    game_version = max(data.extended['version'], data.stats['version'])
+    state = OutputState(output_path, 'dvjson', flt, inputs,
+                        Path(__file__).parent)
+    if not force and state.is_current():
+        print(f'{output_path} is up to date.')
+        return
+
+    with instrument.span('load'):
+        streams = DataCollection(
+            stats=load_species_file(inputs.stats),
+            extended=load_species_file(inputs.extended),
+        )
+
+    # Only keep selected species and the extended data they need
+    with instrument.span('select'):
+        species = list(query(
+            streams.stats.species,
+            dict(where=lambda x: dino.should_skip(flt, x), equals=False),
+        ))
+        wanted = set(get_class_path(dino_data) for dino_data in species)
+        extended = list(query(
+            streams.extended.species,
+            dict(where=get_class_path, contained_in=wanted),
+        ))
+        instrument.count('species.selected', len(species))
+    game_version = max(streams.extended.version, streams.stats.version)
 
     # Sort data arrays
-    sort_key = lambda dino_data: dino.get_descriptive_name(flt, dino_data)
-    data.stats['species'].sort(key=sort_key)
-    data.extended['species'].sort(key=sort_key)
+    with instrument.span('sort'):
+        sort_key = lambda dino_data: dino.get_descriptive_name(flt, dino_data)
+        species.sort(key=sort_key)
+        extended.sort(key=sort_key)
 
     # Zip up dino data
-    for dino1 in data.stats['species']:
-        for dino2 in data.extended['species']:
-            if dino1['blueprintPath'] == dino2['bp'][:-2]:
-                dino1['extra'] = dino2
-                break
-    species = data.stats['species']
-    for dino1 in species:
-        if 'extra' not in dino1:
-            bp1 = dino1['blueprintPath']
-            print(f'Zipping error: {bp1} does not have any extended data.')
-            dino1['extra'] = dict()
-
-    results: Dict[str, Dict[str, Any]] = dict()
-    for dino_data in query(
-            species,
-            dict(where=lambda x: dino.should_skip(flt, x), equals=False),
-    ):
-        lookup_key = get_dv_compatible_key(flt, dino_data)
-        out: Dict[str, Any] = dict()
-
-        for field in WHITELISTED_FIELDS:
-            value = dino_data.get(field, None) \
-                    or dino_data['extra'].get(field, None)
-            if value != None:
-                out[field] = value
-
-        if lookup_key in results:
-            bp1 = results[lookup_key]['bp']
-            bp2 = out['bp']
-            message = f'Look-up key collision: {lookup_key}\n'
-            message += f'\tdino A:\t{bp1}\n'
-            message += f'\tdino B:\t{bp2}\n'
-            print(message)
-            continue
-        results[lookup_key] = out
-
-    packed = dict(
-        version=game_version,
-        species=results,  #prepare_object(results),
-    )
-    output = format_json(packed, True)
-    output_path.write_text(output)
\ No newline at end of file
+    with instrument.span('join'):
+        extras = zip_species(species, extended)
+
+    # Entries of species whose data did not change are copied from the last
+    # output instead of being rendered again
+    with instrument.span('format'):
+        previous = load_json(output_path)['species'] if state.spliceable \
+                   else dict()
+
+        results: Dict[str, Dict[str, Any]] = dict()
+        for dino_data in species:
+            lookup_key = get_dv_compatible_key(flt, dino_data)
+            if lookup_key not in results:
+                unchanged = state.add_species(
+                    lookup_key, [dino_data, extras[id(dino_data)]])
+                if unchanged and lookup_key in previous:
+                    results[lookup_key] = previous[lookup_key]
+                    continue
+
+            out: Dict[str, Any] = dict()
+
+            for field in WHITELISTED_FIELDS:
+                value = dino_data.get(field, None) \
+                        or extras[id(dino_data)].get(field, None)
+                if value != None:
+                    out[field] = value
+
+            if lookup_key in results:
+                bp1 = results[lookup_key]['bp']
+                bp2 = out['bp']
+                message = f'Look-up key collision: {lookup_key}\n'
+                message += f'\tdino A:\t{bp1}\n'
+                message += f'\tdino B:\t{bp2}\n'
+                print(message)
+                continue
+            results[lookup_key] = out
+        instrument.count('species.output', len(results))
+
+    with instrument.span('write'):
+        packed = dict(
+            version=game_version,
+            species=results,  #prepare_object(results),
+        )
+        with open(output_path, 'wt') as fp:
+            write_json(fp, packed)
+        state.save()
\ No newline at end of file
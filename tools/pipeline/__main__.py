@@ -0,0 +1,5 @@
+from core.cli import profiled
+from .cli import run
+
+with profiled('pipeline'):
+    run()
@@ -0,0 +1,151 @@
+import os
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from core import cli, instrument
+from core.data_context import shared_species_files
+from core.filter import FILTER_CACHE_DIR, Filter, load_filter
+from core.hashcache import load_hash_cache
+from tools.cloning import cli as cloning
+from tools.dvjson import cli as dvjson
+from tools.selectortest import cli as selectortest
+from tools.wildstats import cli as wildstats
+
+
+@dataclass
+class Job:
+    tool: str
+    filter: Path
+    output: Path
+    # Any other keys of the job, passed to the tool
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Manifest:
+    obelisk: Path
+    jobs: List[Job]
+
+
+def load_manifest(filename: Path) -> Manifest:
+    with open(filename, 'rt') as fp:
+        doc = yaml.safe_load(fp)
+
+    jobs = list()
+    for entry in doc['jobs']:
+        entry = dict(entry)
+        tool = entry.pop('tool')
+        if tool not in TOOLS:
+            raise ValueError(f'Unknown tool in {filename}: {tool}')
+        jobs.append(Job(tool=tool,
+                        filter=Path(entry.pop('filter')),
+                        output=Path(entry.pop('output')),
+                        options=entry))
+
+    outputs = [job.output for job in jobs]
+    for output in set(outputs):
+        if outputs.count(output) > 1:
+            raise ValueError(f'More than one job writes to {output}')
+
+    return Manifest(obelisk=Path(doc.get('obelisk', 'data/obelisk')),
+                    jobs=jobs)
+
+
+def run_cloning(flt: Filter, obelisk_path: Path, job: Job, force: bool):
+    tables = job.options.get('tables', None)
+    cloning.main(flt, obelisk_path, Path(tables) if tables else None,
+                 job.output, force)
+
+
+def run_dvjson(flt: Filter, obelisk_path: Path, job: Job, force: bool):
+    dvjson.main(flt, obelisk_path, job.output, force)
+
+
+def run_selectortest(flt: Filter, obelisk_path: Path, job: Job,
+                     force: bool):
+    selectortest.main(flt, obelisk_path, job.output, force)
+
+
+def run_wildstats(flt: Filter, obelisk_path: Path, job: Job, force: bool):
+    wildstats.main(flt, obelisk_path, job.output, force)
+
+
+def run_svgcheck(flt: Filter, obelisk_path: Path, job: Job, force: bool):
+    # Needs mwclient, which the other tools do not. Always runs, as it
+    # compares against the files currently on the wiki.
+    from tools.svgcheck import cli as svgcheck
+
+    options = job.options
+    cache = load_hash_cache(
+        Path(options.get('hashcache', 'data/svgcheck-hashes.json')))
+    try:
+        svgcheck.main(flt, options.get('site', 'localhost:8084'),
+                      obelisk_path, Path(options.get('svgs', 'data/wiki-maps')),
+                      job.output, options.get('jobs', os.cpu_count() or 1),
+                      cache,
+                      Path(options.get('remotecache',
+                                       'data/svgcheck-remote.json')),
+                      options.get('remotemaxage', 3600))
+    finally:
+        cache.save()
+
+
+TOOLS: Dict[str, Callable[[Filter, Path, Job, bool], None]] = dict(
+    cloning=run_cloning,
+    dvjson=run_dvjson,
+    selectortest=run_selectortest,
+    svgcheck=run_svgcheck,
+    wildstats=run_wildstats,
+)
+
+
+def run():
+    manifest_path = cli.get_path('manifest', Path('pipeline.yml'))
+    jobs = cli.get_int('jobs', os.cpu_count() or 1)
+    force = cli.get_bool('force')
+    cache_dir = FILTER_CACHE_DIR if cli.get_bool('filtercache') else None
+    manifest = load_manifest(manifest_path)
+    if not main(manifest, jobs, force, cache_dir):
+        raise SystemExit(1)
+
+
+def run_job(obelisk_path: Path, job: Job, force: bool = False,
+            cache_dir: Optional[Path] = None):
+    with instrument.span(f'{job.tool} {job.output}'):
+        flt = load_filter(job.filter, cache_dir)
+        if job.tool != 'svgcheck':
+            job.output.parent.mkdir(parents=True, exist_ok=True)
+        TOOLS[job.tool](flt, obelisk_path, job, force)
+
+
+def main(manifest: Manifest, jobs: int = 1, force: bool = False,
+         cache_dir: Optional[Path] = None) -> bool:
+    '''
+    Runs the jobs of the manifest on `jobs` threads. Species files are read
+    once and shared by every job. Outputs that are up to date are skipped
+    unless `force` is set. Filters are pickled to `cache_dir` if given.
+    Returns whether all jobs succeeded.
+    '''
+    with shared_species_files(), ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(run_job, manifest.obelisk, job, force, cache_dir)
+            for job in manifest.jobs
+        ]
+
+    succeeded = True
+    for job, future in zip(manifest.jobs, futures):
+        error = future.exception()
+        if error:
+            succeeded = False
+            print(f'{job.tool} ({job.filter}) failed:')
+            traceback.print_exception(type(error), error,
+                                      error.__traceback__)
+        else:
+            print(f'{job.tool} ({job.filter}) -> {job.output}')
+    return succeeded
@@ -1,3 +1,5 @@
+from core.cli import profiled
 from .cli import run
 
-run()
+with profiled('selectortest'):
+    run()
@@ -6,12 +6,17 @@ from collections import namedtuple
 from tabulate import tabulate
 from dataclasses import dataclass
 
-from core import blueprint, dino, cli
-from core.file import load_json, query, validate, dump_json
+from core import blueprint, dino, cli, instrument
+from core.data_context import load_species_file
+from core.file import query, validate, dump_json
 from core.filter import load_filter, Filter
+from core.regen import OutputState
 from tools.dvjson.filter_ext import FilterDv
 from tools.dvjson.mwimpl import get_dv_compatible_key
 
+# The report depends on how dvjson builds its keys
+DVJSON_PATH = Path(__file__).parent.parent / 'dvjson'
+
 
 def run():
     obelisk_path = cli.get_path('obelisk', Path('data/obelisk'))
@@ -19,7 +24,7 @@ def run():
     output_path = cli.get_path('output_path',
                                Path('output/selector-test-report.txt'))
     flt = load_filter(filter_path)
-    main(flt, obelisk_path, output_path)
+    main(flt, obelisk_path, output_path, cli.get_bool('force'))
 
 
 DinoData = Dict[str, Any]
@@ -44,13 +49,22 @@ class ToolResults:
     name_conflicts: List[Tuple[str, str, str]]
 
 
-def main(flt: Filter, obelisk_path: Path, output_path: Path):
-    species = load_json(obelisk_path /
-                        'data/wiki/species.json')  # TODO: allow mods
+def main(flt: Filter, obelisk_path: Path, output_path: Path,
+         force: bool = False):
+    species_path = obelisk_path / 'data/wiki/species.json'  # TODO: allow mods
+    state = OutputState(output_path, 'selectortest', flt, [species_path],
+                        Path(__file__).parent, uses=[DVJSON_PATH])
+    if not force and state.is_current():
+        print(f'{output_path} is up to date.')
+        return
+
+    with instrument.span('load'):
+        species_file = load_species_file(species_path)
 
-    game_version = species['version']
-    species = species['species']
-    species.sort(key=sort_dinos_by_name(flt))
+    with instrument.span('sort'):
+        species = sorted(species_file.species, key=sort_dinos_by_name(flt))
+    # Only known once the species were read
+    game_version = species_file.version
 
     results = ToolResults(
         included=[],
@@ -62,20 +76,22 @@ def main(flt: Filter, obelisk_path: Path, output_path: Path):
     dvset: Dict[str, str] = dict()
     nameset: Dict[str, str] = dict()
 
-    for dino_data in species:
+    with instrument.span('select'):
+        included, skipped = dino.get_selectors(flt).partition(species)
+    instrument.count('species.selected', len(included))
+    instrument.count('species.skipped', len(skipped))
+    for dino_data in skipped:
+        results.ignored.append((
+            # BP path
+            get_asset_path(dino_data['bp']),
+            # Name
+            dino.get_descriptive_name(flt, dino_data),
+        ))
+
+    for dino_data in included:
         info: Tuple[str, ...]
         descriptive_name = dino.get_descriptive_name(flt, dino_data)
 
-        if dino.should_skip(flt, dino_data):
-            info = (
-                # BP path
-                get_asset_path(dino_data['bp']),
-                # Name
-                descriptive_name,
-            )
-            results.ignored.append(info)
-            continue
-
         dv_key = get_dv_compatible_key(
             flt, dino_data) if should_output_dv else 'N/A'
         info = (
@@ -135,4 +151,6 @@ def main(flt: Filter, obelisk_path: Path, output_path: Path):
         '',
         tabulate(results.ignored, ('Blueprint Path', 'Name')),
     ])
-    output_path.write_text(text)
\ No newline at end of file
+    with instrument.span('write'):
+        output_path.write_text(text)
+        state.save()
\ No newline at end of file
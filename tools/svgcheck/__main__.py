@@ -1,4 +1,6 @@
 import sys
+from core.cli import profiled
 from .cli import run
 
-run()
+with profiled('svgcheck'):
+    run()
@@ -1,34 +1,63 @@
+import os
 import sys
 import re
 import shutil
-import hashlib
 import logging
 
-from typing import Dict, Any, List, Iterable, Tuple
+from typing import Dict, Any, List, Iterable, Optional, Tuple
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from mwclient import Site
 from tqdm import tqdm
 
-from core import blueprint, dino, cli
+from core import blueprint, dino, cli, instrument
 from core.file import load_json, query, dump_json, JsonData
 from core.filter import load_filter, Filter, CORE_GAME
 from core.data_context import ObASB, ObSVGs, find_mod_ex
+from core.hashcache import HashCache, StatKey, hash_file, load_hash_cache
+from . import remote
 
 MW_UA = 'https://github.com/alex4401/ark-template-generation.git svgcheck (User:alexrmski)'
 
 
-def build_hash_db(mw, item_count):
-    print('Rebuilding index of remote data (progress might be inaccurate)')
-    wiki_hashes = dict()
-    mw_wiki_images = mw.categories['SVG spawning maps']
-    with tqdm(total=item_count) as t:
-        for mw_image in mw_wiki_images:
-            wiki_hashes[mw_image.name] = mw_image.imageinfo['sha1']
-            t.update()
-
-            if t.n >= t.total:
-                t.total = t.n + 1
+def hash_files(paths: List[Path], jobs: int,
+                cache: Optional[HashCache] = None) -> Iterable[str]:
+    '''
+    Hashes the files on a pool of `jobs` threads, yielding the digests in the
+    order of `paths`. Files unchanged since they were cached are only stat'd.
+    '''
+    if cache is None:
+        cache = HashCache()
+
+    def get_hash(path: Path) -> Tuple[StatKey, str]:
+        # Stat first, a file changing while hashed then no longer matches
+        stat_key = cache.stat_key(path)
+        return stat_key, cache.get(path, stat_key) or hash_file(path)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for path, (stat_key, sha1) in zip(paths, pool.map(get_hash, paths)):
+            cache.put(path, sha1, stat_key)
+            yield sha1
+
+
+def get_wiki_hashes(mw_address: str, jobs: int, snapshot_path: Path,
+                    max_age: Optional[float]) -> Dict[str, str]:
+    '''
+    Reuses the saved snapshot of remote hashes if it is recent enough, and
+    fetches a new one otherwise. A `max_age` of None never goes online.
+    '''
+    wiki_hashes = remote.load_snapshot(snapshot_path, mw_address, max_age)
+    if wiki_hashes is not None:
+        print('Using saved index of remote data')
+        return wiki_hashes
+    if max_age is None:
+        raise ValueError(f'No saved index of remote data in {snapshot_path}')
+
+    connect = partial(Site, mw_address, clients_useragent=MW_UA, path='/')
+    wiki_hashes = remote.build_hash_db(connect, jobs)
+    remote.save_snapshot(snapshot_path, mw_address, wiki_hashes)
     return wiki_hashes
 
 
@@ -37,102 +66,139 @@ def run():
     obelisk_path = cli.get_path('obelisk', Path('data/obelisk'))
     svg_path = cli.get_path('svgs', Path('data/wiki-maps'))
     filter_path = cli.get_path('filter', Path('filters/svg_filter.yml'))
+    jobs = cli.get_int('jobs', os.cpu_count() or 1)
+    cache_path = cli.get_path('hashcache', Path('data/svgcheck-hashes.json'))
+    snapshot_path = cli.get_path('remotecache',
+                                 Path('data/svgcheck-remote.json'))
+    # Seconds a saved remote index stays valid; -offline reuses it regardless
+    max_age = cli.get_float('remotemaxage', 3600)
+    if cli.get_bool('offline'):
+        max_age = None
 
     flt = load_filter(filter_path)
+    cache = load_hash_cache(cache_path)
+    if cli.get_bool('rehash'):
+        cache.clear()
 
     default_output = Path('output')
     if flt.modId != CORE_GAME:
         default_output /= str(flt.modId)
     output_path = cli.get_path('output', default_output)
 
-    main(flt, mw_server, obelisk_path, svg_path, output_path)
+    try:
+        main(flt, mw_server, obelisk_path, svg_path, output_path, jobs, cache,
+             snapshot_path, max_age)
+    finally:
+        cache.save()
 
 
-def main(flt: Filter, mw_address: str, obelisk_path: Path, svg_path: Path,
-         output_path: Path):
-    mw = Site(mw_address, clients_useragent=MW_UA, path='/')
-    mod = find_mod_ex(obelisk_path, flt.modId)
-    asb = ObASB(obelisk_path, mod)
-    svgs = ObSVGs(svg_path, mod)
+def gather_maps(flt: Filter, mod, asb: ObASB, svgs: ObSVGs,
+                t: tqdm) -> Dict[str, List[Tuple[Path, str, str]]]:
+    '''
+    Local maps of the selected species, as (file, world, wiki file name)
+    tuples by blueprint path.
+    '''
+    results = defaultdict(list)
+    included, skipped = dino.get_selectors(flt).partition(asb.get_dinos())
+    t.update(len(skipped))
+    instrument.count('species.selected', len(included))
 
-    if mod and not flt.modNameOverride:
-        flt.modNameOverride = mod['title']
+    for dino_data in included:
+        matched = False
+        bp = blueprint.get_path(dino_data)
+        class_name = blueprint.get_class_name(bp)
 
-    if output_path.is_dir():
-        shutil.rmtree(output_path)
-    output_path.mkdir()
+        found = svgs.find(mod, class_name[:-2], flt.modId)
+        #if options.LinkAgainstMod:
+        #    found = list(found)
+        #    found += svgContext.list(mod, class_name, options.LinkAgainstMod)
 
-    print('Gathering information about local maps')
-    results = defaultdict(list)
-    with tqdm(total=len(asb.get_dinos())) as t:
-        for dino_data in asb.get_dinos():
-            matched = False
-            bp = blueprint.get_path(dino_data)
-            class_name = blueprint.get_class_name(bp)
+        for world, file in found:
+            t.total += 1
 
-            if dino.should_skip(flt, dino_data):
+            world = flt.worldNameOverrides.get(world, world)
+
+            if world in flt.skipMaps:
                 t.update()
                 continue
 
-            found = svgs.list(mod, class_name[:-2], flt.modId)
-            #if options.LinkAgainstMod:
-            #    found = list(found)
-            #    found += svgContext.list(mod, class_name, options.LinkAgainstMod)
+            dino_name = dino.get_descriptive_name(flt, dino_data)
 
-            for file in found:
-                t.total += 1
+            name = ''
+            if mod:
+                name += 'Mod ' + flt.modNameOverride + ' '
+            name += 'Spawning ' + dino_name + ' ' + world + '.svg'
+            results[bp].append((file, world, name))
+            t.update()
 
-                world = file.relative_to(svg_path).parts[1]
-                world = flt.worldNameOverrides.get(world, world)
+        t.update()
 
-                if world in flt.skipMaps:
-                    t.update()
-                    continue
+    return results
 
-                dino_name = dino.get_descriptive_name(flt, dino_data)
 
-                name = ''
-                if mod:
-                    name += 'Mod ' + flt.modNameOverride + ' '
-                name += 'Spawning ' + dino_name + ' ' + world + '.svg'
-                results[bp].append((file, world, name))
-                t.update()
+def main(flt: Filter, mw_address: str, obelisk_path: Path, svg_path: Path,
+         output_path: Path, jobs: int = 1,
+         cache: Optional[HashCache] = None,
+         snapshot_path: Path = Path('data/svgcheck-remote.json'),
+         max_age: Optional[float] = 0):
+    mod = find_mod_ex(obelisk_path, flt.modId)
+    asb = ObASB(obelisk_path, mod)
+    svgs = ObSVGs(svg_path, mod)
 
-            t.update()
+    if mod and not flt.modNameOverride:
+        flt.modNameOverride = mod['title']
+
+    if output_path.is_dir():
+        shutil.rmtree(output_path)
+    output_path.mkdir()
+
+    print('Gathering information about local maps')
+    with tqdm(total=len(asb.get_dinos())) as t, instrument.span('match'):
+        results = gather_maps(flt, mod, asb, svgs, t)
 
     item_count = sum([len(files) for _, files in results.items()])
+    instrument.count('files.found', item_count)
 
-    wiki_hashes = build_hash_db(mw, item_count)
+    with instrument.span('remote'):
+        wiki_hashes = get_wiki_hashes(mw_address, jobs, snapshot_path,
+                                      max_age)
 
     print('Comparing local versions against remote data')
     checked_files = set()
+    files_to_check = list()
+    for bp, files in results.items():
+        for original_file, _, target_file in files:
+            if target_file in checked_files:
+                print(f'Collision found:\t', target_file)
+                continue
+            checked_files.add(target_file)
+            files_to_check.append((original_file, target_file))
+
     files_to_update = list()
-    with tqdm(total=item_count) as t:
-        for bp, files in results.items():
-            for original_file, _, target_file in files:
-                if target_file in checked_files:
-                    print(f'Collision found:\t', target_file)
-                    t.update()
-                    continue
-                checked_files.add(target_file)
-
-                input_data = original_file.read_text()
-                sha1 = hashlib.sha1(input_data.encode('utf-8')).hexdigest()
-
-                wiki_hash = wiki_hashes.get('File:' + target_file, None)
-                if wiki_hash == None:
-                    print(target_file, 'not in hash database.')
-                    files_to_update.append((original_file, target_file))
-                elif wiki_hash != sha1:
-                    print(target_file, 'is out of date:', wiki_hash, sha1)
-                    files_to_update.append((original_file, target_file))
-                t.update()
+    with tqdm(total=item_count) as t, instrument.span('hash'):
+        t.update(item_count - len(files_to_check))
+
+        local_hashes = hash_files([file for file, _ in files_to_check], jobs,
+                                  cache)
+        for (original_file, target_file), sha1 in zip(files_to_check,
+                                                      local_hashes):
+            wiki_hash = wiki_hashes.get('File:' + target_file, None)
+            if wiki_hash == None:
+                print(target_file, 'not in hash database.')
+                files_to_update.append((original_file, target_file))
+            elif wiki_hash != sha1:
+                print(target_file, 'is out of date:', wiki_hash, sha1)
+                files_to_update.append((original_file, target_file))
+            t.update()
+
+    instrument.count('files.checked', len(files_to_check))
+    instrument.count('files.updated', len(files_to_update))
 
     print('Copying modified files on disk')
-    for original_file, target_file in files_to_update:
-        target = (output_path / target_file)
-        if target.is_file():
-            continue
+    with instrument.span('write'):
+        for original_file, target_file in files_to_update:
+            target = (output_path / target_file)
+            if target.is_file():
+                continue
 
-        input_data = original_file.read_text()
-        target.write_text(input_data)
+            shutil.copyfile(original_file, target)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from tqdm import tqdm
+
+from core.file import load_json, save_json_atomic
+
+CATEGORY = 'Category:SVG spawning maps'
+# Titles per imageinfo query; the API allows 500 only with apihighlimits
+BATCH_SIZE = 50
+HIGH_BATCH_SIZE = 500
+SNAPSHOT_VERSION = 1
+
+HashDb = Dict[str, str]
+
+
+def _query_all(mw, post: bool = False, **kwargs) -> Iterator[dict]:
+    '''
+    Follows query continuations, yielding each page of results. With `post`,
+    the query is sent in the request body instead of the URL.
+    '''
+    request = mw.post if post else mw.get
+    continuation = dict()
+    while True:
+        result = request('query', **kwargs, **continuation)
+        yield result.get('query', dict())
+        if 'continue' not in result:
+            return
+        continuation = result['continue']
+
+
+def get_batch_size(mw) -> int:
+    if 'apihighlimits' in mw.rights:
+        return HIGH_BATCH_SIZE
+    return BATCH_SIZE
+
+
+def list_files(mw, category: str = CATEGORY) -> List[str]:
+    titles = list()
+    for page in _query_all(mw, list='categorymembers', cmtitle=category,
+                           cmtype='file', cmprop='title',
+                           cmlimit=get_batch_size(mw)):
+        titles.extend(member['title'] for member in page['categorymembers'])
+    return titles
+
+
+def fetch_hashes(mw, titles: List[str]) -> HashDb:
+    hashes = dict()
+    # A full batch of titles makes a URL longer than servers accept
+    for page in _query_all(mw, post=True, prop='imageinfo', iiprop='sha1',
+                           titles='|'.join(titles)):
+        for info in page.get('pages', dict()).values():
+            revisions = info.get('imageinfo', None)
+            if revisions:
+                hashes[info['title']] = revisions[0]['sha1']
+    return hashes
+
+
+def _batched(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def build_hash_db(connect: Callable[[], Any], jobs: int,
+                  category: str = CATEGORY) -> HashDb:
+    '''
+    Lists the category, then asks for the SHA-1 of its files in batches,
+    keeping up to `jobs` batches in flight. Sites hold an HTTP session that
+    cannot be shared between threads, so `connect` makes one per worker.
+    '''
+    print('Rebuilding index of remote data')
+    mw = connect()
+    titles = list_files(mw, category)
+    wiki_hashes = dict()
+    batches = list(_batched(titles, get_batch_size(mw)))
+    local = threading.local()
+
+    def fetch(batch: List[str]) -> HashDb:
+        site = getattr(local, 'mw', None)
+        if site is None:
+            site = local.mw = connect()
+        return fetch_hashes(site, batch)
+
+    with tqdm(total=len(titles)) as t, \
+            ThreadPoolExecutor(max_workers=jobs) as pool:
+        for batch, hashes in zip(batches, pool.map(fetch, batches)):
+            wiki_hashes.update(hashes)
+            t.update(len(batch))
+    return wiki_hashes
+
+
+def load_snapshot(path: Path, site: str,
+                  max_age: Optional[float]) -> Optional[HashDb]:
+    '''
+    Returns the hashes saved for the site by save_snapshot, unless they are
+    older than `max_age` seconds. A `max_age` of None accepts any age.
+    '''
+    try:
+        data = load_json(path)
+    except (OSError, ValueError):
+        return None
+
+    if data.get('version', None) != SNAPSHOT_VERSION \
+            or data.get('site', None) != site:
+        return None
+    if max_age is not None and time.time() - data['timestamp'] > max_age:
+        return None
+    return data['hashes']
+
+
+def save_snapshot(path: Path, site: str, hashes: HashDb):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_json_atomic(path, dict(version=SNAPSHOT_VERSION, site=site,
+                                timestamp=time.time(), hashes=hashes))
@@ -1,11 +1,15 @@
 import sys
 
-from typing import Dict, Any, List, Iterable, Tuple, Union, Callable
+from typing import Dict, Any, List, Iterable, Optional, Tuple, \
+                   Union, Callable
 
-from core import blueprint, dino, cli
-from core.file import load_json, query, validate, dump_json
+from core import blueprint, dino, cli, instrument
+from core.data_context import ObASB
+from core.file import query, validated, print_output
 from core.filter import load_filter, Filter
-from .const import DinoData
+from core.regen import OutputState
+from core.stats import StatTable
+from .const import DinoData, WILD_COLUMNS, OXYGEN_COLUMNS
 from .filter_ext import FilterWildStatCalc
 from pathlib import Path
 
@@ -15,9 +19,11 @@ DinoStatValues = Dict[str, float]
 def run():
     obelisk_path = cli.get_path('obelisk', Path('data/obelisk'))
     filter_path = cli.get_path('filter', Path('filters/wildstats_filter.yml'))
+    output_path = cli.get_arg('output', None)
     flt = load_filter(filter_path)
     assert isinstance(flt, FilterWildStatCalc)
-    main(flt, obelisk_path)
+    main(flt, obelisk_path, Path(output_path) if output_path else None,
+         cli.get_bool('force'))
 
 
 def sort_dinos_by_name(flt: Filter) -> Callable[[DinoData], str]:
@@ -27,50 +33,69 @@ def sort_dinos_by_name(flt: Filter) -> Callable[[DinoData], str]:
     return _key_
 
 
-def main(flt: FilterWildStatCalc, obelisk_path: Path):
-    species = load_json(obelisk_path /
-                        'data/asb/values.json')  # TODO: allow mods
-    
-    for official_mod in flt.linkMods:
-        extra = load_json(obelisk_path / 'data/asb' / f'{official_mod}-{official_mod}.json')
-        species['species'] += extra['species']
-
-    game_version = species['version']
-    species = species['species']
-    species.sort(key=sort_dinos_by_name(flt))
-
-    if flt.includeDinoClasses:
-        validate(species,
-                 contains_range=flt.includeDinoClasses,
-                 of=blueprint.get_class_name)
-
-    results: Dict[str, DinoStatValues] = dict()
-    for dino_data in query(species,
-                           dict(where=lambda x: dino.should_skip(flt, x), equals=False),
-                           dict(where='fullStatsRaw', not_null=True)):
-        name = dino.get_descriptive_name(flt, dino_data)
-        stats = dino_data['fullStatsRaw']
-        uses_oxygen = not dino_data['doesNotUseOxygen']
-
-        out: DinoStatValues = dict()
-        out['health1'] = stats[0][0]
-        out['healthInc'] = stats[0][1]
-        out['stamina1'] = stats[1][0]
-        out['staminaInc'] = stats[1][1]
-        if uses_oxygen:
-            out['oxygen1'] = stats[3][0]
-            out['oxygenInc'] = stats[3][1]
-        out['food1'] = stats[4][0]
-        out['foodInc'] = stats[4][1]
-        out['weight1'] = stats[7][0]
-        out['weightInc'] = stats[7][1]
-        out['damage1'] = stats[8][0] * 100
-        out['damageInc'] = stats[8][1]
-
-        if name in results:
-            print('Found a conflict between two dinos:')
-            print(f'"{name}" and "{dino_data["blueprintPath"]}"')
-        results[name] = out
-
-    print('// Version:', game_version)
-    print(dump_json(flt, results))
+def wild_stats(species: List[DinoData]) -> List[DinoStatValues]:
+    '''
+    The output columns of each species. Species that do not use oxygen have
+    no oxygen columns.
+    '''
+    columns = StatTable(species).extract(WILD_COLUMNS)
+    for dino_data, out in zip(species, columns):
+        if dino_data['doesNotUseOxygen']:
+            for column in OXYGEN_COLUMNS:
+                del out[column]
+    return columns
+
+
+def main(flt: FilterWildStatCalc, obelisk_path: Path,
+         output_path: Optional[Path] = None, force: bool = False):
+    '''
+    Prints the stats, or writes them to `output_path`. Written outputs are
+    skipped when nothing they were generated from has changed.
+    '''
+    # TODO: allow mods
+    asb = ObASB(obelisk_path, None, flt.linkMods)
+
+    state = None
+    if output_path:
+        state = OutputState(output_path, 'wildstats', flt, asb.paths,
+                            Path(__file__).parent)
+        if not force and state.is_current():
+            print(f'{output_path} is up to date.')
+            return
+
+    with instrument.span('select'):
+        # Read as they are selected, so only the selected ones stay in memory
+        species: Iterable[DinoData] = asb.stream_dinos()
+        if flt.includeDinoClasses:
+            # Only checked to exist, the selectors decide what is output
+            species = validated(species, flt.includeDinoClasses,
+                                blueprint.get_class_name)
+
+        # Only selected species are kept, sorting them keeps the original
+        # order
+        species = list(query(species,
+                             dict(where=lambda x: dino.should_skip(flt, x), equals=False),
+                             dict(where='fullStatsRaw', not_null=True)))
+        instrument.count('species.selected', len(species))
+    with instrument.span('sort'):
+        species.sort(key=sort_dinos_by_name(flt))
+    game_version = asb.version
+
+    with instrument.span('format'):
+        results: Dict[str, DinoStatValues] = dict()
+        for dino_data, out in zip(species, wild_stats(species)):
+            name = dino.get_descriptive_name(flt, dino_data)
+            if name in results:
+                print('Found a conflict between two dinos:')
+                print(f'"{name}" and "{dino_data["blueprintPath"]}"')
+            results[name] = out
+        instrument.count('species.output', len(results))
+
+    with instrument.span('write'):
+        if not output_path:
+            print_output(flt, sys.stdout, game_version, results)
+            return
+
+        with open(output_path, 'wt') as fp:
+            print_output(flt, fp, game_version, results)
+        state.save()
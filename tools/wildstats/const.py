@@ -1,5 +1,25 @@
 from typing import Dict, Any
 
+from core.stats import BASE, INC_WILD, HEALTH, STAMINA, OXYGEN, FOOD, \
+                       WEIGHT, DAMAGE
+
 
 ## TYPE ALIASES
 DinoData = Dict[str, Any]
+
+## CONSTANTS
+WILD_COLUMNS = (
+    ('health1', HEALTH, BASE, 1),
+    ('healthInc', HEALTH, INC_WILD, 1),
+    ('stamina1', STAMINA, BASE, 1),
+    ('staminaInc', STAMINA, INC_WILD, 1),
+    ('oxygen1', OXYGEN, BASE, 1),
+    ('oxygenInc', OXYGEN, INC_WILD, 1),
+    ('food1', FOOD, BASE, 1),
+    ('foodInc', FOOD, INC_WILD, 1),
+    ('weight1', WEIGHT, BASE, 1),
+    ('weightInc', WEIGHT, INC_WILD, 1),
+    ('damage1', DAMAGE, BASE, 100),
+    ('damageInc', DAMAGE, INC_WILD, 1),
+)
+OXYGEN_COLUMNS = ('oxygen1', 'oxygenInc')
@@ -5,4 +5,5 @@ from core.filter import Filter, namespace
 @namespace('WildCreatureStats')
 class FilterWildStatCalc(Filter):
     linkMods: List[str] = list()
+    includeDinoClasses: List[str] = list()
     prettifyOutput: bool = False
\ No newline at end of file